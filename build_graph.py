@@ -0,0 +1,247 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import ast
+import gc
+import hashlib
+import json
+import logging
+import os
+import sys
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import texfile
+
+default_state_path = './Benchmarks/tex/build_state.json'
+
+# a call of a report generator; sources are the files it reads, outputs the
+# files other steps read from it, the tex files it writes are recorded anyway
+Step = namedtuple('Step', ['function', 'args', 'sources', 'outputs', 'kwargs'],
+                  defaults=[(), {}])
+
+
+def step_name(step):
+    """
+    :param step: a Step
+    :return: a string identifying the generator and its parameters
+    """
+    arguments = [json.dumps(step.args)[1:-1]] + \
+        [f'{key}={json.dumps(value)}' for key, value in step.kwargs.items()]
+    return f'{step.function.__module__}.{step.function.__qualname__}' \
+           f'({", ".join(argument for argument in arguments if argument)})'
+
+
+def local_imports(path, found=None):
+    """
+    :param path: path of the source file of a module
+    :param found: set of the paths found so far
+    :return: set with the path of the module and the paths of the modules
+        next to it that it imports, directly or through other such modules,
+        imports inside functions included
+    """
+    found = set() if found is None else found
+    found.add(str(path))
+    with open(path) as source_file:
+        tree = ast.parse(source_file.read(), str(path))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.add(node.module)
+    for name in names:
+        module_path = Path(Path(path).parent, f'{name.split(".")[0]}.py')
+        if module_path.exists() and str(module_path) not in found:
+            local_imports(module_path, found)
+    return found
+
+
+def generator_paths(step):
+    """
+    :param step: a Step
+    :return: sorted list with the paths of the source files of the module
+        defining the generator and of the local modules it imports, like
+        pgfplots.py or result_set.py
+    """
+    return sorted(local_imports(
+        Path(sys.modules[step.function.__module__].__file__)))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_step(step):
+    """
+    entry point of the worker processes, runs the generator of a step
+    :param step: a Step
+    :return: list of the paths of all files the step wrote
+    """
+    texfile.written_paths.clear()
+    texfile.failed_paths.clear()
+    step.function(*step.args, **step.kwargs)
+    # tex files are written when they are collected
+    gc.collect()
+    if texfile.failed_paths:
+        raise RuntimeError(f'writing {", ".join(texfile.failed_paths)} '
+                           f'failed')
+    outputs = sorted(set(texfile.written_paths) |
+                     {str(output) for output in step.outputs})
+    missing = [output for output in outputs if not Path(output).exists()]
+    if missing:
+        raise FileNotFoundError(f'{", ".join(missing)} not written')
+    return outputs
+
+
+class BuildGraph:
+    """
+        This class builds report steps incrementally. A step is only run
+        again when the hash of one of its sources, of the module defining
+        its generator or a local module imported by it, or of its
+        parameters changed, or one of its files is missing; the hashes of
+        the last build are kept in a state file. A step whose tex files
+        could not be written fails instead. Steps run in parallel worker processes as soon
+        as the steps writing their sources are done.
+    """
+    def __init__(self, steps, state_path=default_state_path,
+                 max_workers=None):
+        """
+        :param steps: list of Steps
+        :param state_path: path of the json file keeping the hashes
+        :param max_workers: maximum number of steps running at once,
+            defaults to the number of cpus
+        """
+        self.steps = steps
+        self.state_path = Path(state_path)
+        self.max_workers = os.cpu_count() if max_workers is None \
+            else max_workers
+        self.source_hashes = {}
+        self.generator_paths = {}
+
+    def load_state(self):
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path) as state_file:
+            return json.load(state_file)
+
+    def save_state(self, state):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = Path(self.state_path.parent,
+                              f'{self.state_path.name}.tmp')
+        with open(temporary_path, 'w') as state_file:
+            json.dump(state, state_file, indent=6)
+        os.replace(temporary_path, self.state_path)
+
+    def dependencies(self):
+        """
+        :return: list with the set of indices of the steps each step has to
+            wait for, those writing one of its sources
+        """
+        writers = {}
+        for index, step in enumerate(self.steps):
+            for output in step.outputs:
+                writers[str(output)] = index
+        return [{writers[str(source)] for source in step.sources
+                 if str(source) in writers} for step in self.steps]
+
+    def step_hash(self, step):
+        """
+        :param step: a Step whose sources are all written
+        :return: hex digest of the step parameters, the generator module and
+            the local modules it imports, and the source contents
+        """
+        module = step.function.__module__
+        if module not in self.generator_paths:
+            self.generator_paths[module] = generator_paths(step)
+        for source in list(step.sources) + self.generator_paths[module]:
+            if str(source) not in self.source_hashes:
+                self.source_hashes[str(source)] = file_hash(source)
+        return hashlib.sha256(json.dumps({
+            'step': step_name(step),
+            'generator': [self.source_hashes[path]
+                          for path in self.generator_paths[module]],
+            'sources': [self.source_hashes[str(source)]
+                        for source in step.sources]
+        }).encode()).hexdigest()
+
+    @staticmethod
+    def is_up_to_date(entry, digest):
+        return entry is not None and entry['hash'] == digest and \
+            all(Path(output).exists() for output in entry['outputs'])
+
+    def build(self, force=False):
+        """
+        runs the steps that are out of date
+        :param force: whether all steps are run regardless of the state
+        :return: a tuple of the lists of names of the steps built, skipped
+            as up to date and failed
+        """
+        state = self.load_state()
+        dependencies = self.dependencies()
+        pending = set(range(len(self.steps)))
+        done, failed = set(), set()
+        built, skipped = [], []
+        running = {}
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            while pending or running:
+                ready = sorted(index for index in pending
+                               if dependencies[index] <= done | failed)
+                for index in ready:
+                    pending.remove(index)
+                    step = self.steps[index]
+                    name = step_name(step)
+                    if dependencies[index] & failed:
+                        failed.add(index)
+                        logging.error(f'step {name} skipped, a step it '
+                                      f'depends on failed')
+                        continue
+                    try:
+                        digest = self.step_hash(step)
+                    except OSError as error:
+                        failed.add(index)
+                        logging.error(f'step {name} failed: {error}')
+                        continue
+                    if not force and self.is_up_to_date(state.get(name),
+                                                        digest):
+                        skipped.append(name)
+                        done.add(index)
+                        continue
+                    running[executor.submit(run_step, step)] = \
+                        (index, name, digest)
+                if not running:
+                    if pending and not ready:
+                        raise ValueError('the steps depend on each other '
+                                         'in a cycle')
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index, name, digest = running.pop(future)
+                    try:
+                        outputs = future.result()
+                    except Exception:
+                        failed.add(index)
+                        state.pop(name, None)
+                        self.save_state(state)
+                        logging.error(f'step {name} failed: '
+                                      f'{traceback.format_exc()}')
+                        continue
+                    state[name] = {'hash': digest, 'outputs': outputs}
+                    self.save_state(state)
+                    built.append(name)
+                    done.add(index)
+        print(f'\n{len(built)} report steps built, {len(skipped)} up to '
+              f'date, {len(failed)} failed')
+        return built, skipped, [step_name(self.steps[index])
+                                for index in sorted(failed)]
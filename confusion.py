@@ -1,5 +1,29 @@
 import json
 from dataset_details import datasets_details_json_path
+from predictions import load_predictions
+from rescoring import confusion_scores
+
+
+def derive_confusion_values(current_scores, total):
+    # derive confusion values from the macro averaged scores, only used
+    # for results written without a predictions sidecar
+    accuracy = current_scores['accuracy']
+    recall = current_scores['recall']
+    f1 = current_scores['f1-score']
+    derived_precision = (f1 * recall) / (2 * recall - f1)
+    # FixMe: with accuracy = 1 tp would be 0 ??? if precision = 1 and recall = 1 -> division by zero !!!
+    tp = total * (1 - accuracy) / (1 / derived_precision + 1 / recall - 2)
+    tn = accuracy * total - tp
+    fp = tp / derived_precision - tp
+    fn = tp / recall - tp
+    specificity = tn / (fp + tn)
+    derived_accuracy = (tp + tn) / (tp + fp + tn + fn)
+    derived_recall = tp / (tp + fn)
+    derived_f1_score = (2 * derived_precision * derived_recall) / (derived_precision + derived_recall)
+    return {'accuracy': derived_accuracy, 'recall': derived_recall,
+            'f1-score': derived_f1_score, 'precision': derived_precision,
+            'specificity': specificity, 'tp': tp, 'tn': tn, 'fp': fp,
+            'fn': fn}
 
 
 def add_confusion_values(input_json, output_json):
@@ -14,45 +38,47 @@ def add_confusion_values(input_json, output_json):
         dataset_keys = list(data[datasets[0]].keys())
         dataset_keys.remove('properties')
         metrics = dataset_keys
-        metric_keys = list(data[datasets[0]][metrics[0]].keys())
-        metric_keys.remove('arguments')
-        scores = metric_keys
+
+        # exact values from the confusion matrices of the predictions
+        # sidecars, computed for all results at once
+        sidecar_results = [(dataset, metric) for dataset in datasets
+                           for metric in metrics
+                           if 'predictions' in data[dataset][metric]]
+        exact_scores = confusion_scores([
+            load_predictions(data[dataset][metric]['predictions'])['confusion']
+            for dataset, metric in sidecar_results]) \
+            if sidecar_results else {}
+        exact_index = {result: index
+                       for index, result in enumerate(sidecar_results)}
 
         for dataset in datasets:
             for metric in metrics:
                 current_scores = data[dataset][metric]
-                accuracy = current_scores['accuracy']
-                recall = current_scores['recall']
-                f1 = current_scores['f1-score']
-                auroc = current_scores['auroc']
-                total = dataset_details[dataset]['num_of_test_instances']
-
-                # derive confusion values
-                derived_precision = (f1 * recall) / (2 * recall - f1)
-                # FixMe: with accuracy = 1 tp would be 0 ??? if precision = 1 and recall = 1 -> division by zero !!!
-                tp = total * (1 - accuracy) / (1 / derived_precision + 1 / recall - 2)
-                tn = accuracy * total - tp
-                fp = tp / derived_precision - tp
-                fn = tp / recall - tp
-                specificity = tn / (fp + tn)
-                tpr = recall
+                if 'status' in current_scores:
+                    continue  # aborted jobs have no scores
+                if (dataset, metric) in exact_index:
+                    index = exact_index[(dataset, metric)]
+                    values = {name: float(scores[index])
+                              for name, scores in exact_scores.items()}
+                else:
+                    total = dataset_details[dataset]['num_of_test_instances']
+                    values = derive_confusion_values(current_scores, total)
+                tpr = values['recall']
+                specificity = values['specificity']
                 fpr = 1 - specificity
-                derived_accuracy = (tp + tn) / (tp + fp + tn + fn)
-                derived_recall = tp / (tp + fn)
-                derived_f1_score = (2 * derived_precision * derived_recall) / (derived_precision + derived_recall)
                 derived_auroc = (fpr * tpr / 2) + (specificity * (1 - tpr) / 2) + (specificity * tpr)
 
                 # store in data
-                data[dataset][metric]['derived-accuracy'] = derived_accuracy
-                data[dataset][metric]['derived-recall'] = derived_recall
-                data[dataset][metric]['derived-f1-score'] = derived_f1_score
+                data[dataset][metric]['derived-accuracy'] = values['accuracy']
+                data[dataset][metric]['derived-recall'] = values['recall']
+                data[dataset][metric]['derived-f1-score'] = values['f1-score']
                 data[dataset][metric]['derived-auroc'] = derived_auroc
-                data[dataset][metric]['precision'] = derived_precision
+                data[dataset][metric]['precision'] = values['precision']
                 data[dataset][metric]['specificity'] = specificity
-                data[dataset][metric]['tp'] = tp
-                data[dataset][metric]['tn'] = tn
-                data[dataset][metric]['fp'] = fp
-                data[dataset][metric]['fn'] = fn
+                data[dataset][metric]['tp'] = values['tp']
+                data[dataset][metric]['tn'] = values['tn']
+                data[dataset][metric]['fp'] = values['fp']
+                data[dataset][metric]['fn'] = values['fn']
 
     with open(output_json, 'w') as new_data:
         json.dump(data, new_data, indent=6)
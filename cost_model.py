@@ -0,0 +1,217 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import heapq
+import json
+import re
+from glob import glob
+from pathlib import Path
+
+import numpy as np
+
+from result_log import ResultLog, variant_name, window_arguments
+
+default_history_pattern = './Benchmarks/json/*_archive_wws-*.json'
+
+# names of the result files themselves, as written by write_compacted,
+# copies like UCR_archive_wws--1_copy.json are left out
+result_file_name = re.compile(r'[A-Za-z]+_archive_wws--?\d+(-\d+)?\.json')
+
+# seconds per local cost of the analytic estimate while no runtimes are
+# known, a rough guess only
+default_seconds_per_cell = 1e-7
+
+
+def band_width(window, series_length):
+    """
+    :param window: window size as fraction of the series length, negative
+        values or None mean no constraint
+    :param series_length: number of timestamps of the series
+    :return: number of local costs computed per timestamp of a series
+    """
+    if window is None or window < 0:
+        return series_length
+    return min(series_length, 2 * int(window * series_length) + 1)
+
+
+def analytic_cost(shape, window):
+    """
+    the number of local costs an evaluation computes,
+    N_train * N_test * L * w * dimensions
+    :param shape: tuple of the number of training instances, test instances,
+        dimensions and timestamps
+    :param window: window size as fraction of the series length, None if the
+        metric has no window
+    :return: the number of local costs
+    """
+    n_train, n_test, dimensions, length = shape
+    return float(n_train) * n_test * dimensions * length * \
+        band_width(window, length)
+
+
+def record_window(arguments):
+    """
+    :param arguments: dictionary with the recorded metric arguments
+    :return: the numeric window argument, None if there is none
+    """
+    for key in window_arguments:
+        if isinstance(arguments.get(key), (int, float)) and \
+                not isinstance(arguments.get(key), bool):
+            return arguments[key]
+    return None
+
+
+def record_shape(properties):
+    """
+    :param properties: dictionary with the recorded dataset properties
+    :return: tuple of the number of training instances, test instances,
+        dimensions and timestamps
+    """
+    if 'len train set' in properties:
+        n_train = properties['len train set']
+        n_test = properties['len test set']
+    else:
+        # the default split of train_test_split
+        n_test = int(np.ceil(0.25 * properties['num_of_instances']))
+        n_train = properties['num_of_instances'] - n_test
+    return (n_train, n_test, properties['num_of_dimensions'],
+            properties['num_of_timestamps'])
+
+
+def history_records(pattern=default_history_pattern, log_path=None):
+    """
+    collects the runtimes of past jobs, every dataset, metric and window
+    once, as found first
+    :param pattern: glob pattern of the result json files
+    :param log_path: path of a result log whose records are added, None to
+        leave it out
+    :return: list of dictionaries with dataset, metric, window, shape and
+        runtime
+    """
+    records = []
+    for json_path in sorted(glob(pattern)):
+        if not result_file_name.fullmatch(Path(json_path).name):
+            continue
+        with open(json_path) as json_file:
+            data = json.load(json_file)
+        for dataset, results in data.items():
+            for metric, result in results.items():
+                if metric == 'properties' or 'status' in result:
+                    continue
+                records.append({
+                    'dataset': dataset, 'metric': metric,
+                    'window': record_window(result['arguments']),
+                    'shape': record_shape(results['properties']),
+                    'runtime': result['runtime']})
+    if log_path is not None:
+        for record in ResultLog(log_path).records():
+            if 'provenance' in record['result'] or \
+                    'status' in record['result']:
+                continue
+            records.append({
+                'dataset': record['dataset'],
+                'metric': variant_name(record['metric'],
+                                       record['result']['arguments']),
+                'window': record_window(record['result']['arguments']),
+                'shape': record_shape(record['properties']),
+                'runtime': record['result']['runtime']})
+    unique_records = {}
+    for record in records:
+        unique_records.setdefault(
+            (record['dataset'], record['metric'], record['window']), record)
+    return [record for record in unique_records.values()
+            if record['runtime'] > 0]
+
+
+def lpt_makespan(costs, workers):
+    """
+    assigns jobs longest first to the worker that is free first
+    :param costs: list of job costs, sorted in descending order
+    :param workers: number of workers
+    :return: the cost of the busiest worker
+    """
+    loads = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+    return max(loads)
+
+
+class CostModel:
+    """
+        This class predicts the runtime of a job from the runtimes of past
+        jobs. Log runtimes are fitted by least squares on the log numbers of
+        training instances, test instances, dimensions, timestamps and the
+        warping band width, with an intercept per metric. Datasets or
+        metrics without past runtimes get the analytic estimate
+        N_train * N_test * L * w * dimensions, scaled by the median seconds
+        per local cost of the past jobs.
+    """
+    def __init__(self, records):
+        """
+        :param records: list of dictionaries as returned by history_records
+        """
+        self.datasets = {record['dataset'] for record in records}
+        self.metrics = sorted({record['metric'] for record in records})
+        # metrics recorded without any window argument ignore the window
+        self.windowless = {metric for metric in self.metrics
+                           if all(record['window'] is None
+                                  for record in records
+                                  if record['metric'] == metric)}
+        self.seconds_per_cell = float(np.median(
+            [record['runtime'] / analytic_cost(record['shape'],
+                                               record['window'])
+             for record in records])) if records \
+            else default_seconds_per_cell
+        self.coefficients = None
+        if len(records) > len(self.metrics) + 5:
+            features = np.array([self.features(record['metric'],
+                                               record['shape'],
+                                               record['window'])
+                                 for record in records])
+            runtimes = np.log([record['runtime'] for record in records])
+            self.coefficients = np.linalg.lstsq(features, runtimes,
+                                                rcond=None)[0]
+
+    @classmethod
+    def from_history(cls, pattern=default_history_pattern, log_path=None):
+        return cls(history_records(pattern, log_path))
+
+    def features(self, metric, shape, window):
+        n_train, n_test, dimensions, length = shape
+        intercepts = [float(metric == known) for known in self.metrics]
+        return [np.log(n_train), np.log(n_test), np.log(dimensions),
+                np.log(length), np.log(band_width(window, length))] + \
+            intercepts
+
+    def predict(self, dataset, metric, window, shape):
+        """
+        :param dataset: name of the dataset
+        :param metric: name of the metric
+        :param window: window size of the job
+        :param shape: tuple of the number of training instances, test
+            instances, dimensions and timestamps
+        :return: the predicted runtime in seconds
+        """
+        if metric in self.windowless:
+            window = None
+        if self.coefficients is None or dataset not in self.datasets or \
+                metric not in self.metrics:
+            return self.seconds_per_cell * analytic_cost(shape, window)
+        return float(np.exp(np.dot(self.features(metric, shape, window),
+                                   self.coefficients)))
+
+
+if __name__ == '__main__':
+    history = history_records()
+    model = CostModel(history)
+    errors = [np.log(model.predict(record['dataset'], record['metric'],
+                                   record['window'], record['shape']) /
+                     record['runtime']) for record in history]
+    print(f'{len(history)} runtimes of {len(model.metrics)} metrics, '
+          f'median factor of error '
+          f'{np.exp(np.median(np.abs(errors))):.2f}')
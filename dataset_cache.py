@@ -0,0 +1,176 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+default_cache_dir = './Benchmarks/cache'
+
+
+def nested_to_panel(sktime_df):
+    """
+    converts an sktime nested dataframe into a contiguous 3d array, series
+    shorter than the longest one are padded with NaN at the end
+    :param sktime_df: an sktime nested dataframe
+    :return: float64 array of shape (instances, dimensions, timestamps)
+    """
+    num_instances, num_dimensions = sktime_df.shape
+    num_timestamps = max(len(sktime_df.iloc[instance, dimension])
+                         for instance in range(num_instances)
+                         for dimension in range(num_dimensions))
+    panel = np.full((num_instances, num_dimensions, num_timestamps), np.nan)
+    for instance in range(num_instances):
+        for dimension in range(num_dimensions):
+            series = sktime_df.iloc[instance, dimension].to_numpy(dtype=float)
+            panel[instance, dimension, :len(series)] = series
+    return panel
+
+
+def panel_to_nested(panel):
+    """
+    converts a 3d array back into an sktime nested dataframe, trailing NaN
+    padding is removed from each series
+    :param panel: array of shape (instances, dimensions, timestamps)
+    :return: an sktime nested dataframe
+    """
+    columns = {}
+    for dimension in range(panel.shape[1]):
+        cells = []
+        for instance in range(panel.shape[0]):
+            series = np.asarray(panel[instance, dimension])
+            valid = np.flatnonzero(~np.isnan(series))
+            length = valid[-1] + 1 if len(valid) else 0
+            cells.append(pd.Series(series[:length]))
+        columns[f'dim_{dimension}'] = cells
+    return pd.DataFrame(columns)
+
+
+def fetch_dataset(dataset):
+    """
+    loads a dataset from the UCR/UEA archive, this requires sktime and may
+    require network access
+    :param dataset: name of the dataset
+    :return: a tuple of the 3d panel and the labels
+    """
+    from sktime.datasets import load_UCR_UEA_dataset
+
+    X, y = load_UCR_UEA_dataset(dataset, return_X_y=True)
+    return nested_to_panel(X), np.asarray(y).astype(str)
+
+
+def content_hash(X, y):
+    """
+    :param X: the 3d panel
+    :param y: the labels
+    :return: a hex digest identifying the content of the dataset
+    """
+    digest = hashlib.sha256()
+    digest.update(str(X.shape).encode())
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update('\n'.join(y).encode())
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+        This class stores datasets once as contiguous numpy arrays of shape
+        (instances, dimensions, timestamps) plus their labels, keyed by
+        dataset name and content hash. Arrays are opened memory mapped, so
+        repeated runs and parallel workers share their pages, and no
+        download is needed once a dataset is cached.
+    """
+    def __init__(self, cache_dir=default_cache_dir):
+        """
+        :param cache_dir: directory holding the cached arrays
+        """
+        self.cache_dir = Path(cache_dir)
+        self.index_path = Path(self.cache_dir, 'index.json')
+
+    def index(self):
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path) as index_file:
+            return json.load(index_file)
+
+    def dataset_dir(self, dataset, digest):
+        return Path(self.cache_dir, f'{dataset}-{digest[:16]}')
+
+    def is_cached(self, dataset):
+        digest = self.index().get(dataset)
+        return digest is not None and \
+            Path(self.dataset_dir(dataset, digest), 'X.npy').exists() and \
+            Path(self.dataset_dir(dataset, digest), 'y.npy').exists()
+
+    def load(self, dataset):
+        """
+        loads a dataset from the cache, fetching and storing it first if it
+        is not cached yet
+        :param dataset: name of the dataset
+        :return: a tuple of the read only memory mapped panel and labels
+        """
+        if not self.is_cached(dataset):
+            self.store(dataset, *fetch_dataset(dataset))
+        dataset_dir = self.dataset_dir(dataset, self.index()[dataset])
+        X = np.load(Path(dataset_dir, 'X.npy'), mmap_mode='r')
+        y = np.load(Path(dataset_dir, 'y.npy'), mmap_mode='r')
+        return X, y
+
+    def series_length(self, dataset):
+        """
+        :param dataset: name of the dataset
+        :return: the number of timestamps of the series, None if they differ
+            in length
+        """
+        X = self.load(dataset)[0]
+        return None if np.isnan(X).any() else X.shape[2]
+
+    def store(self, dataset, X, y):
+        """
+        writes a dataset into the cache; files are written under temporary
+        names and moved in place, so concurrent workers never read halves
+        :param dataset: name of the dataset
+        :param X: the 3d panel
+        :param y: the labels
+        :return: the content hash of the dataset
+        """
+        X = np.ascontiguousarray(X, dtype=float)
+        y = np.asarray(y).astype(str)
+        digest = content_hash(X, y)
+        dataset_dir = self.dataset_dir(dataset, digest)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        for name, array in [('X', X), ('y', y)]:
+            temporary_path = Path(dataset_dir, f'{name}.{os.getpid()}.tmp.npy')
+            np.save(temporary_path, array)
+            os.replace(temporary_path, Path(dataset_dir, f'{name}.npy'))
+
+        index = self.index()
+        index[dataset] = digest
+        temporary_path = Path(self.cache_dir, f'index.{os.getpid()}.tmp.json')
+        with open(temporary_path, 'w') as index_file:
+            json.dump(index, index_file, indent=6)
+            index_file.flush()
+        os.replace(temporary_path, self.index_path)
+        return digest
+
+
+if __name__ == '__main__':
+    from selected_datasets import datasets
+    import progress_indication as p
+
+    # populate the cache for offline use
+    cache = DatasetCache()
+    progress = p.Progress('Caching datasets')
+    for dataset in datasets:
+        cache.load(dataset)
+        progress.progress()
+    progress.end()
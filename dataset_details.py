@@ -3,8 +3,6 @@ import file_ops as fo
 from pathlib import Path
 
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sktime.datasets import load_UCR_UEA_dataset
 from sktime_dataset_analyses import count_of_missing_values_in_sktime_df, \
     has_equal_length_in_all_time_series
 
@@ -48,8 +46,14 @@ def generate_datasets_details_json(datasets):
         - imbalance ratio
         - class ratios
     """
+    # loading datasets needs sklearn and pandas, which the reports do without
+    from sklearn.model_selection import train_test_split
+    from dataset_cache import DatasetCache, panel_to_nested
+    from distance_store import split_seed
+
     result_dict = {}
 
+    cache = DatasetCache()
     progress = p.Progress('Processing datasets')
     # load dataset
     for index, dataset in enumerate(datasets):
@@ -59,9 +63,10 @@ def generate_datasets_details_json(datasets):
         result_dict[dataset]['short_name'] = short_name
         result_dict[dataset]['name'] = dataset
         # load dataset
-        X, y = load_UCR_UEA_dataset(dataset, return_X_y=True)
+        X, y = cache.load(dataset)
         X_train, X_test, y_train, y_test = \
-            train_test_split(X, y)
+            train_test_split(X, y, random_state=split_seed(dataset))
+        X_train = panel_to_nested(X_train)
         properties = dataset_properties(X_train, y_train, y_test)
         result_dict[dataset].update(properties)
         domain = dataset_domains[dataset]
@@ -82,7 +87,8 @@ def dataset_properties(X_train, y_train, X_test):
         missing_values_count, unique_lengths,
         imbalance, class_ratios
     """
-    distribution = list(y_train.value_counts())
+    distribution = sorted(np.unique(y_train, return_counts=True)[1].tolist(),
+                          reverse=True)
     distribution_sum = sum(distribution)
     imbalance = (max(distribution) - min(distribution))/distribution_sum
     imbalance_str = f'{imbalance * 100:.2f}%'
@@ -0,0 +1,119 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import numpy as np
+from joblib import Parallel, delayed
+
+# metrics whose distance does not depend on the order of the series
+symmetric_metrics = ['dtw', 'ddtw', 'wdtw', 'wddtw', 'sdtw']
+
+# order of the exponent of the minkowski composition
+minkowski_p = 3
+
+# distance_composition values as used by the agdtw metrics
+compositions = {
+    0: lambda costs: costs.sum(axis=0),
+    1: lambda costs: np.sqrt((costs ** 2).sum(axis=0)),
+    2: lambda costs: costs.max(axis=0),
+    3: lambda costs: (costs ** minkowski_p).sum(axis=0) ** (1 / minkowski_p)
+}
+
+
+def metric_function(metric):
+    """
+    :param metric: string containing the sktime name of the metric
+    :return: the distance function the sktime classifier uses for the
+        metric, called with two series of shape (timestamps, dimensions)
+        and the metric parameters as keyword arguments
+    """
+    from sktime.classification.distance_based import \
+        KNeighborsTimeSeriesClassifier
+
+    return KNeighborsTimeSeriesClassifier(metric=metric).metric
+
+
+def to_series_panel(panel):
+    """
+    :param panel: array of shape (instances, dimensions, timestamps)
+    :return: contiguous array of shape (instances, timestamps, dimensions)
+        as expected by the sktime distance functions
+    """
+    return np.ascontiguousarray(np.transpose(panel, (0, 2, 1)), dtype=float)
+
+
+def distance_rows(X_a, X_b, distance, params, rows, symmetric=False):
+    """
+    :param X_a: array of shape (instances, timestamps, dimensions)
+    :param X_b: array of shape (instances, timestamps, dimensions)
+    :param distance: distance function as returned by metric_function
+    :param params: dictionary with the keyword arguments of the distance
+    :param rows: range of the rows of X_a to compute
+    :param symmetric: whether only the upper triangle, diagonal included,
+        is computed
+    :return: array of shape (len(rows), len(X_b))
+    """
+    distances = np.zeros((len(rows), len(X_b)))
+    for row_index, row in enumerate(rows):
+        for column in range(row if symmetric else 0, len(X_b)):
+            distances[row_index, column] = \
+                distance(X_a[row], X_b[column], **params)
+    return distances
+
+
+def pairwise_distances(X_a, X_b, distance, params, n_jobs=1, symmetric=False):
+    """
+    computes the distances between all series of two panels, blocks of rows
+    are distributed over n_jobs processes
+    :param X_a: array of shape (instances, timestamps, dimensions)
+    :param X_b: array of shape (instances, timestamps, dimensions)
+    :param distance: distance function as returned by metric_function
+    :param params: dictionary with the keyword arguments of the distance
+    :param n_jobs: number of jobs as understood by joblib
+    :param symmetric: whether X_a and X_b are the same panel and the distance
+        symmetric, only the upper triangle is computed then and mirrored
+    :return: array of shape (len(X_a), len(X_b))
+    """
+    # a few blocks per job keep the jobs busy when rows differ in cost
+    num_blocks = min(len(X_a), 4 * n_jobs if n_jobs > 0 else 32)
+    blocks = np.array_split(np.arange(len(X_a)), num_blocks)
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(distance_rows)(X_a, X_b, distance, params, block, symmetric)
+        for block in blocks if len(block))
+    distances = np.vstack(parts)
+    if symmetric:
+        distances = distances + np.triu(distances, 1).T
+    return distances
+
+
+def dimension_distances(X_a, X_b, distance, params, n_jobs=1):
+    """
+    computes the alignment costs of every pair dimension by dimension
+    :param X_a: array of shape (instances, timestamps, dimensions)
+    :param X_b: array of shape (instances, timestamps, dimensions)
+    :param distance: distance function as returned by metric_function
+    :param params: dictionary with the keyword arguments of the distance,
+        a distance_composition in it is ignored
+    :param n_jobs: number of jobs as understood by joblib
+    :return: array of shape (dimensions, len(X_a), len(X_b))
+    """
+    params = dict(params, distance_composition=0)
+    return np.stack([
+        pairwise_distances(X_a[:, :, [dimension]], X_b[:, :, [dimension]],
+                           distance, params, n_jobs)
+        for dimension in range(X_a.shape[2])])
+
+
+def compose(costs, composition):
+    """
+    :param costs: array of shape (dimensions, instances_a, instances_b) as
+        returned by dimension_distances
+    :param composition: the distance_composition value of the metric
+    :return: array of shape (instances_a, instances_b) with the composed
+        distances
+    """
+    return compositions[composition](costs)
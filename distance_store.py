@@ -0,0 +1,248 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import distance_matrix as dm
+
+default_store_dir = './Benchmarks/distances'
+default_memory_budget = 256 * 1024 * 1024
+
+
+def split_hash(*indices):
+    """
+    :param indices: arrays with the instance indices of the parts of a
+        split, no arguments for the whole dataset
+    :return: a hex digest identifying the split
+    """
+    digest = hashlib.sha256()
+    for part in indices:
+        digest.update(np.asarray(part, dtype=np.int64).tobytes())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+def split_seed(dataset):
+    """
+    :param dataset: name of the dataset
+    :return: the random state of the train test split of the dataset, the
+        same in every run and independent of the datasets loaded before
+    """
+    return int(hashlib.sha256(dataset.encode()).hexdigest()[:8], 16)
+
+
+def tile_shape(rows, columns, memory_budget, max_rows=None):
+    """
+    :param rows: number of rows of the matrix
+    :param columns: number of columns of the matrix
+    :param memory_budget: bytes a tile of float64 distances may take
+    :param max_rows: most rows a tile may have, None for no limit
+    :return: a tuple of the number of rows and columns of a tile, square
+        where the matrix allows it
+    """
+    side = max(1, int(np.sqrt(memory_budget / 8)))
+    tile_rows = min(rows, side, max_rows or rows)
+    tile_columns = min(columns, max(side, memory_budget // (8 * tile_rows)))
+    return tile_rows, tile_columns
+
+
+class DistanceStore:
+    """
+        This class computes distance matrices in tiles of bounded size and
+        keeps them on disk as memory mapped .npy files, keyed by dataset,
+        metric, arguments and split. Finished tiles are marked in a mask
+        next to the matrix, so an interrupted computation continues with
+        the missing tiles, and a finished matrix is only opened again.
+        Timed computations go into a fresh matrix next to the stored one
+        on every pass, see timed_distances, and the last one is kept.
+    """
+    def __init__(self, store_dir=default_store_dir,
+                 memory_budget=default_memory_budget):
+        """
+        :param store_dir: directory holding the matrices
+        :param memory_budget: bytes a tile may take in memory, which sets
+            the tile size
+        """
+        self.store_dir = Path(store_dir)
+        self.memory_budget = memory_budget
+
+    def matrix_dir(self, dataset, key):
+        """
+        :param dataset: name of the dataset
+        :param key: dictionary identifying the matrix, it has to be json
+            serializable
+        :return: the directory of the matrix
+        """
+        digest = hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return Path(self.store_dir, f'{dataset}-{digest[:16]}')
+
+    def is_stored(self, dataset, key):
+        matrix_dir = self.matrix_dir(dataset, key)
+        return Path(matrix_dir, 'distances.npy').exists() and \
+            not Path(matrix_dir, 'tiles.npy').exists()
+
+    @staticmethod
+    def load(matrix_dir):
+        """
+        :param matrix_dir: directory of a finished matrix, as named under
+            distances in the results
+        :return: the read only memory mapped matrix
+        """
+        return np.load(Path(matrix_dir, 'distances.npy'), mmap_mode='r')
+
+    def pass_dir(self, dataset, key):
+        """
+        :param dataset: name of the dataset
+        :param key: dictionary identifying the matrix
+        :return: the directory the timed passes compute the matrix in
+        """
+        matrix_dir = self.matrix_dir(dataset, key)
+        return matrix_dir.with_name(f'{matrix_dir.name}.pass')
+
+    def distances(self, dataset, key, X_a, X_b, metric, params, n_jobs=1,
+                  symmetric=False):
+        """
+        returns the distances between all series of two panels from the
+        store, computing the tiles missing so far
+        :param dataset: name of the dataset
+        :param key: dictionary identifying the matrix, it has to cover
+            everything the distances depend on, split included
+        :param X_a: array of shape (instances, timestamps, dimensions)
+        :param X_b: array of shape (instances, timestamps, dimensions)
+        :param metric: string containing the sktime name of the metric
+        :param params: dictionary with the keyword arguments of the metric
+        :param n_jobs: number of jobs computing a tile
+        :param symmetric: whether X_a and X_b are the same panel and the
+            distance symmetric, tiles below the diagonal are mirrored then
+        :return: the read only memory mapped matrix
+        """
+        return self.compute(self.matrix_dir(dataset, key), key, X_a, X_b,
+                            metric, params, n_jobs, symmetric)
+
+    def timed_distances(self, dataset, key, X_a, X_b, metric, params,
+                        n_jobs=1, max_tile_rows=None, rows_done=None):
+        """
+        computes the distances between all series of two panels in tiles
+        into a fresh matrix, nothing stored is read, so every call can be
+        timed; keep_timed moves the matrix of the last call into the store
+        :param dataset: name of the dataset
+        :param key: dictionary identifying the matrix
+        :param X_a: array of shape (instances, timestamps, dimensions)
+        :param X_b: array of shape (instances, timestamps, dimensions)
+        :param metric: string containing the sktime name of the metric
+        :param params: dictionary with the keyword arguments of the metric
+        :param n_jobs: number of jobs computing a tile
+        :param max_tile_rows: most rows a tile may have, None for no limit
+        :param rows_done: function taking the matrix and the slice of its
+            rows, called whenever a row of tiles is finished
+        :return: the read only memory mapped matrix
+        """
+        pass_dir = self.pass_dir(dataset, key)
+        shutil.rmtree(pass_dir, ignore_errors=True)
+        return self.compute(pass_dir, key, X_a, X_b, metric, params, n_jobs,
+                            max_tile_rows=max_tile_rows, rows_done=rows_done)
+
+    def keep_timed(self, dataset, key):
+        """
+        keeps the matrix of the last timed pass in the store, unless the
+        store has it already
+        :param dataset: name of the dataset
+        :param key: dictionary identifying the matrix
+        :return: the directory of the stored matrix
+        """
+        pass_dir = self.pass_dir(dataset, key)
+        matrix_dir = self.matrix_dir(dataset, key)
+        if self.is_stored(dataset, key):
+            shutil.rmtree(pass_dir)
+        else:
+            # tiles of an interrupted computation
+            shutil.rmtree(matrix_dir, ignore_errors=True)
+            os.replace(pass_dir, matrix_dir)
+        return matrix_dir
+
+    def compute(self, matrix_dir, key, X_a, X_b, metric, params, n_jobs=1,
+                symmetric=False, max_tile_rows=None, rows_done=None):
+        """
+        computes the tiles of the matrix in the directory missing so far
+        :param matrix_dir: directory of the matrix
+        :param key: dictionary identifying the matrix
+        :param X_a: array of shape (instances, timestamps, dimensions)
+        :param X_b: array of shape (instances, timestamps, dimensions)
+        :param metric: string containing the sktime name of the metric
+        :param params: dictionary with the keyword arguments of the metric
+        :param n_jobs: number of jobs computing a tile
+        :param symmetric: whether X_a and X_b are the same panel and the
+            distance symmetric, tiles below the diagonal are mirrored then
+        :param max_tile_rows: most rows a tile may have, None for no limit
+        :param rows_done: function taking the matrix and the slice of its
+            rows, called whenever a row of tiles is finished, None for none
+        :return: the read only memory mapped matrix
+        """
+        matrix_path = Path(matrix_dir, 'distances.npy')
+        mask_path = Path(matrix_dir, 'tiles.npy')
+        if matrix_path.exists() and not mask_path.exists():
+            return self.load(matrix_dir)
+
+        matrix_dir.mkdir(parents=True, exist_ok=True)
+        with open(Path(matrix_dir, 'key.json'), 'w') as key_file:
+            json.dump(key, key_file, indent=6)
+        rows, columns = len(X_a), len(X_b)
+        tile_rows, tile_columns = tile_shape(rows, columns,
+                                             self.memory_budget,
+                                             max_tile_rows)
+        if symmetric:
+            tile_columns = tile_rows
+        num_tiles = (-(-rows // tile_rows), -(-columns // tile_columns))
+        matrix = None
+        if matrix_path.exists() and mask_path.exists():
+            done = open_memmap(mask_path, mode='r+')
+            # tiles of another memory budget do not fit, start over then
+            if done.shape == num_tiles:
+                matrix = open_memmap(matrix_path, mode='r+')
+            del done
+        if matrix is None:
+            done = open_memmap(mask_path, mode='w+', dtype=bool,
+                               shape=num_tiles)
+            matrix = open_memmap(matrix_path, mode='w+', dtype=float,
+                                 shape=(rows, columns))
+        else:
+            done = open_memmap(mask_path, mode='r+')
+
+        distance = dm.metric_function(metric)
+        for tile_row in range(num_tiles[0]):
+            row_slice = slice(tile_row * tile_rows,
+                              min(rows, (tile_row + 1) * tile_rows))
+            for tile_column in range(tile_row if symmetric else 0,
+                                     num_tiles[1]):
+                if done[tile_row, tile_column]:
+                    continue
+                column_slice = slice(
+                    tile_column * tile_columns,
+                    min(columns, (tile_column + 1) * tile_columns))
+                tile = dm.pairwise_distances(
+                    X_a[row_slice], X_b[column_slice], distance, params,
+                    n_jobs, symmetric=symmetric and tile_row == tile_column)
+                matrix[row_slice, column_slice] = tile
+                if symmetric:
+                    matrix[column_slice, row_slice] = tile.T
+                matrix.flush()
+                done[tile_row, tile_column] = True
+                done.flush()
+            if rows_done is not None:
+                rows_done(matrix, row_slice)
+        del matrix, done
+        os.remove(mask_path)
+        return self.load(matrix_dir)
@@ -7,17 +7,36 @@ __copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
                 "information in"
 __email__ = "s2092795@stud.uni-frankfurt.de"
 
-from math import sqrt
+import sys
 from pathlib import Path
 
 import pgfplots as pp
 import textable as tt
 import file_ops as fo
-from dataset_details import datasets_details_json_path, generate_datasets_details
-from dataset_details import datasets_property_values_list, \
-    datasets_with_property_value
+from build_graph import BuildGraph, Step
+from dataset_details import datasets_details_json_path, \
+    generate_datasets_details_json, generate_details_tables, \
+    generate_imbalance_table
+from selected_datasets import datasets
+from result_set import ResultSet
 import progress_indication as p
-import json
+
+# every result file is parsed once and shared by all reports
+result_set = ResultSet()
+
+# datasets properties the rankings are correlated with, each gets a plot and a
+# table
+correlation_properties = {
+    'num_of_classes': {'axis': 'Class Cardinality',
+                       'caption': 'Correlation of Number of Classes and Ranking',
+                       'label': 'corr-classes', 'header': 'Classes'},
+    'num_of_dimensions': {'axis': 'Dimension Cardinality',
+                          'caption': 'Correlation of Number of Dimensions and Ranking',
+                          'label': 'corr-dimensions', 'header': 'Dimensions'},
+    'domain': {'axis': 'Domain',
+               'caption': 'Correlation of Domains and Ranking',
+               'label': 'corr-domains', 'header': 'Domains'}
+}
 
 
 def archive_for(archive='UEA', wws='1.0'):
@@ -31,160 +50,68 @@ def archive_for(archive='UEA', wws='1.0'):
     return json_store + json_files_dict[wws][archives[archive.upper()]]
 
 
-def archive_data(archive):
-    with open(archive) as archive_json:
-        return json.load(archive_json)
-
-
-def ranking(scores, do_not_rank=None):
-    exclude = ['arguments', 'runtime']
-    if do_not_rank is not None:
-        exclude += do_not_rank
-    keys = [key for key in scores.keys() if key not in exclude]
-    squared_result = 0
-    for key in keys:
-        squared_result += scores[key] ** 2
-    return sqrt(squared_result)
-
-
 def ranking_for_wws(wws, do_not_rank=[]):
     # concatenate both datasets for uea and ucr
-    data = archive_data(archive_for('uea', '1.0'))
-    data.update(archive_data(archive_for('ucr', '1.0')))
-    datasets = [dataset for dataset in data.keys()]
-    metrics = [metric for metric in data[datasets[0]].keys() if
-               metric != 'properties']
-    rankings = {}
-    for metric in metrics:
-        accumulated_ranking = 0
-        for dataset in datasets:
-            accumulated_ranking += ranking(data[dataset][metric])
-        average_metric_ranking = accumulated_ranking / len(datasets)
-        rankings[metric] = average_metric_ranking
-    return rankings
-
-
-def datasets_high_scores(data=None):
-    if data is None:
-        return None
-    datasets = list(data.keys())
-    metrics = [key for key in data[datasets[0]].keys() if key != 'properties']
-    scores = [key for key in data[datasets[0]][metrics[0]].keys() if
-              key != 'arguments']
-    high_score_dict = {}
-    for dataset in datasets:
-
-        high_score_dict[dataset] = {}
-
-        for score in scores:
-
-            high_score = 0 if score != 'runtime' else float('inf')
-            comparator = max if score != 'runtime' else min
-
-            for metric in metrics:
-                score_value = data[dataset][metric][score]
-                if score_value == comparator(score_value, high_score):
-                    high_score = score_value
-                    high_score_dict[dataset][score] = metric
-    return high_score_dict
-
-
-def generate_number_property_correlation_plot(uea_json_path, ucr_json_path,
-                                              scb='1.0', property_name='',
-                                              y_axis_name=''):
-    path_dict = fo.path_dictionary(uea_json_path)
-    plot_file_name = f'pgfplot_{scb_name(scb)}_ranking_over_{property_name}.tex'
-    pgf_path = Path(path_dict['tex_corr'], plot_file_name)
-    sources = [uea_json_path, ucr_json_path, datasets_details_json_path]
-    with open(uea_json_path) as uea_json_file:
-        data = json.load(uea_json_file)
-    with open(ucr_json_path) as ucr_json_file:
-        data.update(json.load(ucr_json_file))
-    cardinalities = datasets_property_values_list(property_name)
+    scores = result_set.scores([[archive_for('uea', '1.0'),
+                                 archive_for('ucr', '1.0')]])
+    average_rankings = scores.dataset_mean(scores.ranking())[0]
+    return dict(zip(scores.metrics, average_rankings.tolist()))
 
-    metrics = [metric for metric in data[list(data.keys())[0]] if
-               metric != 'properties']
 
-    # find the average ranking for each metric
-    average_rankings = ranking_for_wws(scb)
-    class_cardinality_scores = {}
-    xtick_labels = []
-    for cardinality in cardinalities:
-        xtick_labels.append(str(cardinality))
-        class_cardinality_scores[cardinality] = {}
-        cardinality_datasets = datasets_with_property_value(
-            property_name, cardinality)
-        for index, metric in enumerate(metrics):
-            metric_average_ranking = average_rankings[metric]
-            ranking_sum = 0
-            for dataset in cardinality_datasets:
-                ranking_sum += ranking(data[dataset][metric])
-            ranking_ave = ranking_sum / len(cardinality_datasets)
-            normalized_ranking_ave = ranking_ave / metric_average_ranking
-            # spread graphs
-            spread_normalized_ranking_ave = normalized_ranking_ave + index
-            class_cardinality_scores[cardinality][
-                metric] = spread_normalized_ranking_ave
-
-    progress = p.Progress(f'Writing datasets plots {plot_file_name}')
-
-    plot = pp.CorrelationPlots(pgf_path, y_axis_name, 'Algorithm',
-                               xtick_labels, sources)
-
-    for metric in metrics:
-        plot.add_data(metric, [
-            [cardinality, class_cardinality_scores[cardinality][metric]]
-            for cardinality in cardinalities])
-        progress.progress()
-
-    del plot  # to ensure destructor is called before program exits
-    progress.end()
+def property_correlation(uea_json_path, ucr_json_path, property_name):
+    """
+    averages the rankings of every metric over the datasets of each value of
+    a datasets property, for all values at once
+    :param uea_json_path: path of the UEA results
+    :param ucr_json_path: path of the UCR results
+    :param property_name: name of a property in the datasets details,
+        numeric or string
+    :return: a tuple of the list of metrics, the sorted list of property
+        values, an array of shape (values, metrics) with the average
+        rankings and an array with the number of datasets of each value
+    """
+    scores = result_set.scores([[uea_json_path, ucr_json_path]])
+    values, datasets, groups = result_set.property_groups(property_name)
+    rankings, counts = scores.group_mean(scores.ranking(), datasets, groups,
+                                         len(values))
+    return scores.metrics, values, rankings[0], counts[0]
 
 
-def generate_string_property_correlation_plot(uea_json_path, ucr_json_path,
-                                              scb='1.0', property_name='',
-                                              y_axis_name=''):
+def generate_property_correlation_plot(uea_json_path, ucr_json_path,
+                                       scb='1.0', property_name='',
+                                       y_axis_name='', external_data=False,
+                                       csv_base_dir=None):
     path_dict = fo.path_dictionary(uea_json_path)
     plot_file_name = f'pgfplot_{scb_name(scb)}_ranking_over_{property_name}.tex'
     pgf_path = Path(path_dict['tex_corr'], plot_file_name)
     sources = [uea_json_path, ucr_json_path, datasets_details_json_path]
-    with open(uea_json_path) as uea_json_file:
-        data = json.load(uea_json_file)
-    with open(ucr_json_path) as ucr_json_file:
-        data.update(json.load(ucr_json_file))
-    prop_value_list = datasets_property_values_list(property_name)
-
-    metrics = [metric for metric in data[list(data.keys())[0]] if
-               metric != 'properties']
+    metrics, prop_values, rankings, _ = property_correlation(
+        uea_json_path, ucr_json_path, property_name)
 
-    # find the average ranking for each metric
+    # normalize by the average ranking for each metric and spread graphs
     average_rankings = ranking_for_wws(scb)
-    prop_value_scores = {}
-    prop_value_labels = []
-    for prop_value in prop_value_list:
-        prop_value_labels.append(prop_value)
-        prop_value_scores[prop_value] = {}
-        prop_value_datasets = datasets_with_property_value(
-            property_name, prop_value)
-        for index, metric in enumerate(metrics):
-            metric_average_ranking = average_rankings[metric]
-            ranking_sum = 0
-            for dataset in prop_value_datasets:
-                ranking_sum += ranking(data[dataset][metric])
-            ranking_ave = ranking_sum / len(prop_value_datasets)
-            normalized_ranking_ave = ranking_ave / metric_average_ranking
-            spread_normalized_ranking_ave = normalized_ranking_ave + index
-            prop_value_scores[prop_value][metric] = spread_normalized_ranking_ave
+    average_rankings = [average_rankings[metric] for metric in metrics]
+    prop_value_scores = (rankings / average_rankings +
+                         range(len(metrics))).T.tolist()
 
     progress = p.Progress(f'Writing datasets plots {plot_file_name}')
-    plot = pp.CorrelationXStrPlots(pgf_path, y_axis_name, 'Algorithm',
-                                   prop_value_labels, sources)
-
-    for metric in metrics:
+    if isinstance(prop_values[0], str):
         # we want to start at x = 1
-        plot.add_data(metric, [
-            [prop_value_labels.index(domain) + 1, prop_value_scores[domain][metric]]
-            for domain in prop_value_list])
+        x_values = list(range(1, len(prop_values) + 1))
+        plot = pp.CorrelationXStrPlots(pgf_path, y_axis_name, 'Algorithm',
+                                       prop_values, sources,
+                                       external_data=external_data,
+                                       csv_base_dir=csv_base_dir)
+    else:
+        x_values = prop_values
+        plot = pp.CorrelationPlots(pgf_path, y_axis_name, 'Algorithm',
+                                   [str(value) for value in prop_values],
+                                   sources, external_data=external_data,
+                                   csv_base_dir=csv_base_dir)
+
+    for metric, metric_scores in zip(metrics, prop_value_scores):
+        plot.add_data(metric, [list(point) for point
+                               in zip(x_values, metric_scores)])
         progress.progress()
 
     del plot  # to ensure destructor is called before program exits
@@ -192,7 +119,8 @@ def generate_string_property_correlation_plot(uea_json_path, ucr_json_path,
 
 
 def generate_trend_diagram(folder='', file_list=None, name='',
-                           do_not_rank=None):
+                           do_not_rank=None, external_data=False,
+                           csv_base_dir=None):
     if file_list is None:
         file_list = []
     if do_not_rank is None:
@@ -207,48 +135,30 @@ def generate_trend_diagram(folder='', file_list=None, name='',
     for file in file_list:
         sources.append(folder + file)
 
-    all_files_data = {}  # initialize empty dictionary
-    # collect all data
-    for file in file_list:
-        file_path = folder + file
-
-        with open(file_path) as scoring_file:
-            temp_data = json.load(scoring_file)
-
-        datasets = temp_data.keys()
-        wws = temp_data[list(datasets)[0]]['bagdtw']['arguments']['window']
-
-        # clean dictionary of unnecessary data
-        for dataset in datasets:
-            temp_data[dataset].pop('properties')
-            metrics = temp_data[dataset].keys()
-            for metric in metrics:
-                temp_data[dataset][metric].pop('arguments')
-
-        all_files_data[wws] = temp_data
-
-    wwss = list(all_files_data.keys())
-    datasets = list(all_files_data[wwss[0]].keys())
-    metrics = list(all_files_data[wwss[0]][datasets[0]].keys())
-    scores = list(all_files_data[wwss[0]][datasets[0]][metrics[0]].keys())
+    scores = result_set.scores(sources)
+    # the window of a file is the one its results were computed with
+    wwss = []
+    for source in sources:
+        data = result_set.data(source)
+        wwss.append(data[list(data.keys())[0]]['bagdtw']['arguments']['window'])
+    mean_rankings = scores.dataset_mean(scores.ranking(do_not_rank)).tolist()
+    mean_runtimes = scores.dataset_mean(scores.score('runtime')).tolist()
+    runtime_errors = scores.runtime_errors()
 
     progress = p.Progress(f'Writing datasets plots {plot_file_name}')
     plot = pp.TrendPlots(pgf_path, 'Mean Runtime', 'Mean Ranking', sources,
-                         True)
+                         True, external_data=external_data,
+                         csv_base_dir=csv_base_dir)
+    plot.x_error_bars = runtime_errors is not None
 
-    for metric in metrics:
+    for m, metric in enumerate(scores.metrics):
         table_data = []
-        for wws in wwss:
-            datasets = list(all_files_data[wws].keys())
-            accumulated_scoring = 0
-            accumulated_runtime = 0
-            for dataset in datasets:
-                accumulated_scoring += ranking(
-                    all_files_data[wws][dataset][metric], do_not_rank)
-                accumulated_runtime += all_files_data[wws][dataset][metric][
-                    'runtime']
-            table_data.append([accumulated_runtime / len(datasets),
-                               accumulated_scoring / len(datasets), abs(wws)])
+        for w, wws in enumerate(wwss):
+            table_data.append([mean_runtimes[w][m], mean_rankings[w][m],
+                               abs(wws)])
+            if runtime_errors is not None:
+                table_data[-1] += [float(errors[w, m])
+                                   for errors in runtime_errors]
             plot.add_data(metric, table_data)
             progress.progress()
 
@@ -257,43 +167,50 @@ def generate_trend_diagram(folder='', file_list=None, name='',
 
 
 def generate_score_diagram(json_path, plot_name_specific='',
-                           score_name='ranking', do_not_rank=None):
+                           score_name='ranking', do_not_rank=None,
+                           external_data=False, csv_base_dir=None):
     path_dict = fo.path_dictionary(json_path)
     plot_file_name = f'pgfplot_{score_name}_{"".join([c for c in plot_name_specific if c != " "])}.tex'
     pgf_path = Path(path_dict['tex_dir'], plot_file_name)
     sources = [json_path]
-    with open(json_path) as json_file:
-        data = json.load(json_file)
-
-    datasets = list(data.keys())
-    # read metrics and drop properties
-    metrics = list(data[datasets[0]].keys())
-    metrics.remove('properties')
+    scores = result_set.scores(sources)
+    metrics = scores.metrics
+    mean_scores, mean_runtimes = mean_scores_and_runtimes(scores, score_name,
+                                                          do_not_rank)
+    runtime_errors = scores.runtime_errors()
 
     progress = p.Progress(f'Writing datasets plots {plot_file_name}')
     plot = pp.TexPlots(pgf_path, 'Mean Runtime',
-                       f'Mean {score_name.capitalize()}', sources, True)
-
-    for metric in metrics:
-        # iterate over datasets for metric and find averages
-        accumulated_scoring = 0
-        accumulated_runtime = 0
-        for dataset in datasets:
-            if score_name == 'ranking':
-                accumulated_scoring += ranking(data[dataset][metric],
-                                               do_not_rank)
-            else:
-                accumulated_scoring += data[dataset][metric][score_name]
-            accumulated_runtime += data[dataset][metric]['runtime']
-
-        table_data = [[accumulated_runtime / len(datasets),
-                       accumulated_scoring / len(datasets)]]
+                       f'Mean {score_name.capitalize()}', sources, True,
+                       external_data=external_data, csv_base_dir=csv_base_dir)
+    plot.x_error_bars = runtime_errors is not None
+
+    for m, metric in enumerate(metrics):
+        # averages over the datasets for metric
+        table_data = [[mean_runtimes[metric], mean_scores[metric]]]
+        if runtime_errors is not None:
+            table_data[0] += [float(errors[0, m]) for errors in runtime_errors]
         plot.add_data(metric, table_data)
         progress.progress()
     del plot  # to ensure destructor is called before program exits
     progress.end()
 
 
+def mean_scores_and_runtimes(scores, score_name='ranking', do_not_rank=None):
+    """
+    :param scores: a ScoreArray of a single result file
+    :param score_name: name of the score averaged, or 'ranking'
+    :param do_not_rank: list of scores left out of the ranking
+    :return: a tuple of two dictionaries mapping the metrics to their mean
+        score and mean runtime over all datasets
+    """
+    values = scores.ranking(do_not_rank) if score_name == 'ranking' \
+        else scores.score(score_name)
+    return dict(zip(scores.metrics, scores.dataset_mean(values)[0].tolist())), \
+        dict(zip(scores.metrics,
+                 scores.dataset_mean(scores.score('runtime'))[0].tolist()))
+
+
 def generate_table(json_path, dataset_details_file, table_name_specific='',
                    split_table_metrics=None, do_not_rank=None):
     path_dict = fo.path_dictionary(json_path)
@@ -306,24 +223,22 @@ def generate_table(json_path, dataset_details_file, table_name_specific='',
     sources = [json_path, dataset_details_file]
 
     # load dataset details
-    with open(dataset_details_file) as dd_file:
-        dataset_details = json.load(dd_file)
-
-    with open(json_path) as json_file:
-        data = json.load(json_file)
+    dataset_details = result_set.data(dataset_details_file)
 
-    high_scores = datasets_high_scores(data)
+    score_array = result_set.scores([json_path])
+    score_values = score_array.values[0].tolist()
+    high_scores = score_array.high_scores()
 
-    datasets = list(data.keys())
+    datasets = score_array.datasets
     # read metrics and drop properties
-    metrics = [key for key in data[datasets[0]] if key != 'properties']
+    metrics = score_array.metrics
 
     # split metrics into schemes for the two tables
     table_metrics_schemes = [sorted(split_table_metrics), sorted(list(set(metrics) - set(split_table_metrics)))]
 
     # read scores and drop arguments
     omitted = do_not_rank + ['arguments']
-    scores = [key for key in data[datasets[0]][metrics[0]] if key not in omitted]
+    scores = [key for key in score_array.scores if key not in omitted]
     scores = [score for score in scores if score not in do_not_rank]  # FixMe: line seems to be redundant
 
     for table_metrics_scheme in table_metrics_schemes:
@@ -346,14 +261,16 @@ def generate_table(json_path, dataset_details_file, table_name_specific='',
         scores_table = tt.ScoreTexTable(table_path, table_column_formatter,
                                         table_caption, table_label, table_metrics_scheme, scores, sources)
 
-        for dataset in datasets:
+        for d, dataset in enumerate(datasets):
             table_line_list = [dataset_details[dataset]['short_name']]
 
             format_bold = [False]  # short_name should not be bold
 
             for metric in table_metrics_scheme:
+                m = metrics.index(metric)
                 for score in scores:
-                    table_line_list.append(data[dataset][metric][score])
+                    table_line_list.append(
+                        score_values[d][m][score_array.scores.index(score)])
                     format_bold.append(True if high_scores[dataset][score] == metric else False)
             scores_table.add_line(table_line_list, format_bold)
 
@@ -375,172 +292,28 @@ def human_readable(message):
     return f'{name} {value}'
 
 
-def generate_classes_correlation_table(uea_json_path, ucr_json_path,
-                                       scb='1.0'):
-    path_dict = fo.path_dictionary(uea_json_path)
-    table_file_name = f'table_{scb_name(scb)}_ranking_over_num_of_classes.tex'
-    table_path = Path(path_dict['tex_corr'], table_file_name)
-    sources = [uea_json_path, ucr_json_path, datasets_details_json_path]
-    with open(uea_json_path) as uea_json_file:
-        data = json.load(uea_json_file)
-    with open(ucr_json_path) as ucr_json_file:
-        data.update(json.load(ucr_json_file))
-    cardinalities = datasets_property_values_list('num_of_classes')
-
-    datasets = list(data.keys())
-    # read metrics and drop properties
-    metrics = [key for key in data[datasets[0]] if key != 'properties']
-
-    table_caption = 'Correlation of Number of Classes and Ranking'
-    table_label = 'corr-classes'
-
-    score_columns_formatter = 'c'
-    # table_column_formatter works as formatter list since all formats are single chars
-    table_column_formatter = f'|l|c|{"|".join(score_columns_formatter for _ in range(len(metrics)))}|'
-
-    class_cardinality_scores = {}
-    num_datasets_in_cardinality = {}
-    for cardinality in cardinalities:
-        class_cardinality_scores[cardinality] = {}
-        cardinality_datasets = datasets_with_property_value(
-            'num_of_classes', cardinality)
-        num_datasets_in_cardinality[cardinality] = len(cardinality_datasets)
-        for index, metric in enumerate(metrics):
-            ranking_sum = 0
-            for dataset in cardinality_datasets:
-                ranking_sum += ranking(data[dataset][metric])
-            ranking_ave = ranking_sum / len(cardinality_datasets)
-            class_cardinality_scores[cardinality][metric] = ranking_ave
-
-    progress = p.Progress(f'Writing classes-ranking-correlation table {table_file_name}')
-    correlation_table = tt.CorrelationTexTable(table_path, table_column_formatter,
-                                               table_caption, table_label, metrics, ['Ranking'], 'Classes', sources)
-
-    for cardinality in cardinalities:
-        table_line_list = [str(cardinality)]
-        table_line_list.append(str(num_datasets_in_cardinality[cardinality]))
-        format_bold = [False, False]
-
-        for metric in metrics:
-            table_line_list.append(class_cardinality_scores[cardinality][metric])
-            format_bold.append(False)  # (True if high_scores[dataset][score] == metric else False)
-        correlation_table.add_line(table_line_list, format_bold)
-
-        progress.progress()
-
-    del correlation_table  # to make sure destructor is called
-    progress.end()
-
-
-def generate_dimensions_correlation_table(uea_json_path, ucr_json_path, scb='1.0'):
+def generate_property_correlation_table(uea_json_path, ucr_json_path,
+                                        scb='1.0', property_name='',
+                                        caption='', label='', header=''):
     path_dict = fo.path_dictionary(uea_json_path)
-    table_file_name = f'table_{scb_name(scb)}_ranking_over_num_of_dimensions.tex'
+    table_file_name = f'table_{scb_name(scb)}_ranking_over_{property_name}.tex'
     table_path = Path(path_dict['tex_corr'], table_file_name)
     sources = [uea_json_path, ucr_json_path, datasets_details_json_path]
-    with open(uea_json_path) as uea_json_file:
-        data = json.load(uea_json_file)
-    with open(ucr_json_path) as ucr_json_file:
-        data.update(json.load(ucr_json_file))
-    cardinalities = datasets_property_values_list('num_of_dimensions')
-
-    datasets = list(data.keys())
-    # read metrics and drop properties
-    metrics = [key for key in data[datasets[0]] if key != 'properties']
-
-    table_caption = 'Correlation of Number of Dimensions and Ranking'
-    table_label = 'corr-dimensions'
+    metrics, prop_values, rankings, counts = property_correlation(
+        uea_json_path, ucr_json_path, property_name)
 
     score_columns_formatter = 'c'
     # table_column_formatter works as formatter list since all formats are single chars
     table_column_formatter = f'|l|c|{"|".join(score_columns_formatter for _ in range(len(metrics)))}|'
 
-    dimension_cardinality_scores = {}
-    num_datasets_in_cardinality = {}
-    for cardinality in cardinalities:
-        dimension_cardinality_scores[cardinality] = {}
-        cardinality_datasets = datasets_with_property_value(
-            'num_of_dimensions', cardinality)
-        num_datasets_in_cardinality[cardinality] = len(cardinality_datasets)
-        for index, metric in enumerate(metrics):
-            ranking_sum = 0
-            for dataset in cardinality_datasets:
-                ranking_sum += ranking(data[dataset][metric])
-            ranking_ave = ranking_sum / len(cardinality_datasets)
-            dimension_cardinality_scores[cardinality][metric] = ranking_ave
-
-    progress = p.Progress(f'Writing dimension-ranking-correlation table {table_file_name}')
+    progress = p.Progress(f'Writing {property_name}-ranking-correlation table {table_file_name}')
     correlation_table = tt.CorrelationTexTable(table_path, table_column_formatter,
-                                               table_caption, table_label, metrics, ['Ranking'], 'Dimensions', sources)
-
-    for cardinality in cardinalities:
-        table_line_list = [str(cardinality)]
-        table_line_list.append(str(num_datasets_in_cardinality[cardinality]))
-        format_bold = [False, False]
+                                               caption, label, metrics, ['Ranking'], header, sources)
 
-        for metric in metrics:
-            table_line_list.append(dimension_cardinality_scores[cardinality][metric])
-            format_bold.append(False)  # (True if high_scores[dataset][score] == metric else False)
-        correlation_table.add_line(table_line_list, format_bold)
-
-        progress.progress()
-
-    del correlation_table  # to make sure destructor is called
-    progress.end()
-
-
-def generate_domains_correlation_table(uea_json_path, ucr_json_path, scb='1.0'):
-    path_dict = fo.path_dictionary(uea_json_path)
-    table_file_name = f'table_{scb_name(scb)}_ranking_over_domain.tex'
-    table_path = Path(path_dict['tex_corr'], table_file_name)
-    sources = [uea_json_path, ucr_json_path, datasets_details_json_path]
-    with open(uea_json_path) as uea_json_file:
-        data = json.load(uea_json_file)
-    with open(ucr_json_path) as ucr_json_file:
-        data.update(json.load(ucr_json_file))
-    domain_list = datasets_property_values_list('domain')
-
-    datasets = list(data.keys())
-    # read metrics and drop properties
-    metrics = [key for key in data[datasets[0]] if key != 'properties']
-
-    table_caption = 'Correlation of Domains and Ranking'
-    table_label = 'corr-domains'
-
-    score_columns_formatter = 'c'
-    # table_column_formatter works as formatter list since all formats are single chars
-    table_column_formatter = f'|l|c|{"|".join(score_columns_formatter for _ in range(len(metrics)))}|'
-
-    domain_scores = {}
-    num_datasets_in_domain = {}
-    for domain in domain_list:
-        domain_scores[domain] = {}
-        domain_datasets = datasets_with_property_value('domain', domain)
-        num_datasets_in_domain[domain] = len(domain_datasets)
-        for index, metric in enumerate(metrics):
-            ranking_sum = 0
-            for dataset in domain_datasets:
-                ranking_sum += ranking(data[dataset][metric])
-            ranking_ave = ranking_sum / len(domain_datasets)
-            domain_scores[domain][metric] = ranking_ave
-
-    progress = p.Progress(
-        f'Writing domains-ranking-correlation table {table_file_name}')
-    correlation_table = tt.CorrelationTexTable(table_path,
-                                               table_column_formatter,
-                                               table_caption, table_label,
-                                               metrics, ['Ranking'], 'Domains',
-                                               sources)
-
-    for domain in domain_list:
-        table_line_list = [domain]
-        table_line_list.append(str(num_datasets_in_domain[domain]))
-        format_bold = [False, False]
-
-        for metric in metrics:
-            table_line_list.append(domain_scores[domain][metric])
-            format_bold.append(
-                False)  # (True if high_scores[dataset][score] == metric
-        # else False)
+    for prop_value, count, prop_value_rankings in zip(prop_values, counts,
+                                                      rankings.tolist()):
+        table_line_list = [str(prop_value), str(count)] + prop_value_rankings
+        format_bold = [False for _ in table_line_list]
         correlation_table.add_line(table_line_list, format_bold)
 
         progress.progress()
@@ -550,36 +323,26 @@ def generate_domains_correlation_table(uea_json_path, ucr_json_path, scb='1.0'):
 
 
 def generate_distance_consolidations_diagram(json_path, score_name='ranking',
-                                             do_not_rank=None):
+                                             do_not_rank=None,
+                                             external_data=False,
+                                             csv_base_dir=None):
     path_dict = fo.path_dictionary(json_path)
     plot_file_name = f'pgfplot_{score_name}_distance_consolidations.tex'
     pgf_path = Path(path_dict['tex_dir'], plot_file_name)
     sources = [json_path]
-    with open(json_path) as json_file:
-        data = json.load(json_file)
-
-    datasets = list(data.keys())
-    # read metrics and drop properties
-    metrics = sorted([key for key in data[datasets[0]] if key != 'properties'])
+    scores = result_set.scores(sources)
+    metrics = sorted(scores.metrics)
+    mean_scores, mean_runtimes = mean_scores_and_runtimes(scores, score_name,
+                                                          do_not_rank)
 
     progress = p.Progress(f'Writing datasets plots {plot_file_name}')
     plot = pp.TexPlots(pgf_path, 'Mean Runtime',
-                       f'Mean {score_name.capitalize()}', sources)
+                       f'Mean {score_name.capitalize()}', sources,
+                       external_data=external_data, csv_base_dir=csv_base_dir)
 
     for metric in metrics:
-        # iterate over datasets for metric and find averages
-        accumulated_scoring = 0
-        accumulated_runtime = 0
-        for dataset in datasets:
-            if score_name == 'ranking':
-                accumulated_scoring += ranking(data[dataset][metric],
-                                               do_not_rank)
-            else:
-                accumulated_scoring += data[dataset][metric][score_name]
-            accumulated_runtime += data[dataset][metric]['runtime']
-
-        table_data = [[accumulated_runtime / len(datasets),
-                       accumulated_scoring / len(datasets)]]
+        # averages over the datasets for metric
+        table_data = [[mean_runtimes[metric], mean_scores[metric]]]
         plot.add_data(metric, table_data)
         progress.progress()
     del plot  # to ensure destructor is called before program exits
@@ -597,22 +360,19 @@ def generate_distance_consolidations_table(json_path, dataset_details_file,
     sources = [json_path, dataset_details_file]
 
     # load dataset details
-    with open(dataset_details_file) as dd_file:
-        dataset_details = json.load(dd_file)
+    dataset_details = result_set.data(dataset_details_file)
 
-    with open(json_path) as json_file:
-        data = json.load(json_file)
+    score_array = result_set.scores([json_path])
+    score_values = score_array.values[0].tolist()
+    high_scores = score_array.high_scores()
 
-    high_scores = datasets_high_scores(data)
-
-    datasets = list(data.keys())
+    datasets = score_array.datasets
     # read metrics and drop properties
-    metrics = sorted([key for key in data[datasets[0]] if key != 'properties'])
+    metrics = sorted(score_array.metrics)
 
     # read scores and drop arguments
     omitted = do_not_rank + ['arguments']
-    scores = [key for key in data[datasets[0]][metrics[0]] if
-              key not in omitted]
+    scores = [key for key in score_array.scores if key not in omitted]
     scores = [score for score in scores if score not in do_not_rank]
 
     table_file_name = f'table_distance_consolidations.tex'
@@ -632,14 +392,16 @@ def generate_distance_consolidations_table(json_path, dataset_details_file,
                                    table_caption, table_label, metrics, scores,
                                    sources)
 
-    for dataset in datasets:
+    for d, dataset in enumerate(datasets):
         table_line_list = [dataset_details[dataset]['short_name']]
 
         format_bold = [False]  # short_name should not be bold
 
         for metric in metrics:
+            m = score_array.metrics.index(metric)
             for score in scores:
-                table_line_list.append(data[dataset][metric][score])
+                table_line_list.append(
+                    score_values[d][m][score_array.scores.index(score)])
                 format_bold.append(
                     True if high_scores[dataset][score] == metric else False)
         norms_table.add_line(table_line_list, format_bold)
@@ -659,8 +421,19 @@ def scb_name(scb):
     return f'scb-size_{scb.replace(".", "-")}'
 
 
-if __name__ == '__main__':
-
+def report_steps(external_data=False, details=False, csv_base_dir=None):
+    """
+    :param external_data: whether plots keep their data in csv files and
+        are named for the tikz externalization library
+    :param csv_base_dir: directory the csv paths in external plots are
+        relative to, e.g. the one of the main document, None for the
+        directory of each tex file
+    :param details: whether the datasets details json is generated again
+        from the datasets, which needs sktime, instead of being read as
+        committed
+    :return: list of the build_graph.Steps generating all tex files, each
+        with the files it reads
+    """
     json_store = './Benchmarks/json/'
     json_files_dict = {
         '1.0': ['UEA_archive_wws--1.json', 'UCR_archive_wws--1.json'],
@@ -669,43 +442,79 @@ if __name__ == '__main__':
     }
     wws_list = ['1.0', '0.3', '0.1']
     scoring_methods = ['ranking', 'accuracy', 'recall', 'f1-score', 'auroc']
+    # ranking_for_wws normalizes the correlation plots by these archives
+    ranking_sources = [archive_for('uea', '1.0'), archive_for('ucr', '1.0')]
+    plot_kwargs = {'external_data': True} if external_data else {}
+    if external_data and csv_base_dir is not None:
+        plot_kwargs['csv_base_dir'] = csv_base_dir
+
+    steps = [Step(generate_datasets_details_json, (datasets,), [],
+                  [datasets_details_json_path])] if details else []
+    steps += [Step(generate_details_tables, (datasets_details_json_path,),
+                   [datasets_details_json_path]),
+              Step(generate_imbalance_table, (datasets_details_json_path,),
+                   [datasets_details_json_path])]
 
     uea_list = []
     ucr_list = []
 
-    generate_datasets_details()
-
     for wws in wws_list:
         for json_file in json_files_dict[wws]:
-            generate_table(json_store + json_file, datasets_details_json_path, scb_name(wws),
-                           ['bagdtw', 'dagdtw', 'sdtw'])
+            json_path = json_store + json_file
+            steps.append(Step(generate_table,
+                              (json_path, datasets_details_json_path,
+                               scb_name(wws), ['bagdtw', 'dagdtw', 'sdtw']),
+                              [json_path, datasets_details_json_path]))
             for score in scoring_methods:
-                generate_score_diagram(json_store + json_file, scb_name(wws), score)
-
-        generate_number_property_correlation_plot(json_store + json_files_dict[wws][0],
-                                                  json_store + json_files_dict[wws][1], wws,
-                                                  'num_of_classes', 'Class Cardinality')
-        generate_classes_correlation_table(json_store + json_files_dict[wws][0],
-                                           json_store + json_files_dict[wws][1], wws)
-
-        generate_number_property_correlation_plot(json_store + json_files_dict[wws][0],
-                                                  json_store + json_files_dict[wws][1], wws,
-                                                  'num_of_dimensions', 'Dimension Cardinality')
-        generate_dimensions_correlation_table(json_store + json_files_dict[wws][0],
-                                              json_store + json_files_dict[wws][1], wws)
-
-        generate_string_property_correlation_plot(json_store + json_files_dict[wws][0],
-                                                  json_store + json_files_dict[wws][1], wws,
-                                                  'domain', 'Domain')
-        generate_domains_correlation_table(json_store + json_files_dict[wws][0],
-                                           json_store + json_files_dict[wws][1], wws)
+                steps.append(Step(generate_score_diagram,
+                                  (json_path, scb_name(wws), score),
+                                  [json_path], kwargs=plot_kwargs))
+
+        uea_path, ucr_path = [json_store + json_file
+                              for json_file in json_files_dict[wws]]
+        sources = [uea_path, ucr_path, datasets_details_json_path]
+        for property_name, correlation in correlation_properties.items():
+            steps.append(Step(generate_property_correlation_plot,
+                              (uea_path, ucr_path, wws, property_name,
+                               correlation['axis']),
+                              sources + ranking_sources, kwargs=plot_kwargs))
+            steps.append(Step(generate_property_correlation_table,
+                              (uea_path, ucr_path, wws, property_name,
+                               correlation['caption'], correlation['label'],
+                               correlation['header']),
+                              sources))
 
         uea_list.append(json_files_dict[wws][0])  # build file lists for the trend diagrams
         ucr_list.append(json_files_dict[wws][1])
 
-    generate_trend_diagram(json_store, uea_list, 'UEA')
-    generate_trend_diagram(json_store, ucr_list, 'UCR')
+    steps.append(Step(generate_trend_diagram, (json_store, uea_list, 'UEA'),
+                      [json_store + json_file for json_file in uea_list],
+                      kwargs=plot_kwargs))
+    steps.append(Step(generate_trend_diagram, (json_store, ucr_list, 'UCR'),
+                      [json_store + json_file for json_file in ucr_list],
+                      kwargs=plot_kwargs))
+
+    json_data_path = json_store + 'UEA_distance_consolidations_0-03.json'
+    steps.append(Step(generate_distance_consolidations_table,
+                      (json_data_path, datasets_details_json_path),
+                      [json_data_path, datasets_details_json_path]))
+    steps.append(Step(generate_distance_consolidations_diagram,
+                      (json_data_path, 'ranking'), [json_data_path],
+                      kwargs=plot_kwargs))
+    return steps
 
-    json_data_file = 'UEA_distance_consolidations_0-03.json'
-    generate_distance_consolidations_table(json_store + json_data_file, datasets_details_json_path)
-    generate_distance_consolidations_diagram(json_store + json_data_file, 'ranking')
+
+def option_value(name):
+    """
+    :param name: name of a command line option followed by its value
+    :return: the value, None if the option is not given
+    """
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
+
+if __name__ == '__main__':
+    failed = BuildGraph(report_steps('--external' in sys.argv,
+                                     '--details' in sys.argv,
+                                     option_value('--csv-base-dir'))).build(
+        force='--force' in sys.argv)[2]
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,60 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import json
+import subprocess
+import sys
+
+# modules the reports are generated with, they must not need the benchmark
+# dependencies
+reporting_modules = ['generate_tables_and_plots', 'result_set', 'build_graph',
+                     'confusion', 'rescoring', 'analyze_scores']
+
+# packages only loading datasets and running classifiers may import
+heavy_packages = ['sktime', 'sklearn', 'pandas', 'scipy', 'joblib']
+
+# script run in a fresh interpreter for every module
+probe = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def import_time(module, repetitions=5):
+    """
+    imports a module in fresh interpreters
+    :param module: name of the module
+    :param repetitions: number of interpreters started
+    :return: a tuple of the fastest import time in seconds and the list of
+        heavy packages the import pulled in
+    """
+    times = []
+    for _ in range(repetitions):
+        output = subprocess.run([sys.executable, '-c',
+                                 probe.format(module=module)],
+                                capture_output=True, text=True, check=True)
+        measurement = json.loads(output.stdout.splitlines()[-1])
+        times.append(measurement['seconds'])
+    imported = [package for package in heavy_packages
+                if package in measurement['modules']]
+    return min(times), imported
+
+
+if __name__ == '__main__':
+    failed = False
+    for module in reporting_modules:
+        seconds, imported = import_time(module)
+        print(f'{module:<32}{seconds * 1000:>10.1f} ms  '
+              f'{", ".join(imported) if imported else "ok"}')
+        failed |= bool(imported)
+    if failed:
+        print('reporting modules import benchmark dependencies')
+    sys.exit(1 if failed else 0)
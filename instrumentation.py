@@ -0,0 +1,222 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    """
+    :param who: resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN
+    :return: the peak resident set size in bytes
+    """
+    max_rss = resource.getrusage(who).ru_maxrss
+    # linux reports kilobytes, macos bytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def cpu_times():
+    """
+    :return: a tuple of the cpu time used by this process, all threads
+        included, and the cpu time used by its terminated children
+    """
+    times = os.times()
+    return times.user + times.system, \
+        times.children_user + times.children_system
+
+
+class PhaseRecorder:
+    """
+        This class records the time and memory used by the phases of a
+        benchmark job.
+        Time is taken as wall time, cpu time of the process and cpu time of
+        its children; children only count once they have terminated, worker
+        processes kept alive by joblib are therefore not included. The ratio
+        of cpu to wall time shows the effective parallelism of the phase.
+        Memory is recorded as the peak python heap allocation of each phase
+        as traced by tracemalloc, if tracing is turned on, and the peak
+        resident set size of the process and its children at the end of
+        each phase. The resident set size of the process is a high-water
+        mark over its lifetime, which a forked job process inherits from the
+        scheduler, so the mark found when the recorder is created is
+        subtracted: peak-rss is what the process grew beyond it, 0 for jobs
+        staying below it, and the mark itself is kept as rss-baseline.
+    """
+    def __init__(self, trace_memory=False):
+        """
+        :param trace_memory: whether python heap allocations are traced,
+            tracing slows down allocation heavy python code and with it the
+            recorded runtimes
+        """
+        self.trace_memory = trace_memory
+        self.rss_baseline = peak_rss(resource.RUSAGE_SELF)
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        context manager recording the phase with the given name, a phase
+        recorded again replaces the earlier record
+        :param name: string containing the name of the phase
+        """
+        if self.trace_memory:
+            # started with the first phase, the job scheduler creates
+            # recorders for jobs it only inspects
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        cpu_start, children_cpu_start = cpu_times()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu_end, children_cpu_end = cpu_times()
+            cpu = cpu_end - cpu_start
+            children_cpu = children_cpu_end - children_cpu_start
+            self.phases[name] = {
+                'memory': {
+                    'peak-heap': tracemalloc.get_traced_memory()[1]
+                    if self.trace_memory else None,
+                    'peak-rss': peak_rss(resource.RUSAGE_SELF) -
+                    self.rss_baseline,
+                    'rss-baseline': self.rss_baseline,
+                    'peak-rss-children': peak_rss(resource.RUSAGE_CHILDREN)
+                },
+                'timing': {
+                    'wall': wall,
+                    'cpu': cpu,
+                    'children-cpu': children_cpu,
+                    'parallelism': (cpu + children_cpu) / wall if wall else 0
+                }
+            }
+
+    def clear(self, keep=()):
+        """
+        forgets the recorded phases
+        :param keep: names of the phases kept
+        :return: nothing
+        """
+        self.phases = {name: record for name, record in self.phases.items()
+                       if name in keep}
+
+    def memory(self):
+        """
+        :return: dictionary mapping phase names to their memory records
+        """
+        return {name: dict(record['memory'])
+                for name, record in self.phases.items()}
+
+    def timing(self):
+        """
+        :return: dictionary mapping phase names to their timing records
+        """
+        return {name: dict(record['timing'])
+                for name, record in self.phases.items()}
+
+
+def summarize_timings(timings):
+    """
+    adds up the timing records of several jobs phase by phase
+    :param timings: iterable of dictionaries as returned by
+        PhaseRecorder.timing()
+    :return: dictionary mapping phase names to the summed up records
+    """
+    summary = {}
+    for timing in timings:
+        for phase, record in timing.items():
+            totals = summary.setdefault(
+                phase, {'wall': 0, 'cpu': 0, 'children-cpu': 0, 'jobs': 0})
+            totals['wall'] += record['wall']
+            totals['cpu'] += record['cpu']
+            totals['children-cpu'] += record['children-cpu']
+            totals['jobs'] += 1
+    for totals in summary.values():
+        totals['parallelism'] = \
+            (totals['cpu'] + totals['children-cpu']) / totals['wall'] \
+            if totals['wall'] else 0
+    return summary
+
+
+def print_timing_summary(timings, run_wall=None):
+    """
+    prints the phase by phase summary of the given timing records
+    :param timings: iterable of dictionaries as returned by
+        PhaseRecorder.timing()
+    :param run_wall: wall time of the whole run, if given the parallelism
+        over all jobs is printed as well
+    :return: the summary as returned by summarize_timings
+    """
+    summary = summarize_timings(timings)
+    print(f'\n{"phase":<16}{"jobs":>6}{"wall [s]":>14}{"cpu [s]":>14}'
+          f'{"children [s]":>14}{"cpu/wall":>10}')
+    for phase, totals in summary.items():
+        print(f'{phase:<16}{totals["jobs"]:>6}{totals["wall"]:>14.3f}'
+              f'{totals["cpu"]:>14.3f}{totals["children-cpu"]:>14.3f}'
+              f'{totals["parallelism"]:>10.2f}')
+    if run_wall:
+        jobs_wall = sum(totals['wall'] for totals in summary.values())
+        print(f'run wall time {run_wall:.3f} s for {jobs_wall:.3f} s of job '
+              f'phases, {jobs_wall / run_wall:.2f} jobs in parallel on average')
+    return summary
+
+
+def repeat_timed(function, warm_up=0, repetitions=1):
+    """
+    calls a function several times and takes the wall time of every call,
+    the warm-up calls fill caches and trigger first-call compilation and
+    are not timed
+    :param function: function without arguments
+    :param warm_up: number of calls before the timed ones
+    :param repetitions: number of timed calls
+    :return: a tuple of the return value of the last call and the list of
+        wall times of the timed calls
+    """
+    for _ in range(warm_up):
+        function()
+    runtimes = []
+    for _ in range(max(1, repetitions)):
+        start_time = time.perf_counter()
+        value = function()
+        runtimes.append(time.perf_counter() - start_time)
+    return value, runtimes
+
+
+def runtime_statistics(runtimes, warm_up=0, confidence=0.95,
+                       num_resamples=1000, seed=1):
+    """
+    :param runtimes: list of the wall times of repeated calls
+    :param warm_up: number of untimed calls before them
+    :param confidence: confidence level of the bootstrap interval
+    :param num_resamples: number of bootstrap resamples
+    :param seed: seed of the bootstrap resamples
+    :return: dictionary with the median, minimum, interquartile range and
+        the bootstrap percentile interval of the median
+    """
+    runtimes = np.asarray(runtimes, dtype=float)
+    rng = np.random.default_rng(seed)
+    medians = np.median(rng.choice(runtimes, (num_resamples, len(runtimes))),
+                        axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(medians, [tail, 100 - tail])
+    q1, q3 = np.percentile(runtimes, [25, 75])
+    return {
+        'median': float(np.median(runtimes)),
+        'min': float(runtimes.min()),
+        'iqr': float(q3 - q1),
+        'ci-low': float(low),
+        'ci-high': float(high),
+        'warm-up': warm_up,
+        'runtimes': runtimes.tolist()
+    }
@@ -0,0 +1,599 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import errno
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import signal
+import time
+import traceback
+from collections import deque, namedtuple
+from multiprocessing.connection import wait
+from pathlib import Path
+
+import numpy as np
+
+from cost_model import CostModel, lpt_makespan
+from instrumentation import print_timing_summary
+from dataset_cache import DatasetCache
+from result_log import ResultLog, compact, default_log_path, job_key, \
+    effective_key, fan_out, variant_name, write_compacted
+from selected_datasets import datasets
+from thread_budget import ThreadBudget, slot_cpus
+
+Job = namedtuple('Job', ['dataset', 'metric', 'window'])
+
+
+def expand_jobs(datasets, metrics, windows):
+    """
+    expands a benchmark sweep into independent jobs
+    :param datasets: list of dataset names
+    :param metrics: list of metric names as implemented by TimeseriesBenchmark
+    :param windows: list of window sizes
+    :return: a list of Job tuples, one per (dataset, metric, window)
+    """
+    return [Job(dataset, metric, window)
+            for window in windows
+            for dataset in datasets
+            for metric in metrics]
+
+
+def job_benchmark(window, normalized=True, njobs=1, lower_bound_search=False,
+                  multi_composition=False, resampling=None, n_splits=30,
+                  store_distances=False, tuning=False, neighbours=(1,),
+                  weights=('uniform',), save_predictions=True, warm_up=0,
+                  repetitions=1, trace_memory=False):
+    """
+    :param window: the window size
+    :param normalized: whether the dataset is z-normalized
+    :param njobs: number of jobs handed on to the classifier
+    :param lower_bound_search: whether dtw and ddtw use the lower bound search
+    :param multi_composition: whether metrics that only differ in their
+        distance_composition share one distance pass
+    :param resampling: resampling scheme as understood by
+        resampling.splitter, None for a single split
+    :param n_splits: number of splits or folds of the resampling
+    :param store_distances: whether test to train distances are kept in the
+        distance store
+    :param tuning: whether metric arguments are tuned on the training set
+    :param neighbours: numbers of neighbours evaluated from one search
+    :param weights: voting weights evaluated for every number of neighbours
+    :param save_predictions: whether predictions are kept in sidecar files
+    :param warm_up: number of untimed calls before the timed ones
+    :param repetitions: number of timed calls, the runtime is their median
+    :param trace_memory: whether python heap allocations are traced, which
+        slows down the recorded runtimes
+    :return: a TimeseriesBenchmark configured for jobs with the window size
+    """
+    from ts_benchmark import TimeseriesBenchmark
+
+    return TimeseriesBenchmark(window=window, njobs=njobs,
+                               normalized=normalized,
+                               lower_bound_search=lower_bound_search,
+                               multi_composition=multi_composition,
+                               resampling=resampling, n_splits=n_splits,
+                               store_distances=store_distances,
+                               tuning=tuning, neighbours=neighbours,
+                               weights=weights,
+                               save_predictions=save_predictions,
+                               warm_up=warm_up, repetitions=repetitions,
+                               trace_memory=trace_memory)
+
+
+def job_arguments(job, **job_arguments):
+    """
+    :param job: a Job with a single metric
+    :param job_arguments: keyword arguments as taken by job_benchmark
+    :return: list with the arguments every record of the job will have,
+        one per neighbour variant, without running it
+    """
+    return job_benchmark(job.window,
+                         **job_arguments).variant_arguments_for(job.metric)
+
+
+def group_jobs(jobs, **job_arguments):
+    """
+    merges jobs that can share one distance pass into a single job whose
+    metric is a tuple of metric names
+    :param jobs: list of Job tuples with single metrics
+    :param job_arguments: keyword arguments as taken by job_benchmark
+    :return: list of Job tuples
+    """
+    metrics = {}
+    for job in jobs:
+        metrics.setdefault((job.dataset, job.window), []).append(job.metric)
+    grouped_jobs = []
+    for (dataset, window), job_metrics in metrics.items():
+        benchmark = job_benchmark(window, **job_arguments)
+        for group in benchmark.composition_groups(job_metrics):
+            metric = group[0] if len(group) == 1 else tuple(group)
+            grouped_jobs.append(Job(dataset, metric, window))
+    return grouped_jobs
+
+
+def run_job(job, send=None, **job_arguments):
+    """
+    runs a single job in the current process
+    :param job: the Job to run, its metric may be a tuple of metrics that
+        share one distance pass
+    :param send: function taking progress messages, the dataset properties
+        once loaded and the partial 1-NN accuracy after every chunk of the
+        test set, None to run the test set in one go
+    :param job_arguments: keyword arguments as taken by job_benchmark
+    :return: list with the result log records of the job
+    """
+    benchmark = job_benchmark(job.window, **job_arguments)
+    benchmark.loadDataset(job.dataset)
+    properties = benchmark.properties()
+    if send is not None:
+        send(('loaded', properties))
+        benchmark.progress = lambda classified, correct, total: send(
+            ('progress', {'classified': classified, 'correct': correct,
+                          'test instances': total}))
+    metrics = list(job.metric) if isinstance(job.metric, tuple) \
+        else [job.metric]
+    return [{
+        'dataset': job.dataset,
+        'metric': metric,
+        'window': job.window,
+        'properties': properties,
+        'result': result
+    } for metric, result in benchmark.run_metrics(metrics)]
+
+
+def limit_resources(memory_limit=None, cpu_limit=None):
+    """
+    limits the resources of the current process, processes started
+    afterwards inherit the limits
+    :param memory_limit: maximum address space in bytes, allocations beyond
+        it raise a MemoryError, None for no limit
+    :param cpu_limit: maximum cpu time in seconds, the process is terminated
+        by SIGXCPU beyond it, None for no limit
+    :return: nothing
+    """
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if cpu_limit is not None:
+        hard_limit = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, hard_limit))
+
+
+def kill_job(process):
+    """
+    kills the worker process of a job and every process it started
+    :param process: the multiprocessing.Process of the job
+    :return: nothing
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # the group is gone, or the job has not called setsid yet
+        process.kill()
+
+
+def job_process(connection, job, job_arguments, thread_budget,
+                memory_limit=None, cpu_limit=None):
+    """
+    entry point of the worker process, sends the outcome of the job
+    through the connection, and progress messages as well if the job has a
+    limit
+    :param connection: the child end of a multiprocessing pipe
+    :param job: the Job to run
+    :param job_arguments: dictionary with keyword arguments for run_job
+    :param thread_budget: the ThreadBudget of the job
+    :param memory_limit: maximum address space of the job in bytes
+    :param cpu_limit: maximum cpu time of the job in seconds
+    :return: nothing
+    """
+    # a process group of its own, so the joblib workers the job starts are
+    # killed together with it, see kill_job
+    os.setsid()
+    try:
+        thread_budget.apply()
+        limit_resources(memory_limit, cpu_limit)
+        send = None if memory_limit is None and cpu_limit is None \
+            else connection.send
+        connection.send(('done', run_job(job, send, **job_arguments)))
+    except MemoryError:
+        connection.send(('out-of-memory', traceback.format_exc()))
+    except OSError as error:
+        # memory maps beyond the limit fail this way
+        connection.send(('out-of-memory' if error.errno == errno.ENOMEM
+                         else 'failed', traceback.format_exc()))
+    except Exception:
+        connection.send(('failed', traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class JobScheduler:
+    """
+        This class runs benchmark jobs on a bounded number of worker
+        processes. Every finished job is appended to the result log, jobs
+        already found in the log are skipped, and at the end the log is
+        compacted into the nested layout of TimeseriesBenchmark.result_dict,
+        one json file per archive and window size.
+        Jobs of different window sizes with the same effective arguments,
+        see result_log.effective_key, are run once and their record is
+        copied to the other window sizes with a provenance flag.
+        Jobs exceeding their time or memory limit are aborted together
+        with the joblib workers they started and logged with the status
+        'aborted' instead of scores, see store_aborted; like finished jobs
+        they are not run again
+    """
+    def __init__(self, max_workers=None, normalized=True, njobs=1,
+                 json_dir='./Benchmarks/json/', log_path=default_log_path,
+                 lower_bound_search=False, multi_composition=False,
+                 resampling=None, n_splits=30, store_distances=False,
+                 tuning=False, neighbours=(1,), weights=('uniform',),
+                 save_predictions=True, threads=None, pin_cpus=False,
+                 warm_up=0, repetitions=1, time_limit=None,
+                 memory_limit=None, trace_memory=False):
+        """
+        :param max_workers: maximum number of jobs running at once,
+            defaults to the number of cpus
+        :param normalized: whether datasets are z-normalized
+        :param njobs: number of jobs each classifier may use itself
+        :param json_dir: directory the result json files are written to
+        :param log_path: path of the result log
+        :param lower_bound_search: whether dtw and ddtw use the lower bound
+            search instead of the sktime classifier
+        :param multi_composition: whether metrics that only differ in their
+            distance_composition share one distance pass
+        :param resampling: resampling scheme as understood by
+            resampling.splitter, None for a single split
+        :param n_splits: number of splits or folds of the resampling
+        :param store_distances: whether test to train distances are kept in
+            the distance store
+        :param tuning: whether metric arguments are tuned on the training
+            set
+        :param neighbours: numbers of neighbours evaluated from one search
+        :param weights: voting weights evaluated for every number of
+            neighbours
+        :param save_predictions: whether predictions are kept in sidecar
+            files for rescoring
+        :param threads: number of threads each job may use, shared between
+            its njobs joblib workers and their OpenMP and BLAS threads,
+            defaults to the cpus divided by max_workers
+        :param pin_cpus: whether each worker slot is pinned to its own share
+            of the cpus
+        :param warm_up: number of untimed calls before the timed ones
+        :param repetitions: number of timed calls, the runtime is their
+            median
+        :param time_limit: wall time in seconds after which a job is
+            killed, None for no limit
+        :param memory_limit: address space in bytes a job may allocate,
+            None for no limit
+        :param trace_memory: whether jobs trace their python heap
+            allocations, recorded as peak-heap, which slows down their
+            recorded runtimes
+        """
+        self.max_workers = os.cpu_count() if max_workers is None \
+            else max_workers
+        self.job_arguments = {'normalized': normalized, 'njobs': njobs,
+                              'lower_bound_search': lower_bound_search,
+                              'multi_composition': multi_composition,
+                              'resampling': resampling,
+                              'n_splits': n_splits,
+                              'store_distances': store_distances,
+                              'tuning': tuning,
+                              'neighbours': neighbours,
+                              'weights': weights,
+                              'save_predictions': save_predictions,
+                              'warm_up': warm_up,
+                              'repetitions': repetitions,
+                              'trace_memory': trace_memory}
+        self.threads = max(1, os.cpu_count() // self.max_workers) \
+            if threads is None else threads
+        self.pin_cpus = pin_cpus
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.history_pattern = str(Path(json_dir, '*_archive_wws-*.json'))
+        self.json_dir = Path(json_dir, time.strftime("%Y-%m-%d__%H-%M-%S"))
+        self.result_log = ResultLog(log_path)
+        self.dataset_cache = DatasetCache()
+        self.timings = []
+        self.duplicates = {}
+
+    def open_jobs(self, jobs):
+        """
+        :param jobs: iterable of Job tuples
+        :return: list of the jobs that are not in the result log yet and
+            have no duplicate running before them, grouped by group_jobs
+        """
+        completed = self.result_log.completed_keys()
+        reusable = self.result_log.reusable_records()
+        series_lengths = {}
+        representatives = {}
+        open_jobs = []
+        for job in jobs:
+            variant_arguments = job_arguments(job, **self.job_arguments)
+            if all(job_key(*job, arguments) in completed
+                   for arguments in variant_arguments):
+                continue
+            if job.dataset not in series_lengths:
+                series_lengths[job.dataset] = \
+                    self.dataset_cache.series_length(job.dataset)
+            keys = tuple(effective_key(job.dataset, job.metric, arguments,
+                                       series_lengths[job.dataset])
+                         for arguments in variant_arguments)
+            if all(key in reusable for key in keys):
+                for key, arguments in zip(keys, variant_arguments):
+                    self.result_log.append(
+                        fan_out(reusable[key], job.window, arguments))
+            elif keys in representatives:
+                self.duplicates[representatives[keys]].append(
+                    (job.window, {variant_name(job.metric, arguments): arguments
+                                  for arguments in variant_arguments}))
+            else:
+                representatives[keys] = job
+                self.duplicates[job] = []
+                open_jobs.append(job)
+        return group_jobs(open_jobs, **self.job_arguments)
+
+    def job_shape(self, dataset):
+        """
+        :param dataset: name of the dataset
+        :return: tuple of the number of training instances, test instances,
+            dimensions and timestamps of a job on the dataset
+        """
+        num_of_instances, dimensions, length = \
+            self.dataset_cache.load(dataset)[0].shape
+        if self.job_arguments['resampling']:
+            # the distances between all instances are computed once
+            return num_of_instances, num_of_instances, dimensions, length
+        # the default split of train_test_split
+        n_test = math.ceil(0.25 * num_of_instances)
+        return num_of_instances - n_test, n_test, dimensions, length
+
+    def plan(self, jobs):
+        """
+        orders jobs longest predicted runtime first, so the long ones do not
+        end up last on an otherwise idle pool, and prints the estimated
+        makespan
+        :param jobs: list of Job tuples as returned by open_jobs
+        :return: list of the jobs in the order they are started
+        """
+        model = CostModel.from_history(self.history_pattern,
+                                       self.result_log.log_path)
+        # runtimes are recorded per call, resampled jobs are timed once
+        calls = 1 if self.job_arguments['resampling'] \
+            else self.job_arguments['warm_up'] + \
+            self.job_arguments['repetitions']
+        shapes = {}
+        costs = {}
+        for job in jobs:
+            if job.dataset not in shapes:
+                shapes[job.dataset] = self.job_shape(job.dataset)
+            metrics = job.metric if isinstance(job.metric, tuple) \
+                else (job.metric,)
+            # grouped metrics share one distance pass
+            costs[job] = calls * max(
+                model.predict(job.dataset, metric, job.window,
+                              shapes[job.dataset]) for metric in metrics)
+        planned = sorted(jobs, key=costs.get, reverse=True)
+        total = sum(costs.values())
+        makespan = lpt_makespan([costs[job] for job in planned],
+                                self.max_workers)
+        print(f'{len(planned)} jobs estimated at {total:.1f} s in total, '
+              f'{makespan:.1f} s on {self.max_workers} workers')
+        return planned
+
+    def thread_budget(self, slot):
+        """
+        :param slot: index of the worker slot a job runs in
+        :return: the ThreadBudget of a job in the slot
+        """
+        cpus = slot_cpus(slot, self.max_workers) if self.pin_cpus else None
+        return ThreadBudget(self.threads, self.job_arguments['njobs'], cpus)
+
+    def applied_arguments(self, thread_budget):
+        """
+        :param thread_budget: the ThreadBudget of a job
+        :return: dictionary with the keyword arguments of the job, with the
+            njobs its budget resolved instead of the requested one, so -1
+            never means all cpus in every concurrent job
+        """
+        return dict(self.job_arguments, njobs=thread_budget.njobs)
+
+    def start_job(self, job, slot=0):
+        """
+        starts a job in its own worker process
+        :param job: the Job to start
+        :param slot: index of the worker slot the job runs in
+        :return: a tuple of the parent end of the pipe and the process
+        """
+        parent_connection, child_connection = multiprocessing.Pipe(
+            duplex=False)
+        # a backstop for the time limit, all threads of the job together
+        cpu_limit = None if self.time_limit is None \
+            else math.ceil(self.time_limit * self.threads) + 1
+        thread_budget = self.thread_budget(slot)
+        process = multiprocessing.Process(
+            target=job_process,
+            args=(child_connection, job,
+                  self.applied_arguments(thread_budget), thread_budget,
+                  self.memory_limit, cpu_limit))
+        process.start()
+        child_connection.close()  # only the child writes into it
+        return parent_connection, process
+
+    def run(self, jobs):
+        """
+        runs all jobs, at most max_workers at a time; results are stored as
+        soon as a job finishes, so short jobs are never held back by long
+        ones started before them; the longest jobs are started first, see
+        plan
+        :param jobs: iterable of Job tuples
+        :return: dictionary mapping window sizes to result dictionaries
+        """
+        start_time = time.perf_counter()
+        pending = deque(self.plan(self.open_jobs(jobs)))
+        running = {}
+        free_slots = list(range(self.max_workers))
+        try:
+            while pending or running:
+                while pending and free_slots:
+                    job = pending.popleft()
+                    slot = free_slots.pop(0)
+                    connection, process = self.start_job(job, slot)
+                    running[connection] = {'job': job, 'process': process,
+                                           'slot': slot,
+                                           'started': time.perf_counter(),
+                                           'properties': None,
+                                           'progress': None}
+                timeout = None if self.time_limit is None else max(0, min(
+                    entry['started'] for entry in running.values()) +
+                    self.time_limit - time.perf_counter())
+                for connection in wait(list(running.keys()), timeout):
+                    entry = running[connection]
+                    try:
+                        status, payload = connection.recv()
+                    except EOFError:
+                        entry['process'].join()
+                        exitcode = entry['process'].exitcode
+                        # killed by the cpu time limit
+                        status = 'timed-out' if exitcode == -signal.SIGXCPU \
+                            else 'failed'
+                        payload = f'worker exited with code {exitcode}'
+                    if status in ('loaded', 'progress'):
+                        entry['properties' if status == 'loaded'
+                              else 'progress'] = payload
+                        continue
+                    self.finish_job(connection, running, free_slots)
+                    if status == 'done':
+                        self.store_results(entry['job'], payload)
+                    elif status in ('timed-out', 'out-of-memory'):
+                        self.store_aborted(entry, status)
+                    else:
+                        logging.error(f'job {entry["job"]} failed: {payload}')
+                for connection, entry in list(running.items()):
+                    if self.time_limit is not None and time.perf_counter() - \
+                            entry['started'] >= self.time_limit:
+                        kill_job(entry['process'])
+                        self.finish_job(connection, running, free_slots)
+                        self.store_aborted(entry, 'timed-out')
+        finally:
+            # the jobs are in process groups of their own, an interrupt of
+            # the scheduler does not reach them
+            for entry in running.values():
+                kill_job(entry['process'])
+        print_timing_summary(self.timings, time.perf_counter() - start_time)
+        write_compacted(self.result_log.log_path, self.json_dir)
+        return compact(self.result_log.records())
+
+    @staticmethod
+    def finish_job(connection, running, free_slots):
+        """
+        cleans up after a job that finished or was aborted
+        :param connection: the parent end of the pipe of the job
+        :param running: dictionary of the running jobs, the job is removed
+        :param free_slots: list of the free worker slots, the slot of the
+            job is added
+        :return: nothing
+        """
+        entry = running.pop(connection)
+        free_slots.append(entry['slot'])
+        connection.close()
+        entry['process'].join()
+        # joblib workers left behind by the job, e.g. when the cpu time
+        # limit killed it
+        kill_job(entry['process'])
+
+    def job_properties(self, dataset):
+        """
+        the properties of a dataset as far as they are known without
+        converting it to the sktime format, for jobs aborted before they
+        loaded it
+        :param dataset: name of the dataset
+        :return: dictionary like the one returned by dataset_properties
+        """
+        X, y = self.dataset_cache.load(dataset)
+        n_test = math.ceil(0.25 * len(y))
+        series_length = self.dataset_cache.series_length(dataset)
+        return {
+            'num_of_dimensions': X.shape[1],
+            'num_of_instances': len(y) - n_test,
+            'num_of_timestamps': X.shape[2],
+            'num_of_classes': len(np.unique(y)),
+            'unique_lengths': series_length is not None,
+            'len train set': len(y) - n_test,
+            'len test set': n_test
+        }
+
+    def store_aborted(self, entry, reason):
+        """
+        appends records of an aborted job to the result log, every metric
+        and variant of the job gets the status 'aborted', the reason, the
+        time it ran and, for jobs of a single metric, the accuracy of the
+        nearest neighbour on the test instances classified before the abort
+        :param entry: dictionary with the job, its start time and the last
+            properties and progress it sent
+        :param reason: 'timed-out' or 'out-of-memory'
+        :return: nothing
+        """
+        job = entry['job']
+        logging.error(f'job {job} aborted: {reason}')
+        properties = entry['properties'] or self.job_properties(job.dataset)
+        metrics = job.metric if isinstance(job.metric, tuple) \
+            else (job.metric,)
+        progress = entry['progress'] if len(metrics) == 1 else None
+        result = {'status': 'aborted', 'reason': reason,
+                  'runtime': time.perf_counter() - entry['started']}
+        if progress is not None:
+            result['partial'] = dict(progress, accuracy=(
+                progress['correct'] / progress['classified']))
+        applied_arguments = self.applied_arguments(
+            self.thread_budget(entry['slot']))
+        for metric in metrics:
+            single_job = Job(job.dataset, metric, job.window)
+            for arguments in job_arguments(single_job, **applied_arguments):
+                record = {
+                    'dataset': job.dataset,
+                    'metric': metric,
+                    'window': job.window,
+                    'properties': properties,
+                    'result': dict(result, arguments=arguments)
+                }
+                self.result_log.append(record)
+                name = variant_name(metric, arguments)
+                for window, variants in self.duplicates.get(single_job, []):
+                    self.result_log.append(
+                        fan_out(record, window, variants[name]))
+
+    def store_results(self, job, records):
+        """
+        appends the records of a finished job to the result log
+        :param job: the finished Job
+        :param records: list as returned by run_job
+        :return: nothing
+        """
+        for record in records:
+            self.result_log.append(record)
+            self.timings.append(record['result']['timing'])
+            computed_job = Job(record['dataset'], record['metric'],
+                               record['window'])
+            name = variant_name(record['metric'],
+                                record['result']['arguments'])
+            for window, variants in self.duplicates.get(computed_job, []):
+                self.result_log.append(
+                    fan_out(record, window, variants[name]))
+
+
+if __name__ == '__main__':
+    metrics = [
+        'dagdtw',
+        'bagdtw', 'dtw',
+        'sdtw', 'ddtw',
+        'wdtw', 'wddtw'
+    ]
+    scheduler = JobScheduler(normalized=True)
+    scheduler.run(expand_jobs(datasets, metrics, [-1, 0.3, 0.03]))
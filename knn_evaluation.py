@@ -0,0 +1,87 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import numpy as np
+
+
+def encode_labels(y):
+    """
+    encodes class labels the same way the sklearn based classifiers do
+    :param y: array like containing the class labels
+    :return: a tuple of the sorted unique classes and the encoded labels
+    """
+    classes, y_encoded = np.unique(np.asarray(y), return_inverse=True)
+    return classes, y_encoded
+
+
+def neighbour_weights(neigh_dist, weights='uniform'):
+    """
+    computes the voting weights of the neighbours
+    :param neigh_dist: array of shape (n_queries, n_neighbors) with distances
+    :param weights: 'uniform' or 'distance'
+    :return: array of shape (n_queries, n_neighbors) with the weights
+    """
+    if weights == 'uniform':
+        return np.ones_like(neigh_dist, dtype=float)
+    if weights != 'distance':
+        raise ValueError(f'unknown weights {weights}')
+    # as in sklearn: a query with exact matches only votes for these
+    with np.errstate(divide='ignore'):
+        inverse_dist = 1. / neigh_dist
+    exact_match = np.isinf(inverse_dist)
+    exact_match_rows = exact_match.any(axis=1)
+    inverse_dist[exact_match_rows] = exact_match[exact_match_rows]
+    return inverse_dist
+
+
+def proba_from_neighbours(neigh_ind, neigh_dist, y_encoded, n_classes,
+                          weights='uniform'):
+    """
+    derives the class probabilities from the neighbours found for each query
+    :param neigh_ind: array of shape (n_queries, n_neighbors) with indices
+        into the training set
+    :param neigh_dist: array of shape (n_queries, n_neighbors) with distances
+    :param y_encoded: the encoded training labels
+    :param n_classes: number of classes
+    :param weights: 'uniform' or 'distance'
+    :return: array of shape (n_queries, n_classes)
+    """
+    neigh_ind = np.asarray(neigh_ind)
+    neighbour_labels = np.asarray(y_encoded)[neigh_ind]
+    vote_weights = neighbour_weights(np.asarray(neigh_dist), weights)
+    proba = np.zeros((neigh_ind.shape[0], n_classes))
+    rows = np.arange(neigh_ind.shape[0])
+    for column in range(neigh_ind.shape[1]):
+        np.add.at(proba, (rows, neighbour_labels[:, column]),
+                  vote_weights[:, column])
+    normalizer = proba.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    return proba / normalizer
+
+
+def predict_from_proba(proba, classes):
+    """
+    picks the most probable class, ties go to the first class like in sklearn
+    :param proba: array of shape (n_queries, n_classes)
+    :param classes: the sorted unique classes
+    :return: array with the predicted classes
+    """
+    return np.asarray(classes)[np.argmax(proba, axis=1)]
+
+
+def kneighbors_from_distances(distances, n_neighbors=1):
+    """
+    finds the nearest training series of each query in a distance matrix,
+    ties go to the smaller training index
+    :param distances: array of shape (n_queries, n_train)
+    :param n_neighbors: number of neighbours
+    :return: a tuple of the distances and the indices of the neighbours,
+        both of shape (n_queries, n_neighbors)
+    """
+    neigh_ind = np.argsort(distances, axis=1, kind='stable')[:, :n_neighbors]
+    return np.take_along_axis(distances, neigh_ind, axis=1), neigh_ind
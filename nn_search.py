@@ -0,0 +1,297 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+# metrics the search can replace, mapped to whether they use derivatives
+supported_metrics = {'dtw': False, 'ddtw': True}
+
+
+def window_radius(window, length):
+    """
+    :param window: window size as fraction of the series length,
+        negative values mean no constraint
+    :param length: length of the series
+    :return: the radius of the Sakoe-Chiba band in timestamps
+    """
+    if window < 0:
+        return length
+    return int(window * length)
+
+
+def derivative(panel):
+    """
+    derivative transform of Keogh and Pazzani as used by DDTW
+    :param panel: array of shape (instances, timestamps, dimensions)
+    :return: array of shape (instances, timestamps - 2, dimensions)
+    """
+    return ((panel[:, 1:-1] - panel[:, :-2]) +
+            (panel[:, 2:] - panel[:, :-2]) / 2) / 2
+
+
+def envelopes(panel, radius):
+    """
+    computes the upper and lower envelope of every series
+    :param panel: array of shape (instances, timestamps, dimensions)
+    :param radius: radius of the Sakoe-Chiba band
+    :return: a tuple of the upper and lower envelope, same shape as panel
+    """
+    size = 2 * min(radius, panel.shape[1]) + 1
+    return maximum_filter1d(panel, size, axis=1, mode='nearest'), \
+        minimum_filter1d(panel, size, axis=1, mode='nearest')
+
+
+def lb_kim(query, candidates):
+    """
+    lower bound from the first and last cells, which every warping path
+    passes through
+    :param query: array of shape (timestamps, dimensions)
+    :param candidates: array of shape (instances, timestamps, dimensions)
+    :return: array with one lower bound per candidate
+    """
+    first = ((candidates[:, 0] - query[0]) ** 2).sum(axis=1)
+    if len(query) == 1 and candidates.shape[1] == 1:
+        return first
+    return first + ((candidates[:, -1] - query[-1]) ** 2).sum(axis=1)
+
+
+def lb_keogh(query, upper, lower):
+    """
+    lower bound of the query against the envelopes of equal length candidates
+    :param query: array of shape (timestamps, dimensions)
+    :param upper: upper envelopes, shape (instances, timestamps, dimensions)
+    :param lower: lower envelopes, same shape as upper
+    :return: array with one lower bound per candidate
+    """
+    above = np.maximum(query - upper, 0)
+    below = np.maximum(lower - query, 0)
+    return (above ** 2 + below ** 2).sum(axis=(1, 2))
+
+
+def dtw_batch(query, candidates, radius, thresholds=None,
+              abandon_interval=4):
+    """
+    dtw between one query and a batch of equal length candidates, computed
+    along the anti-diagonals of the cost matrix so all candidates advance
+    together. The local cost is the squared euclidean distance, the result
+    the accumulated cost of the best warping path inside the band.
+    Every warping path crosses one of any two neighbouring anti-diagonals,
+    so their minimum is a lower bound of the final distance and a candidate
+    is abandoned as soon as this bound reaches its threshold.
+    :param query: array of shape (m, dimensions)
+    :param candidates: array of shape (instances, n, dimensions)
+    :param radius: radius of the Sakoe-Chiba band
+    :param thresholds: array with one threshold per candidate, None means
+        no candidate is abandoned
+    :param abandon_interval: number of anti-diagonals between two checks
+    :return: array with the distances, inf for abandoned candidates
+    """
+    m, n = len(query), candidates.shape[1]
+    radius = max(radius, abs(m - n))
+    batch = len(candidates)
+    distances = np.full(batch, np.inf)
+    active = np.arange(batch)
+    # the buffers hold three anti-diagonals indexed by the row i of the
+    # cell, shifted by one so column 0 is a guard that always stays inf
+    buffers = np.full((3, batch, m + 2), np.inf)
+    bounds = {}
+    for k in range(m + n - 1):
+        low = max(0, k - n + 1, (k - radius + 1) // 2)
+        high = min(m - 1, k, (k + radius) // 2)
+        bounds[k] = (low, high)
+        current, previous, before = buffers[k % 3], buffers[(k - 1) % 3], \
+            buffers[(k - 2) % 3]
+        rows = slice(low + 1, high + 2)
+        cost = ((query[low:high + 1] -
+                 candidates[:, k - high:k - low + 1][:, ::-1]) ** 2).sum(axis=2)
+        if k == 0:
+            current[:, rows] = cost
+        else:
+            current[:, rows] = cost + np.minimum(
+                np.minimum(before[:, low:high + 1], previous[:, low:high + 1]),
+                previous[:, rows])
+        # guards for the neighbouring anti-diagonals
+        current[:, low] = np.inf
+        if high + 2 < m + 2:
+            current[:, high + 2] = np.inf
+
+        if thresholds is not None and k > 0 and not k % abandon_interval:
+            previous_low, previous_high = bounds[k - 1]
+            # with a radius of 0 every other anti-diagonal of a pair of equal
+            # length is empty, the paths cross the other one
+            bound = np.minimum(
+                current[:, rows].min(axis=1, initial=np.inf),
+                previous[:, previous_low + 1:previous_high + 2].min(
+                    axis=1, initial=np.inf))
+            keep = bound < thresholds
+            if not keep.all():
+                active, thresholds = active[keep], thresholds[keep]
+                buffers, candidates = buffers[:, keep], candidates[keep]
+                if not len(active):
+                    return distances
+    distances[active] = buffers[(m + n - 2) % 3][:, m]
+    return distances
+
+
+def banded_dtw(cost, radius):
+    """
+    dtw from precomputed local costs, so several radii can share them
+    :param cost: array of shape (instances, m, n) with the local costs of
+        each pair
+    :param radius: radius of the Sakoe-Chiba band
+    :return: array with the distance of each pair
+    """
+    batch, m, n = cost.shape
+    radius = max(radius, abs(m - n))
+    buffers = np.full((3, batch, m + 2), np.inf)
+    for k in range(m + n - 1):
+        low = max(0, k - n + 1, (k - radius + 1) // 2)
+        high = min(m - 1, k, (k + radius) // 2)
+        current, previous, before = buffers[k % 3], buffers[(k - 1) % 3], \
+            buffers[(k - 2) % 3]
+        rows = np.arange(low, high + 1)
+        diagonal = cost[:, rows, k - rows]
+        if k == 0:
+            current[:, low + 1:high + 2] = diagonal
+        else:
+            current[:, low + 1:high + 2] = diagonal + np.minimum(
+                np.minimum(before[:, low:high + 1], previous[:, low:high + 1]),
+                previous[:, low + 1:high + 2])
+        current[:, low] = np.inf
+        if high + 2 < m + 2:
+            current[:, high + 2] = np.inf
+    return buffers[(m + n - 2) % 3][:, m].copy()
+
+
+class NearestNeighbourSearch:
+    """
+        This class finds the nearest neighbour of each query under dtw or
+        ddtw. Candidates are pruned with a cascade of lower bounds, LB_Kim
+        first and LB_Keogh against envelopes of the training series computed
+        once in fit, before the remaining ones are compared with early
+        abandoning dtw against the best distance found so far.
+        Ties between candidates are resolved in favour of the smaller index,
+        so the results are exactly those of the brute force search.
+    """
+    def __init__(self, window=-1, derivative=False, batch_size=32,
+                 brute_force=False):
+        """
+        :param window: window size as fraction of the series length,
+            negative values mean no constraint
+        :param derivative: whether series are compared by their derivatives
+        :param batch_size: number of candidates compared at once
+        :param brute_force: compare every candidate with full dtw
+        """
+        self.window = window
+        self.derivative = derivative
+        self.batch_size = batch_size
+        self.brute_force = brute_force
+        self.statistics = {}
+        self.X_train = None
+        self.radius = None
+        self.upper = None
+        self.lower = None
+
+    def prepare(self, panel):
+        """
+        :param panel: array of shape (instances, dimensions, timestamps)
+        :return: array of shape (instances, timestamps, dimensions)
+        """
+        panel = np.ascontiguousarray(np.transpose(panel, (0, 2, 1)),
+                                     dtype=float)
+        if np.isnan(panel).any():
+            raise ValueError('nearest neighbour search requires series '
+                             'without missing values')
+        return derivative(panel) if self.derivative else panel
+
+    def fit(self, X, y=None):
+        """
+        :param X: training panel of shape (instances, dimensions, timestamps)
+        :param y: ignored, labels are handled by the caller
+        :return: self
+        """
+        self.X_train = self.prepare(X)
+        self.radius = window_radius(self.window, self.X_train.shape[1])
+        self.upper, self.lower = envelopes(self.X_train, self.radius)
+        return self
+
+    def kneighbors(self, X):
+        """
+        :param X: query panel of shape (instances, dimensions, timestamps)
+        :return: a tuple of the distances and the indices of the nearest
+            neighbours, both of shape (queries, 1) like in sklearn
+        """
+        queries = self.prepare(X)
+        self.statistics = {'pairs': 0, 'pruned-lb-kim': 0,
+                           'pruned-lb-keogh': 0, 'abandoned': 0,
+                           'full-dtw': 0}
+        neigh_dist = np.empty((len(queries), 1))
+        neigh_ind = np.empty((len(queries), 1), dtype=int)
+        for index, query in enumerate(queries):
+            neigh_dist[index, 0], neigh_ind[index, 0] = self.nearest(query)
+        return neigh_dist, neigh_ind
+
+    def nearest(self, query):
+        """
+        :param query: array of shape (timestamps, dimensions)
+        :return: a tuple of the distance and the index of the nearest
+            neighbour
+        """
+        num_candidates = len(self.X_train)
+        self.statistics['pairs'] += num_candidates
+        if self.brute_force:
+            distances = dtw_batch(query, self.X_train, self.radius)
+            self.statistics['full-dtw'] += num_candidates
+            best = int(np.argmin(distances))
+            return distances[best], best
+
+        kim = lb_kim(query, self.X_train)
+        if len(query) == self.X_train.shape[1]:
+            keogh = lb_keogh(query, self.upper, self.lower)
+        else:
+            keogh = np.zeros(num_candidates)
+        # promising candidates first to find a tight best so far early
+        remaining = np.argsort(np.maximum(kim, keogh), kind='stable')
+        best_distance, best_index = np.inf, num_candidates
+        while len(remaining):
+            # a candidate with a smaller index than the best may still tie,
+            # once pruned a candidate stays pruned as the best only improves
+            thresholds = np.where(remaining < best_index, np.nextafter(
+                best_distance, np.inf), best_distance)
+            by_kim = kim[remaining] >= thresholds
+            by_keogh = ~by_kim & (keogh[remaining] >= thresholds)
+            self.statistics['pruned-lb-kim'] += int(by_kim.sum())
+            self.statistics['pruned-lb-keogh'] += int(by_keogh.sum())
+            survivors = ~(by_kim | by_keogh)
+            remaining, thresholds = remaining[survivors], thresholds[survivors]
+            # the very first candidate alone to get a best so far at all
+            batch_size = 1 if np.isinf(best_distance) else self.batch_size
+            batch, remaining = remaining[:batch_size], remaining[batch_size:]
+            if not len(batch):
+                break
+            distances = dtw_batch(query, self.X_train[batch], self.radius,
+                                  thresholds[:batch_size])
+            abandoned = np.isinf(distances)
+            self.statistics['abandoned'] += int(abandoned.sum())
+            self.statistics['full-dtw'] += int((~abandoned).sum())
+            for distance, index in zip(distances[~abandoned],
+                                       batch[~abandoned]):
+                if distance < best_distance or \
+                        (distance == best_distance and index < best_index):
+                    best_distance, best_index = distance, index
+        return best_distance, int(best_index)
+
+    def pruning_rates(self):
+        """
+        :return: dictionary with the share of candidate pairs each stage
+            of the cascade disposed of
+        """
+        pairs = self.statistics.get('pairs', 0)
+        return {stage: count / pairs if pairs else 0
+                for stage, count in self.statistics.items() if stage != 'pairs'}
@@ -0,0 +1,110 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+from itertools import product
+
+import numpy as np
+
+import nn_search as ns
+
+window_candidates = [-1, 0.3, 0.1, 0.03, 0.01, 0]
+
+# candidate values of the metric arguments that are tuned
+parameter_candidates = {
+    'w': window_candidates,
+    'window': window_candidates,
+    'g': [0.01, 0.05, 0.1, 0.3, 0.7, 1.0],
+    'gamma': [0.01, 0.1, 1.0, 10.0],
+    'sigma': [0.5, 1, 2, 4]
+}
+
+
+def tuned_parameters(kwargs):
+    """
+    :param kwargs: dictionary with the keyword arguments of a metric
+    :return: list of the arguments that are tuned
+    """
+    return [key for key in kwargs if key in parameter_candidates]
+
+
+def candidates(kwargs):
+    """
+    :param kwargs: dictionary with the keyword arguments of a metric
+    :return: list of keyword argument dictionaries, one per combination of
+        candidate values of the tuned arguments
+    """
+    keys = tuned_parameters(kwargs)
+    return [dict(kwargs, **dict(zip(keys, values)))
+            for values in product(*(parameter_candidates[key]
+                                    for key in keys))]
+
+
+def loo_accuracy(distances, y):
+    """
+    leave-one-out 1-NN accuracy on the training set, every instance is
+    classified by its nearest other instance
+    :param distances: array of shape (instances, instances)
+    :param y: array with the classes of the instances
+    :return: the accuracy
+    """
+    distances = np.array(distances, dtype=float)
+    np.fill_diagonal(distances, np.inf)
+    y = np.asarray(y)
+    return float(np.mean(y[np.argmin(distances, axis=1)] == y))
+
+
+def dtw_window_distances(panel, windows, derivative=False,
+                         memory_budget=256 * 1024 * 1024):
+    """
+    dtw distances between all training series for several window sizes.
+    The local costs of each pair are computed once and shared by all
+    windows, and only the upper triangle is computed. The distances are
+    those of nn_search, as used by the lower bound search.
+    :param panel: array of shape (instances, dimensions, timestamps)
+    :param windows: list of window sizes
+    :param derivative: whether series are compared by their derivatives
+    :param memory_budget: bytes the local costs of a batch of pairs take
+    :return: dictionary mapping window sizes to arrays of shape
+        (instances, instances)
+    """
+    X = ns.NearestNeighbourSearch(derivative=derivative).prepare(panel)
+    num_instances, length, dimensions = X.shape
+    radii = {window: ns.window_radius(window, length) for window in windows}
+    distances = {window: np.zeros((num_instances, num_instances))
+                 for window in windows}
+    # the squared differences are summed over the dimensions only after
+    # they were taken for every pair of timestamps
+    batch_size = max(1, memory_budget // (8 * length * length * dimensions))
+    for row in range(num_instances - 1):
+        for start in range(row + 1, num_instances, batch_size):
+            columns = np.arange(start, min(num_instances, start + batch_size))
+            cost = ((X[row][np.newaxis, :, np.newaxis] -
+                     X[columns][:, np.newaxis]) ** 2).sum(axis=3)
+            for window, radius in radii.items():
+                distances[window][row, columns] = ns.banded_dtw(cost, radius)
+    for matrix in distances.values():
+        matrix += matrix.T
+    return distances
+
+
+def tune(candidate_kwargs, train_distances, y_train):
+    """
+    scores every candidate by its leave-one-out accuracy on the training set
+    :param candidate_kwargs: list of keyword argument dictionaries
+    :param train_distances: function returning the training distance matrix
+        of a keyword argument dictionary
+    :param y_train: array with the training classes
+    :return: a tuple of the best keyword arguments, the first one on ties,
+        and a list with the arguments and accuracy of every candidate
+    """
+    scores = [{'arguments': kwargs,
+               'loo-accuracy': loo_accuracy(train_distances(kwargs), y_train)}
+              for kwargs in candidate_kwargs]
+    best = max(range(len(scores)), key=lambda index:
+               (scores[index]['loo-accuracy'], -index))
+    return scores[best]['arguments'], scores
@@ -6,13 +6,23 @@ __copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
                 "information in"
 __email__ = "s2092795@stud.uni-frankfurt.de"
 
-from texfile import TexFile
+from texfile import TexFile, written_paths
 import math
+import os
+from pathlib import Path
 from formats_and_translations import header_translation
 
 
 class TexPlots(TexFile):
-    def __init__(self, tex_path='', x_label='x', y_label='y', sources=None, x_axis_log=False, y_axis_log=False):
+    def __init__(self, tex_path='', x_label='x', y_label='y', sources=None, x_axis_log=False, y_axis_log=False,
+                 external_data=False, csv_base_dir=None):
+        # write the data series to csv files next to the tex file instead of inline tables, and name the
+        # figure for the tikz externalization library
+        self.external_data = external_data
+        # the directory the csv paths in the tex file are relative to, None for the directory of the tex file
+        self.csv_base_dir = csv_base_dir
+        # the last two columns of every data row hold the lengths of error bars below and above the x value
+        self.x_error_bars = False
         self.x_label = x_label
         self.y_label = y_label
         self.x_axis_log = x_axis_log
@@ -35,8 +45,24 @@ class TexPlots(TexFile):
         self.compile_footer()
 
     def compile_header(self):
+        if self.external_data:
+            self.file_lines.append(f'\\tikzsetnextfilename{{{self.figure_name()}}}')
         self.file_lines.append('\\begin{tikzpicture}')
 
+    def figure_name(self):
+        # unique among all generated tex files
+        tex_path = Path(self.tex_path)
+        return f'{tex_path.parent.name}-{tex_path.stem}'
+
+    def csv_path(self, data_name):
+        tex_path = Path(self.tex_path)
+        return Path(tex_path.parent, f'{tex_path.stem}-data', f'{self.compatible_data_name(data_name)}.csv')
+
+    def csv_reference(self, csv_path):
+        # the csv path as written into the tex file, independent of the directory the generator runs in
+        base_dir = Path(self.tex_path).parent if self.csv_base_dir is None else Path(self.csv_base_dir)
+        return Path(os.path.relpath(csv_path, base_dir)).as_posix()
+
     def compile_axis_header(self):
         self.file_lines.append('\t\\begin{axis}[')
         self.file_lines.append('\t\ttable/col sep = comma,')
@@ -68,17 +94,39 @@ class TexPlots(TexFile):
 
     def compile_inline_table_lines(self):
         for data_name in self.data.keys():
+            if self.external_data:
+                self.compile_external_table_line(data_name)
+                continue
             self.file_lines.append('\t\\pgfplotstableread[col sep=comma]{%')
             for data_row in self.data[data_name]:
                 self.file_lines.append('\t\t' + ', '.join(map(str, data_row)))
             self.file_lines.append(f'\t}}\\{self.compatible_data_name(data_name)}')
 
+    def compile_external_table_line(self, data_name):
+        csv_path = self.csv_path(data_name)
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write(self.CR.join(', '.join(map(str, data_row)) for data_row in self.data[data_name]))
+            csv_file.write(self.CR)
+        written_paths.append(str(csv_path))
+        self.file_lines.append(f'\t\\pgfplotstableread[col sep=comma]{{{self.csv_reference(csv_path)}}}'
+                               f'\\{self.compatible_data_name(data_name)}')
+
+    def error_bar_options(self, data_name):
+        # returns the plot options and the table options drawing the error bars of the data
+        if not self.x_error_bars:
+            return '', ''
+        minus_index = len(self.data[data_name][0]) - 2
+        return ', error bars/.cd, x dir = both, x explicit', \
+            f', x error minus index = {{{minus_index}}}, x error plus index = {{{minus_index + 1}}}'
+
     def compile_inline_plot_lines(self):
         for data_name in self.data.keys():
             xshift = self.plot_shifts[data_name]
-            inline_plot = f'\t\t\\addplot+ [every node/.append style={{xshift={xshift}pt}}] '
+            plot_options, table_options = self.error_bar_options(data_name)
+            inline_plot = f'\t\t\\addplot+ [every node/.append style={{xshift={xshift}pt}}{plot_options}] '
             inline_plot += f'{self.marks_only} table[ x index = {{0}}, ' \
-                           f'y index = {{1}}]{{\\{self.compatible_data_name(data_name)}}};'
+                           f'y index = {{1}}{table_options}]{{\\{self.compatible_data_name(data_name)}}};'
             self.file_lines.append(inline_plot)
 
     def compile_legend(self):
@@ -133,16 +181,20 @@ class TrendPlots(TexPlots):
             xshift_offset = -10
             yshift = 0
             style = f'scale = {scale}, xshift = {xshift + xshift_offset}pt, yshift = {yshift}pt'
-            inline_plot = f'\t\t\\addplot+ [every node/.append style={{{style}}}] '
+            plot_options, table_options = self.error_bar_options(data_name)
+            inline_plot = f'\t\t\\addplot+ [every node/.append style={{{style}}}{plot_options}] '
             meta = f', meta = {{2}}' if data_name not in omit_data_display_list else ''
-            inline_plot += f'{self.marks_only} table[ x index = {{0}}, y index = {{1}}{meta}]{{\\{data_name}}};'
+            inline_plot += f'{self.marks_only} table[ x index = {{0}}, y index = {{1}}{meta}{table_options}]' \
+                           f'{{\\{data_name}}};'
             self.file_lines.append(inline_plot)
 
 
 class CorrelationPlots(TexPlots):
-    def __init__(self, tex_path='', x_label='x', y_label='y', xtick_labels=[], sources=None, x_axis_log=False, y_axis_log=False):
+    def __init__(self, tex_path='', x_label='x', y_label='y', xtick_labels=[], sources=None, x_axis_log=False, y_axis_log=False,
+                 external_data=False, csv_base_dir=None):
         self.xtick_labels = [] if not xtick_labels else xtick_labels
-        super().__init__(tex_path, x_label, y_label, sources, x_axis_log, y_axis_log)
+        super().__init__(tex_path, x_label, y_label, sources, x_axis_log, y_axis_log, external_data,
+                         csv_base_dir)
 
     def xticks(self):
         sample_list = self.data[list(self.data.keys())[0]]
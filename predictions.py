@@ -0,0 +1,87 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+default_predictions_dir = './Benchmarks/predictions'
+
+
+def predictions_path(dataset, key, predictions_dir=default_predictions_dir):
+    """
+    :param dataset: name of the dataset
+    :param key: dictionary identifying the job, it has to be json
+        serializable
+    :param predictions_dir: directory holding the sidecar files
+    :return: the path of the sidecar file of the job
+    """
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return Path(predictions_dir, dataset, f'{digest[:16]}.npz')
+
+
+def confusion(y_true_codes, y_pred_codes, num_labels):
+    """
+    :param y_true_codes: array with the indices of the true labels
+    :param y_pred_codes: array with the indices of the predicted labels
+    :param num_labels: number of labels
+    :return: the confusion matrix, rows are true and columns predicted
+        labels like in sklearn
+    """
+    return np.bincount(y_true_codes * num_labels + y_pred_codes,
+                       minlength=num_labels * num_labels
+                       ).reshape(num_labels, num_labels)
+
+
+def write_predictions(path, y_true, y_pred, proba, classes):
+    """
+    writes the outcome of a job into a compressed sidecar file
+    :param path: path of the sidecar file
+    :param y_true: array with the true classes of the test instances
+    :param y_pred: array with the predicted classes
+    :param proba: array of shape (test instances, classes), None if the
+        classifier gave no probabilities
+    :param classes: the sorted training classes, the columns of proba
+    :return: nothing
+    """
+    y_true, y_pred = np.asarray(y_true).astype(str), \
+        np.asarray(y_pred).astype(str)
+    labels = np.union1d(np.asarray(classes).astype(str), y_true)
+    y_true_codes = np.searchsorted(labels, y_true)
+    y_pred_codes = np.searchsorted(labels, y_pred)
+    arrays = {
+        'labels': labels,
+        'classes': np.asarray(classes).astype(str),
+        'y_true': y_true_codes,
+        'y_pred': y_pred_codes,
+        'confusion': confusion(y_true_codes, y_pred_codes, len(labels))
+    }
+    if proba is not None:
+        arrays['proba'] = np.asarray(proba, dtype=float)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = Path(path.parent, f'{path.stem}.{os.getpid()}.tmp.npz')
+    np.savez_compressed(temporary_path, **arrays)
+    os.replace(temporary_path, path)
+
+
+def load_predictions(path):
+    """
+    :param path: path of a sidecar file
+    :return: dictionary with the labels, classes, confusion matrix, proba
+        if stored, and the true and predicted classes as labels
+    """
+    with np.load(path) as sidecar:
+        predictions = {name: sidecar[name] for name in sidecar.files}
+    predictions['y_true'] = predictions['labels'][predictions['y_true']]
+    predictions['y_pred'] = predictions['labels'][predictions['y_pred']]
+    return predictions
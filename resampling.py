@@ -0,0 +1,163 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import numpy as np
+from sklearn.metrics import (
+    accuracy_score,
+    recall_score,
+    f1_score,
+    roc_auc_score,
+)
+from sklearn.model_selection import KFold, ShuffleSplit, StratifiedKFold, \
+    StratifiedShuffleSplit
+
+import knn_evaluation as kn
+
+score_names = ['accuracy', 'recall', 'f1-score', 'auroc']
+
+
+def splitter(scheme, n_splits, test_size=0.25, random_state=1):
+    """
+    :param scheme: 'random', 'stratified', 'kfold' or 'stratified-kfold'
+    :param n_splits: number of splits or folds
+    :param test_size: share of the instances in the test set, only used by
+        the random and stratified schemes
+    :param random_state: seed of the splits
+    :return: an sklearn splitter
+    """
+    if scheme == 'random':
+        return ShuffleSplit(n_splits, test_size=test_size,
+                            random_state=random_state)
+    if scheme == 'stratified':
+        return StratifiedShuffleSplit(n_splits, test_size=test_size,
+                                      random_state=random_state)
+    if scheme == 'kfold':
+        return KFold(n_splits, shuffle=True, random_state=random_state)
+    if scheme == 'stratified-kfold':
+        return StratifiedKFold(n_splits, shuffle=True,
+                               random_state=random_state)
+    raise ValueError(f'unknown resampling scheme {scheme}')
+
+
+def split_count(scheme, n_splits, y):
+    """
+    the number of folds a dataset allows, every fold of kfold needs an
+    instance and every fold of stratified-kfold an instance of every class
+    :param scheme: resampling scheme as understood by splitter
+    :param n_splits: number of splits or folds asked for
+    :param y: array with the classes of all instances
+    :return: n_splits, lowered to the number of folds the dataset allows
+    """
+    if scheme == 'kfold':
+        largest = len(y)
+    elif scheme == 'stratified-kfold':
+        largest = np.unique(y, return_counts=True)[1].min()
+    else:
+        return n_splits
+    if largest < 2:
+        raise ValueError(f'{scheme} needs at least two instances of every '
+                         f'class, the smallest class has {largest}')
+    return int(min(n_splits, largest))
+
+
+def auroc(y_true, proba, classes):
+    """
+    area under the roc curve as scored by TimeseriesBenchmark
+    :param y_true: array with the true classes
+    :param proba: array of shape (n_queries, n_classes)
+    :param classes: the sorted unique classes
+    :return: the score, nan if the test set lacks the classes to compute it
+    """
+    try:
+        if len(classes) == 2:
+            return roc_auc_score(y_true, proba[:, 1], average='macro')
+        return roc_auc_score(y_true, proba, average='macro',
+                             multi_class='ovo', labels=classes)
+    except ValueError:
+        return np.nan
+
+
+def split_scores(distances, y_encoded, classes, train, test, n_neighbors=1,
+                 weights='uniform'):
+    """
+    scores the k-NN classification of one split by looking up the
+    distances between its test and train instances
+    :param distances: array of shape (instances, instances) over all
+        instances of the dataset
+    :param y_encoded: the encoded labels of all instances
+    :param classes: the sorted unique classes
+    :param train: indices of the training instances
+    :param test: indices of the test instances
+    :param n_neighbors: number of neighbours voting
+    :param weights: 'uniform' or 'distance'
+    :return: dictionary with the scores of the split
+    """
+    neigh_dist, neigh_ind = kn.kneighbors_from_distances(
+        distances[np.ix_(test, train)], n_neighbors)
+    proba = kn.proba_from_neighbours(neigh_ind, neigh_dist, y_encoded[train],
+                                     len(classes), weights)
+    y_true = classes[y_encoded[test]]
+    y_pred = kn.predict_from_proba(proba, classes)
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'recall': recall_score(y_true, y_pred, average='macro'),
+        'f1-score': f1_score(y_true, y_pred, average='macro'),
+        'auroc': auroc(y_true, proba, classes)
+    }
+
+
+def confidence_interval(values, confidence=0.95):
+    """
+    :param values: array with the score of each split
+    :param confidence: confidence level of the interval
+    :return: dictionary with the mean, standard deviation and the
+        percentile interval of the scores
+    """
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(values, [tail, 100 - tail])
+    return {
+        'mean': float(np.nanmean(values)),
+        'std': float(np.nanstd(values)),
+        'ci-low': float(low),
+        'ci-high': float(high)
+    }
+
+
+def resample(distances, y, scheme='stratified', n_splits=30, test_size=0.25,
+             random_state=1, confidence=0.95, n_neighbors=1,
+             weights='uniform'):
+    """
+    evaluates k-NN classification over repeated splits of a dataset, every
+    split is a lookup in the distance matrix computed once beforehand
+    :param distances: array of shape (instances, instances) over all
+        instances of the dataset
+    :param y: array with the classes of all instances
+    :param scheme: resampling scheme as understood by splitter
+    :param n_splits: number of splits or folds, folds are lowered to the
+        number the dataset allows, see split_count
+    :param test_size: share of the instances in the test set
+    :param random_state: seed of the splits
+    :param confidence: confidence level of the intervals
+    :param n_neighbors: number of neighbours voting
+    :param weights: 'uniform' or 'distance'
+    :return: a tuple of the per split scores, a dictionary mapping score
+        names to lists, and a dictionary mapping score names to their
+        confidence intervals
+    """
+    classes, y_encoded = kn.encode_labels(y)
+    split_results = {name: [] for name in score_names}
+    n_splits = split_count(scheme, n_splits, y)
+    for train, test in splitter(scheme, n_splits, test_size,
+                                random_state).split(distances, y_encoded):
+        for name, value in split_scores(distances, y_encoded, classes,
+                                        train, test, n_neighbors,
+                                        weights).items():
+            split_results[name].append(value)
+    intervals = {name: confidence_interval(values, confidence)
+                 for name, values in split_results.items()}
+    return split_results, intervals
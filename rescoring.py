@@ -0,0 +1,176 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+from itertools import product
+
+import numpy as np
+
+import knn_evaluation as kn
+from predictions import confusion, load_predictions
+from result_log import ResultLog, default_log_path, variant_name
+
+
+def stack_confusions(confusions):
+    """
+    :param confusions: list of square confusion matrices of any size
+    :return: array of shape (jobs, labels, labels), smaller matrices are
+        padded with zeros
+    """
+    size = max(len(matrix) for matrix in confusions)
+    stack = np.zeros((len(confusions), size, size))
+    for index, matrix in enumerate(confusions):
+        stack[index, :len(matrix), :len(matrix)] = matrix
+    return stack
+
+
+def safe_divide(numerator, denominator):
+    """
+    :return: the elementwise quotient, 0 where the denominator is 0 like the
+        zero_division default of sklearn
+    """
+    quotient = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=quotient, where=denominator != 0)
+    return quotient
+
+
+def confusion_scores(confusions):
+    """
+    computes the confusion based scores of many jobs at once; macro averages
+    are taken over the labels occurring in the true or predicted classes,
+    the same way sklearn does
+    :param confusions: list of confusion matrices
+    :return: dictionary mapping score names to arrays with one value per job,
+        tp, fp, fn and tn are summed over the one-vs-rest problems of all
+        labels
+    """
+    stack = stack_confusions(confusions)
+    total = stack.sum(axis=(1, 2))
+    tp = np.diagonal(stack, axis1=1, axis2=2)
+    fp = stack.sum(axis=1) - tp
+    fn = stack.sum(axis=2) - tp
+    tn = total[:, np.newaxis] - tp - fp - fn
+    present = (tp + fp + fn) > 0
+    num_present = present.sum(axis=1)
+
+    def macro(values):
+        return (values * present).sum(axis=1) / num_present
+
+    return {
+        'accuracy': tp.sum(axis=1) / total,
+        'precision': macro(safe_divide(tp, tp + fp)),
+        'recall': macro(safe_divide(tp, tp + fn)),
+        'f1-score': macro(safe_divide(2 * tp, 2 * tp + fp + fn)),
+        'specificity': macro(safe_divide(tn, tn + fp)),
+        'tp': (tp * present).sum(axis=1),
+        'fp': (fp * present).sum(axis=1),
+        'fn': (fn * present).sum(axis=1),
+        'tn': (tn * present).sum(axis=1)
+    }
+
+
+def rescore(records, scorers=None):
+    """
+    rescores logged jobs from their prediction sidecars without running any
+    classifier again
+    :param records: list of log records, records without sidecar are skipped
+    :param scorers: dictionary mapping names to functions that take the
+        dictionary returned by load_predictions and return a score, e.g.
+        lambda p: balanced_accuracy_score(p['y_true'], p['y_pred'])
+    :return: list of dictionaries with dataset, metric, window and the
+        scores of every job
+    """
+    records = [record for record in records
+               if 'predictions' in record['result']]
+    if not records:
+        return []
+    sidecars = [load_predictions(record['result']['predictions'])
+                for record in records]
+    scores = confusion_scores([sidecar['confusion'] for sidecar in sidecars])
+    rescored = []
+    for index, (record, sidecar) in enumerate(zip(records, sidecars)):
+        job_scores = {name: float(values[index])
+                      for name, values in scores.items()}
+        for name, scorer in (scorers or {}).items():
+            job_scores[name] = scorer(sidecar)
+        rescored.append({
+            'dataset': record['dataset'],
+            'metric': variant_name(record['metric'],
+                                   record['result']['arguments']),
+            'window': record['window'],
+            'scores': job_scores
+        })
+    return rescored
+
+
+def rescore_variants(records, neighbours=(1,), weights=('uniform',)):
+    """
+    scores numbers of neighbours and voting weights of logged jobs from the
+    test to train distances the jobs kept in the distance store, see
+    store_distances, without computing any distance again
+    :param records: list of log records, records without stored distances
+        and records of splits other than the one loadDataset makes are
+        skipped, every matrix is used once
+    :param neighbours: numbers of neighbours voting
+    :param weights: voting weights evaluated for every number of neighbours
+    :return: list of dictionaries like the ones returned by rescore
+    """
+    # loading datasets needs sklearn and pandas, which the reports do without
+    from sklearn.model_selection import train_test_split
+    from dataset_cache import DatasetCache
+    from distance_store import DistanceStore, split_hash, split_seed
+
+    cache = DatasetCache()
+    matrices = set()
+    jobs, confusions = [], []
+    for record in records:
+        result = record['result']
+        if 'distances' not in result or 'split' not in result or \
+                result['distances'] in matrices:
+            continue
+        matrices.add(result['distances'])
+        y = np.asarray(cache.load(record['dataset'])[1]).astype(str)
+        train, test = train_test_split(
+            np.arange(len(y)), random_state=split_seed(record['dataset']))
+        if split_hash(train, test) != result['split']:
+            continue
+        neigh_dist, neigh_ind = kn.kneighbors_from_distances(
+            DistanceStore.load(result['distances']), max(neighbours))
+        classes, y_train_encoded = kn.encode_labels(y[train])
+        labels = np.union1d(classes, y[test])
+        arguments = {key: value for key, value in result['arguments'].items()
+                     if key not in ('n_neighbors', 'weights')}
+        for n_neighbors, weight in product(neighbours, weights):
+            proba = kn.proba_from_neighbours(
+                neigh_ind[:, :n_neighbors], neigh_dist[:, :n_neighbors],
+                y_train_encoded, len(classes), weight)
+            y_pred = kn.predict_from_proba(proba, classes)
+            confusions.append(confusion(np.searchsorted(labels, y[test]),
+                                        np.searchsorted(labels, y_pred),
+                                        len(labels)))
+            jobs.append((record, arguments if (n_neighbors, weight) ==
+                         (1, 'uniform') else
+                         dict(arguments, n_neighbors=n_neighbors,
+                              weights=weight)))
+    if not jobs:
+        return []
+    scores = confusion_scores(confusions)
+    return [{
+        'dataset': record['dataset'],
+        'metric': variant_name(record['metric'], arguments),
+        'window': record['window'],
+        'scores': {name: float(values[index])
+                   for name, values in scores.items()}
+    } for index, (record, arguments) in enumerate(jobs)]
+
+
+if __name__ == '__main__':
+    for job in rescore(ResultLog(default_log_path).records()):
+        print(f'{job["dataset"]:<32}{job["metric"]:<24}{job["window"]:>6}'
+              f'{job["scores"]["accuracy"]:>10.4f}'
+              f'{job["scores"]["f1-score"]:>10.4f}'
+              f'{job["scores"]["specificity"]:>10.4f}')
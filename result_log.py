@@ -0,0 +1,238 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import file_ops as fo
+from selected_datasets import dataset_archive
+
+default_log_path = './Benchmarks/json/benchmark.log'
+
+# metric arguments holding the window size
+window_arguments = ('w', 'window')
+
+
+def job_key(dataset, metric, window, arguments):
+    """
+    identifies a job independent of how many jobs the classifier used
+    :param dataset: name of the dataset
+    :param metric: name of the metric
+    :param window: the window size
+    :param arguments: dictionary with the recorded metric arguments
+    :return: a hashable tuple
+    """
+    parameters = {key: value for key, value in arguments.items()
+                  if key != 'njobs'}
+    return dataset, metric, window, json.dumps(parameters, sort_keys=True)
+
+
+def record_key(record):
+    return job_key(record['dataset'], record['metric'], record['window'],
+                   record['result']['arguments'])
+
+
+def covers_whole_series(window, series_length):
+    """
+    :param window: window size as fraction of the series length
+    :param series_length: number of timestamps of the series
+    :return: whether the window puts no constraint on the warping path
+    """
+    return window < 0 or int(window * series_length) >= series_length - 1
+
+
+def effective_key(dataset, metric, arguments, series_length):
+    """
+    identifies the result a job computes independent of its window size:
+    metrics without a window argument ignore it, and windows covering the
+    whole series are the same as no window at all
+    :param dataset: name of the dataset
+    :param metric: name of the metric
+    :param arguments: dictionary with the recorded metric arguments
+    :param series_length: number of timestamps of the series, None for
+        series of unequal length whose windows are never merged
+    :return: a hashable tuple
+    """
+    arguments = dict(arguments)
+    for key in window_arguments:
+        if isinstance(arguments.get(key), (int, float)) and \
+                series_length is not None and \
+                covers_whole_series(arguments[key], series_length):
+            arguments[key] = -1
+    return job_key(dataset, metric, None, arguments)
+
+
+def record_effective_key(record):
+    properties = record['properties']
+    series_length = properties['num_of_timestamps'] \
+        if properties['unique_lengths'] else None
+    return effective_key(record['dataset'], record['metric'],
+                         record['result']['arguments'], series_length)
+
+
+def fan_out(record, window, arguments):
+    """
+    copies the record of a job for another window size with the same
+    effective arguments, the copy names the window actually computed
+    :param record: the log record computed
+    :param window: the window size of the copy
+    :param arguments: the recorded metric arguments of the copy
+    :return: the copied log record
+    """
+    result = dict(record['result'], arguments=arguments)
+    computed_window = record['result'].get(
+        'provenance', {}).get('deduplicated-from', record['window'])
+    result['provenance'] = {'deduplicated-from': computed_window}
+    return dict(record, window=window, result=result)
+
+
+def variant_name(metric, arguments):
+    """
+    :param metric: name of the metric
+    :param arguments: dictionary with the recorded metric arguments, which
+        name n_neighbors and weights for all but the 1-NN classifier
+    :return: the name the result is stored under, like 'dtw' for the 1-NN
+        classifier or 'dtw-k5-distance' for 5 distance weighted neighbours
+    """
+    name = metric
+    if 'n_neighbors' in arguments:
+        name += f'-k{arguments["n_neighbors"]}'
+    if arguments.get('weights', 'uniform') != 'uniform':
+        name += f'-{arguments["weights"]}'
+    return name
+
+
+def window_name(window):
+    """
+    formats a window size the way it is used in the json file names
+    :param window: the window size
+    :return: a string like '-1' or '0-3'
+    """
+    return str(window).replace('.', '-')
+
+
+class ResultLog:
+    """
+        This class appends one json record per finished job to a log file,
+        every record is flushed and synced to disk before the next job is
+        started, so a crash loses at most the job that was running
+    """
+    def __init__(self, log_path=default_log_path):
+        """
+        :param log_path: path of the log file
+        """
+        self.log_path = Path(log_path)
+
+    def terminate_last_line(self):
+        """
+        a crash while writing leaves an unterminated last line, which is
+        closed so the next record starts on a line of its own
+        :return: nothing
+        """
+        if not self.log_path.exists() or not self.log_path.stat().st_size:
+            return
+        with open(self.log_path, 'rb+') as log_file:
+            log_file.seek(-1, os.SEEK_END)
+            if log_file.read(1) != b'\n':
+                log_file.write(b'\n')
+
+    def append(self, record):
+        """
+        :param record: dictionary with the keys dataset, metric, window,
+            properties and result
+        :return: nothing
+        """
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.terminate_last_line()
+        with open(self.log_path, 'a') as log_file:
+            log_file.write(json.dumps(record) + '\n')
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    def records(self):
+        """
+        :return: list of all complete records in the log
+        """
+        if not self.log_path.exists():
+            return []
+        records = []
+        with open(self.log_path) as log_file:
+            for line_number, line in enumerate(log_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logging.error(f'{self.log_path}:{line_number} is '
+                                  f'incomplete and will be ignored')
+        return records
+
+    def completed_keys(self):
+        """
+        :return: set with the job keys of all logged records
+        """
+        return {record_key(record) for record in self.records()}
+
+    def reusable_records(self):
+        """
+        :return: dictionary mapping effective keys to the latest computed,
+            not fanned out, record
+        """
+        return {record_effective_key(record): record
+                for record in self.records()
+                if 'provenance' not in record['result']}
+
+
+def compact(records):
+    """
+    turns log records into the nested layout of the result json files,
+    later records of the same job replace earlier ones
+    :param records: list of log records
+    :return: dictionary mapping window sizes to result dictionaries
+    """
+    result_dicts = {}
+    for record in records:
+        result_dict = result_dicts.setdefault(record['window'], {})
+        dataset_dict = result_dict.setdefault(record['dataset'], {})
+        dataset_dict['properties'] = record['properties']
+        dataset_dict[variant_name(record['metric'],
+                                  record['result']['arguments'])] = \
+            record['result']
+    return result_dicts
+
+
+def write_compacted(log_path, json_dir):
+    """
+    compacts a log into one json file per archive and window size, named
+    the way generate_tables_and_plots.py expects them
+    :param log_path: path of the log file
+    :param json_dir: directory the json files are written to
+    :return: list of the written paths
+    """
+    Path(json_dir).mkdir(parents=True, exist_ok=True)
+    written_paths = []
+    for window, result_dict in compact(ResultLog(log_path).records()).items():
+        archives = {}
+        for dataset, dataset_dict in result_dict.items():
+            archives.setdefault(dataset_archive(dataset), {})[dataset] = \
+                dataset_dict
+        for archive, archive_dict in archives.items():
+            json_path = Path(json_dir,
+                             f'{archive}_archive_wws-{window_name(window)}.json')
+            fo.writeJson(json_path, archive_dict)
+            written_paths.append(json_path)
+    return written_paths
+
+
+if __name__ == '__main__':
+    # the files are written next to the log, in a directory named after it
+    log_path = Path(default_log_path)
+    for path in write_compacted(log_path, Path(log_path.parent, log_path.stem)):
+        print(path)
@@ -0,0 +1,297 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import json
+
+import numpy as np
+
+from dataset_details import datasets_details_json_path
+from selected_datasets import datasets as selected_datasets
+
+
+def score_names(scores):
+    """
+    lists the numeric scores of a metric, records like the arguments or the
+    memory usage are left out
+    :param scores: dictionary with the results of a metric
+    :return: list of score names
+    """
+    return [key for key, value in scores.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def unique(items):
+    """
+    :param items: iterable of hashable items
+    :return: list of the items without repetitions, in first-seen order
+    """
+    return list(dict.fromkeys(items))
+
+
+class ScoreArray:
+    """
+        This class holds the scores of one or more result files as a dense
+        array of shape (windows, datasets, metrics, scores), one window per
+        file or group of merged files. Entries a file lacks are nan, and
+        stored tells them apart from scores that are nan themselves.
+        Sums over scores and datasets are accumulated in the order of the
+        files, the way the report generators always added them up, so
+        reports keep every digit.
+    """
+    def __init__(self, values, stored, windows, datasets, metrics, scores,
+                 runtime_intervals=None):
+        """
+        :param values: array of shape (windows, datasets, metrics, scores)
+        :param stored: boolean array of the same shape, true where a score
+            is in the files
+        :param windows: list of labels of the windows
+        :param datasets: list of dataset names
+        :param metrics: list of metric names
+        :param scores: list of score names
+        :param runtime_intervals: array of shape (windows, datasets,
+            metrics, 2) with the confidence intervals of repeatedly timed
+            runtimes, nan where the runtime was taken once
+        """
+        self.values = values
+        self.stored = stored
+        self.windows = windows
+        self.datasets = datasets
+        self.metrics = metrics
+        self.scores = scores
+        self.runtime_intervals = np.full(values.shape[:-1] + (2,), np.nan) \
+            if runtime_intervals is None else runtime_intervals
+        self.dataset_index = {dataset: d for d, dataset in enumerate(datasets)}
+        # whether a window has results for a dataset at all
+        self.present = stored.any(axis=(2, 3))
+
+    def score(self, name):
+        """
+        :param name: name of the score
+        :return: array of shape (windows, datasets, metrics)
+        """
+        return self.values[..., self.scores.index(name)]
+
+    def ranking(self, do_not_rank=None):
+        """
+        the euclidean norm of all scores but the runtime and the scores not
+        to rank
+        :param do_not_rank: list of score names left out
+        :return: array of shape (windows, datasets, metrics)
+        """
+        exclude = ['runtime'] + (do_not_rank or [])
+        squared_result = np.zeros(self.values.shape[:-1])
+        for index, score in enumerate(self.scores):
+            if score not in exclude:
+                squared_result += np.where(self.stored[..., index],
+                                           self.values[..., index], 0) ** 2
+        return np.sqrt(squared_result)
+
+    def dataset_indices(self, datasets):
+        return [self.dataset_index[dataset] for dataset in datasets]
+
+    def dataset_mean(self, values, datasets=None):
+        """
+        averages values over datasets, every window over the datasets it
+        has results for
+        :param values: array of shape (windows, datasets, metrics)
+        :param datasets: list of the dataset names averaged over, all
+            datasets if None
+        :return: array of shape (windows, metrics)
+        """
+        indices = list(range(len(self.datasets))) if datasets is None \
+            else self.dataset_indices(datasets)
+        present = self.present[:, indices]
+        summands = np.where(present[..., np.newaxis], values[:, indices], 0)
+        return np.add.accumulate(summands, axis=1)[:, -1] / \
+            present.sum(axis=1)[:, np.newaxis]
+
+    def runtime_errors(self):
+        """
+        the distances of the mean confidence bounds of repeatedly timed
+        runtimes from the mean runtime, as drawn by error bars; bounds and
+        runtime are both averaged over the datasets with runtime
+        statistics only, datasets timed once are left out
+        :return: a tuple of arrays of shape (windows, metrics) below and
+            above the mean runtime, 0 where no runtime was timed repeatedly,
+            None if no runtime was timed repeatedly at all
+        """
+        if np.isnan(self.runtime_intervals).all():
+            return None
+        timed = self.present[..., np.newaxis] & \
+            ~np.isnan(self.runtime_intervals).any(axis=-1)
+        counts = timed.sum(axis=1)
+
+        def timed_mean(values):
+            # nan for windows and metrics without any statistics
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(timed, values, 0).sum(axis=1) / counts
+
+        mean_runtimes = timed_mean(self.score('runtime'))
+        low = timed_mean(self.runtime_intervals[..., 0])
+        high = timed_mean(self.runtime_intervals[..., 1])
+        return np.maximum(np.nan_to_num(mean_runtimes - low), 0), \
+            np.maximum(np.nan_to_num(high - mean_runtimes), 0)
+
+    def group_mean(self, values, datasets, groups, num_groups):
+        """
+        averages values over the datasets of each group at once, every
+        window over the datasets it has results for
+        :param values: array of shape (windows, datasets, metrics)
+        :param datasets: list of the dataset names averaged over
+        :param groups: array with the index of the group of each dataset
+        :param num_groups: number of groups
+        :return: a tuple of an array of shape (windows, groups, metrics)
+            with the averages, and an array of shape (windows, groups) with
+            the number of datasets averaged over
+        """
+        indices = self.dataset_indices(datasets)
+        present = self.present[:, indices]
+        sums = np.zeros((len(self.windows), num_groups) + values.shape[2:])
+        counts = np.zeros((len(self.windows), num_groups), dtype=int)
+        # add.at adds the datasets of a group one after the other
+        np.add.at(sums, (slice(None), groups),
+                  np.where(present[..., np.newaxis], values[:, indices], 0))
+        np.add.at(counts, (slice(None), groups), present)
+        return sums / counts[..., np.newaxis], counts
+
+    def high_scores(self, window=0):
+        """
+        finds the metric with the best value of each score on each dataset,
+        the lowest for the runtime and the highest for other scores, the
+        last of the metrics on ties
+        :param window: index of the window
+        :return: dictionary mapping dataset names to dictionaries mapping
+            score names to metric names
+        """
+        lowest = np.array([score == 'runtime' for score in self.scores])
+        values = np.where(lowest, -self.values[window], self.values[window])
+        values = np.where(self.stored[window] & ~np.isnan(values), values,
+                          -np.inf)
+        best = values.max(axis=1)
+        is_best = (values == best[:, np.newaxis]) & (values > -np.inf)
+        # scores other than the runtime start out from a high score of 0
+        is_best &= lowest | (values >= 0)
+        last_best = len(self.metrics) - 1 - \
+            np.argmax(is_best[:, ::-1], axis=1)
+        has_best = is_best.any(axis=1)
+        return {dataset: {score: self.metrics[last_best[d, s]]
+                          for s, score in enumerate(self.scores)
+                          if has_best[d, s]}
+                for d, dataset in enumerate(self.datasets)
+                if self.present[window, d]}
+
+
+class ResultSet:
+    """
+        This class loads every result file and the datasets details once
+        and keeps them for all reports. Scores are handed out as dense
+        ScoreArrays, which are cached as well.
+    """
+    def __init__(self, details_path=datasets_details_json_path):
+        """
+        :param details_path: path of the datasets details json file
+        """
+        self.details_path = details_path
+        self.files = {}
+        self.arrays = {}
+
+    def data(self, json_path):
+        """
+        :param json_path: path of a json file
+        :return: the content of the file, loaded on first use
+        """
+        json_path = str(json_path)
+        if json_path not in self.files:
+            with open(json_path) as json_file:
+                self.files[json_path] = json.load(json_file)
+        return self.files[json_path]
+
+    def details(self):
+        return self.data(self.details_path)
+
+    def merged_data(self, json_paths):
+        """
+        :param json_paths: a path or a list of paths of result files
+        :return: dictionary with the results of all files, later files
+            update earlier ones
+        """
+        if isinstance(json_paths, (list, tuple)):
+            data = {}
+            for json_path in json_paths:
+                data.update(self.data(json_path))
+            return data
+        return self.data(json_paths)
+
+    def scores(self, windows):
+        """
+        :param windows: list with a path or a list of paths per window, the
+            files of a window are merged like the UEA and UCR archives
+        :return: a ScoreArray over all datasets, metrics and scores of the
+            files, the windows are labelled by their paths
+        """
+        key = tuple(tuple(paths) if isinstance(paths, (list, tuple))
+                    else paths for paths in windows)
+        if key not in self.arrays:
+            self.arrays[key] = self.score_array(
+                [self.merged_data(paths) for paths in windows], list(key))
+        return self.arrays[key]
+
+    @staticmethod
+    def score_array(window_data, windows):
+        # jobs aborted by their time or memory limit have a status instead
+        # of scores
+        results = [{dataset: {metric: scores
+                              for metric, scores in dataset_results.items()
+                              if metric != 'properties' and
+                              'status' not in scores}
+                    for dataset, dataset_results in data.items()}
+                   for data in window_data]
+        datasets = unique(dataset for data in results for dataset in data)
+        metrics = unique(metric for data in results
+                         for dataset_results in data.values()
+                         for metric in dataset_results)
+        scores = unique(score for data in results
+                        for dataset_results in data.values()
+                        for metric_scores in dataset_results.values()
+                        for score in score_names(metric_scores))
+        shape = (len(windows), len(datasets), len(metrics), len(scores))
+        values = np.full(shape, np.nan)
+        stored = np.zeros(shape, dtype=bool)
+        runtime_intervals = np.full(shape[:-1] + (2,), np.nan)
+        dataset_index = {dataset: d for d, dataset in enumerate(datasets)}
+        metric_index = {metric: m for m, metric in enumerate(metrics)}
+        score_index = {score: s for s, score in enumerate(scores)}
+        for w, data in enumerate(results):
+            for dataset, dataset_results in data.items():
+                d = dataset_index[dataset]
+                for metric, metric_scores in dataset_results.items():
+                    m = metric_index[metric]
+                    for score in score_names(metric_scores):
+                        values[w, d, m, score_index[score]] = \
+                            metric_scores[score]
+                        stored[w, d, m, score_index[score]] = True
+                    if 'runtime-statistics' in metric_scores:
+                        statistics = metric_scores['runtime-statistics']
+                        runtime_intervals[w, d, m] = [statistics['ci-low'],
+                                                      statistics['ci-high']]
+        return ScoreArray(values, stored, windows, datasets, metrics, scores,
+                          runtime_intervals)
+
+    def property_groups(self, property_name):
+        """
+        groups the selected datasets by a property
+        :param property_name: name of a property in the datasets details
+        :return: a tuple of the sorted list of property values, the list of
+            selected datasets and an array with the index of the value of
+            each dataset
+        """
+        details = self.details()
+        values, groups = np.unique(
+            [details[dataset][property_name] for dataset in selected_datasets],
+            return_inverse=True)
+        return values.tolist(), list(selected_datasets), groups
@@ -0,0 +1,234 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import file_ops as fo
+from cost_model import band_width, record_window
+from result_log import variant_name, window_name
+from z_normalize_benchmark import synthetic_panel
+
+default_scaling_dir = './Benchmarks/json/scaling/'
+
+# the shape every sweep starts out from, one property is varied at a time
+base_shape = {'num_of_timestamps': 64, 'len train set': 32,
+              'len test set': 16, 'num_of_dimensions': 1}
+base_window = 0.1
+
+sweeps = {
+    'num_of_timestamps': [32, 64, 128, 256],
+    'len train set': [16, 32, 64, 128],
+    'len test set': [8, 16, 32, 64],
+    'num_of_dimensions': [1, 2, 4, 8]
+}
+windows = [0.05, 0.1, 0.2, 0.4, -1]
+
+# short names of the swept properties used in dataset and file names
+sweep_names = {'num_of_timestamps': 'timestamps', 'len train set': 'train',
+               'len test set': 'test', 'num_of_dimensions': 'dimensions'}
+
+
+def labelled_panel(num_of_instances, num_of_dimensions, num_of_timestamps,
+                   num_of_classes=2, seed=1):
+    """
+    adds sine waves to the random panel of z_normalize_benchmark, the
+    frequency of a wave depends on its class
+    :param num_of_instances: number of instances
+    :param num_of_dimensions: number of dimensions of every instance
+    :param num_of_timestamps: number of timestamps of every series
+    :param num_of_classes: number of classes
+    :param seed: seed of the random numbers, the same seed always gives the
+        same panel
+    :return: a tuple of an array of shape (instances, dimensions,
+        timestamps) and an array with the labels as strings
+    """
+    classes = np.arange(num_of_instances) % num_of_classes
+    time = np.linspace(0, 2 * np.pi, num_of_timestamps)
+    frequencies = (classes + 1)[:, np.newaxis, np.newaxis]
+    # about as large as the noise of the random panel
+    X = 3 * np.sin(frequencies * time) + synthetic_panel(
+        num_of_instances, num_of_dimensions, num_of_timestamps, seed)
+    return X, (classes + 1).astype(str)
+
+
+def run_panel(benchmark, dataset, X, y, n_train, metrics):
+    """
+    :param benchmark: the TimeseriesBenchmark to run the metrics with
+    :param dataset: name the results are recorded under
+    :param X: array of shape (instances, dimensions, timestamps)
+    :param y: array with the labels of the instances
+    :param n_train: number of training instances at the start of X
+    :param metrics: list of metric names
+    :return: dictionary with the properties and results of the dataset, as
+        in the benchmark json files
+    """
+    benchmark.setPanels(dataset, X[:n_train], y[:n_train], X[n_train:],
+                        y[n_train:])
+    dataset_dict = {'properties': benchmark.properties()}
+    for group in benchmark.composition_groups(metrics):
+        for metric, result in benchmark.run_metrics(group):
+            dataset_dict[variant_name(metric, result['arguments'])] = result
+    benchmark.recorder.clear()
+    return dataset_dict
+
+
+def run_point(benchmark, dataset, shape, metrics, seed=1, traced=None):
+    """
+    runs all metrics on a synthetic dataset of the given shape
+    :param benchmark: the TimeseriesBenchmark the metrics are timed with
+    :param dataset: name the results are recorded under
+    :param shape: dictionary with the properties of base_shape
+    :param metrics: list of metric names
+    :param seed: seed of the synthetic panel
+    :param traced: TimeseriesBenchmark tracing memory, if given the metrics
+        are run a second time with it and its memory records replace the
+        ones of the timed run, tracing would slow down the timed run
+    :return: dictionary with the properties and results of the dataset, as
+        in the benchmark json files
+    """
+    n_train = shape['len train set']
+    X, y = labelled_panel(n_train + shape['len test set'],
+                          shape['num_of_dimensions'],
+                          shape['num_of_timestamps'], seed=seed)
+    dataset_dict = run_panel(benchmark, dataset, X, y, n_train, metrics)
+    if traced is not None:
+        traced_dict = run_panel(traced, dataset, X, y, n_train, metrics)
+        # the recorder starts tracing again with its next phase
+        tracemalloc.stop()
+        for name, result in dataset_dict.items():
+            if name != 'properties':
+                result['memory'] = traced_dict[name]['memory']
+    return dataset_dict
+
+
+def peak_memory(result):
+    """
+    :param result: dictionary with the results of a metric
+    :return: the largest python heap allocation of its phases in bytes
+    """
+    return max(phase['peak-heap'] or 0 for phase in result['memory'].values())
+
+
+def fitted_exponent(sizes, values):
+    """
+    :param sizes: list with the swept size of every point
+    :param values: list with the measurement of every point
+    :return: the slope of the line through the log log values, measurements
+        of 0, like runtimes below the resolution of the timer, are left
+        out; None if less than two are left
+    """
+    points = [(size, value) for size, value in zip(sizes, values)
+              if value > 0]
+    if len(points) < 2:
+        return None
+    sizes, values = zip(*points)
+    return float(np.polyfit(np.log(sizes), np.log(values), 1)[0])
+
+
+def scaling_exponents(sizes, results, windowed_only=False):
+    """
+    fits runtime ~ size ** exponent and memory ~ size ** exponent by a line
+    through the log log values
+    :param sizes: list with the swept size of every point
+    :param results: list with the dataset dictionary of every point
+    :param windowed_only: whether metrics without a window argument are
+        left out, for sweeps of the window size
+    :return: dictionary mapping metric names to dictionaries with the
+        exponents of runtime and memory
+    """
+    exponents = {}
+    metrics = [metric for metric in results[0] if metric != 'properties']
+    for metric in metrics:
+        if windowed_only and \
+                record_window(results[0][metric]['arguments']) is None:
+            continue
+        runtimes = [result[metric]['runtime'] for result in results]
+        memory = [peak_memory(result[metric]) for result in results]
+        exponents[metric] = {
+            'runtime': fitted_exponent(sizes, runtimes),
+            'memory': fitted_exponent(sizes, memory)
+        }
+    return exponents
+
+
+def run_scaling_benchmark(metrics, scaling_dir=default_scaling_dir, njobs=1,
+                          normalized=True):
+    """
+    sweeps every property of base_shape and the window size, one at a time;
+    every sweep is written into a json file in the layout of the benchmark
+    files, every window size into a file of its own named like the archive
+    files, so the windows can be plotted like generate_trend_diagram does,
+    and the fitted exponents into scaling_exponents.json
+    :param metrics: list of metric names
+    :param scaling_dir: directory the json files are written to
+    :param njobs: number of jobs handed on to the classifier
+    :param normalized: whether the panels are z-normalized
+    :return: dictionary mapping the swept properties and 'window' to the
+        exponents of every metric
+    """
+    from ts_benchmark import TimeseriesBenchmark
+
+    Path(scaling_dir).mkdir(parents=True, exist_ok=True)
+    exponents = {}
+
+    def benchmark(window, trace_memory=False):
+        return TimeseriesBenchmark(window=window, njobs=njobs,
+                                   normalized=normalized,
+                                   trace_memory=trace_memory,
+                                   save_predictions=False)
+
+    # the runtimes are timed untraced, the memory exponents are fitted on
+    # the python heap traced in a second run
+    timed, traced = benchmark(base_window), benchmark(base_window, True)
+    for property_name, values in sweeps.items():
+        results = {}
+        for value in values:
+            shape = dict(base_shape, **{property_name: value})
+            dataset = f'synthetic_{sweep_names[property_name]}-{value}'
+            results[dataset] = run_point(timed, dataset, shape, metrics,
+                                         traced=traced)
+        fo.writeJson(Path(scaling_dir,
+                          f'synthetic_{sweep_names[property_name]}.json'),
+                     results)
+        exponents[property_name] = scaling_exponents(values,
+                                                     list(results.values()))
+    results = []
+    for window in windows:
+        results.append(run_point(benchmark(window), 'synthetic', base_shape,
+                                 metrics, traced=benchmark(window, True)))
+        fo.writeJson(Path(scaling_dir,
+                          f'synthetic_archive_wws-{window_name(window)}.json'),
+                     {'synthetic': results[-1]})
+    # the window is swept as the width of the band it allows
+    exponents['window'] = scaling_exponents(
+        [band_width(window, base_shape['num_of_timestamps'])
+         for window in windows], results, windowed_only=True)
+    fo.writeJson(Path(scaling_dir, 'scaling_exponents.json'), exponents)
+    return exponents
+
+
+if __name__ == '__main__':
+    metrics = [
+        'dagdtw',
+        'bagdtw', 'dtw',
+        'sdtw', 'ddtw',
+        'wdtw', 'wddtw'
+    ]
+    for property_name, metric_exponents in \
+            run_scaling_benchmark(metrics).items():
+        print(property_name)
+        for metric, exponent in metric_exponents.items():
+            runtime, memory = (
+                'n/a' if exponent[measure] is None
+                else f'{exponent[measure]:.2f}'
+                for measure in ('runtime', 'memory'))
+            print(f'    {metric:<24}runtime ~ n^{runtime:<8}'
+                  f'memory ~ n^{memory}')
@@ -1,4 +1,4 @@
-dataset_domains = {
+uea_dataset_domains = {
     # datasets from UEA archive (multivariate)
     "ArticularyWordRecognition": "MOTION",
     "AtrialFibrillation": "ECG",
@@ -14,7 +14,9 @@ dataset_domains = {
     "SelfRegulationSCP2": "EEG",
     "StandWalkJump": "ECG",
     "UWaveGestureLibrary": "HAR",
+}
 
+ucr_dataset_domains = {
     # datasets from UCR archive (univariate)
     "ACSF1": "DEVICE",
     "ArrowHead": "IMAGE",
@@ -71,8 +73,18 @@ dataset_domains = {
     "WormsTwoClass": "MOTION",
 }
 
+dataset_domains = {**uea_dataset_domains, **ucr_dataset_domains}
+
 datasets = list(dataset_domains.keys())
 
+
+def dataset_archive(dataset):
+    """
+    :param dataset: name of the dataset
+    :return: 'UEA' or 'UCR', the archive the dataset belongs to
+    """
+    return 'UEA' if dataset in uea_dataset_domains else 'UCR'
+
 if __name__ == '__main__':
     domains = {dataset_domains[dataset] for dataset in datasets}
     print(sorted(list(domains)))
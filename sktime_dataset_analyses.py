@@ -6,8 +6,15 @@ __copyright__ = "Copyright 2020 – Ansgar Asseburg; " \
                 "information in"
 __email__ = "s2092795@stud.uni-frankfurt.de"
 
+import warnings
+
 import numpy as np
 
+z_normalization_axes = {
+    'series': (2,),  # each series of each instance on its own
+    'dimension': (0, 2)  # each dimension over all instances
+}
+
 
 def z_normalize(sktime_dataframe):
     num_instances = sktime_dataframe.shape[0]
@@ -15,13 +22,38 @@ def z_normalize(sktime_dataframe):
     for loc_instance in range(num_instances):
         instance = sktime_dataframe.iloc[loc_instance]
         for loc_dimension in range(num_dimensions):
-            dimension = instance.iloc[0]
+            dimension = instance.iloc[loc_dimension]
             dim_mean = dimension.mean()
             dim_std_dev = dimension.std()
             dimension = (dimension - dim_mean) / dim_std_dev
             sktime_dataframe.iat[loc_instance, loc_dimension] = dimension
     return sktime_dataframe
 
+
+def z_normalize_panel(panel, mode='series'):
+    """
+    z-normalizes a whole panel with one vectorized operation per axis
+    :param panel: array of shape (instances, dimensions, timestamps)
+    :param mode: 'series' normalizes every series of every instance,
+        'dimension' normalizes every dimension over all instances
+    :return: a new float64 array of the same shape; NaNs are ignored for
+        mean and standard deviation and stay in place, series with zero
+        variance are only centered
+    """
+    if mode not in z_normalization_axes:
+        raise ValueError(f'unknown z-normalization mode {mode}')
+    axes = z_normalization_axes[mode]
+    panel = np.asarray(panel, dtype=float)
+    with warnings.catch_warnings():
+        # all NaN series and series with a single value are handled below
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mean = np.nanmean(panel, axis=axes, keepdims=True)
+        # same degrees of freedom as pandas, which z_normalize uses
+        std_dev = np.nanstd(panel, axis=axes, ddof=1, keepdims=True)
+    std_dev[~(std_dev > 0)] = 1.0
+    return (panel - mean) / std_dev
+
+
 def dataset_properties(X_train, y_train, X_test):
     '''
     retrieve characteristics from the given dataset
@@ -0,0 +1,26 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import pytest
+
+from job_scheduler import Job, JobScheduler
+from result_log import ResultLog
+
+
+def test_job_over_its_time_limit_is_aborted(tmp_path):
+    pytest.importorskip('sktime')
+    scheduler = JobScheduler(max_workers=1, json_dir=tmp_path,
+                             log_path=tmp_path / 'benchmark.log',
+                             save_predictions=False, time_limit=0.5)
+    scheduler.run([Job('BasicMotions', 'dtw', -1)])
+    records = ResultLog(tmp_path / 'benchmark.log').records()
+    assert records
+    for record in records:
+        assert record['result']['status'] == 'aborted'
+        assert record['result']['reason'] == 'timed-out'
+        assert 'accuracy' not in record['result']
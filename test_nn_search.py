@@ -0,0 +1,61 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import numpy as np
+import pytest
+
+from nn_search import NearestNeighbourSearch, window_radius
+
+
+def reference_dtw(query, candidate, radius):
+    """
+    textbook dtw with squared euclidean local costs inside the band
+    |i - j| <= radius, widened to the difference of the lengths
+    """
+    m, n = len(query), len(candidate)
+    radius = max(radius, abs(m - n))
+    accumulated = np.full((m + 1, n + 1), np.inf)
+    accumulated[0, 0] = 0
+    for i in range(1, m + 1):
+        for j in range(max(1, i - radius), min(n, i + radius) + 1):
+            cost = ((query[i - 1] - candidate[j - 1]) ** 2).sum()
+            accumulated[i, j] = cost + min(accumulated[i - 1, j - 1],
+                                           accumulated[i - 1, j],
+                                           accumulated[i, j - 1])
+    return accumulated[m, n]
+
+
+def reference_neighbours(X_train, X_test, window):
+    """
+    :return: a tuple of the distances and indices of the nearest neighbours
+        by comparing every pair, ties resolved by the smaller index
+    """
+    train = np.transpose(X_train, (0, 2, 1))
+    test = np.transpose(X_test, (0, 2, 1))
+    radius = window_radius(window, train.shape[1])
+    distances = np.array([[reference_dtw(query, candidate, radius)
+                           for candidate in train] for query in test])
+    indices = np.argmin(distances, axis=1)
+    return distances[np.arange(len(test)), indices], indices
+
+
+@pytest.mark.parametrize('window, test_length', [
+    (0.0, 24),   # radius 0
+    (0.05, 24),  # radius 1
+    (-1, 24),    # no constraint
+    (0.1, 20),   # series of unequal length
+])
+def test_cascade_matches_brute_force_dtw(window, test_length):
+    rng = np.random.default_rng(7)
+    X_train = rng.normal(size=(30, 2, 24)).cumsum(axis=2)
+    X_test = rng.normal(size=(8, 2, test_length)).cumsum(axis=2)
+    neigh_dist, neigh_ind = NearestNeighbourSearch(
+        window, batch_size=4).fit(X_train).kneighbors(X_test)
+    distances, indices = reference_neighbours(X_train, X_test, window)
+    np.testing.assert_array_equal(neigh_ind[:, 0], indices)
+    np.testing.assert_allclose(neigh_dist[:, 0], distances)
@@ -0,0 +1,49 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import pytest
+
+from result_log import ResultLog, compact, record_key
+
+
+def benchmark(tmp_path, **kwargs):
+    pytest.importorskip('sktime')
+    from ts_benchmark import TimeseriesBenchmark
+    benchmark = TimeseriesBenchmark(
+        njobs=1, log_path=tmp_path / 'benchmark.log', save_predictions=False,
+        distance_dir=tmp_path / 'distances', **kwargs)
+    benchmark.json_file_path = tmp_path / 'result.json'
+    return benchmark
+
+
+def test_resumed_resampling_logs_every_variant_once(tmp_path):
+    for _ in range(2):
+        benchmark(tmp_path, resampling='random', n_splits=2,
+                  neighbours=(1, 3), weights=('uniform', 'distance')) \
+            .run_benchmark_over(['BasicMotions'], ['dtw'])
+    records = ResultLog(tmp_path / 'benchmark.log').records()
+    assert len(records) == 4
+    assert len({record_key(record) for record in records}) == 4
+    assert set(compact(records)[-1]['BasicMotions']) == \
+        {'properties', 'dtw', 'dtw-k1-distance', 'dtw-k3', 'dtw-k3-distance'}
+    for record in records:
+        assert record['result']['resampling']['n_splits'] == 2
+
+
+def test_compact_keeps_the_latest_record_of_a_job():
+    def record(accuracy, **arguments):
+        return {'dataset': 'BasicMotions', 'metric': 'dtw', 'window': -1,
+                'properties': {},
+                'result': {'arguments': dict(arguments, njobs=accuracy),
+                           'accuracy': accuracy}}
+
+    result_dict = compact([
+        record(1), record(2, n_neighbors=3, weights='uniform'), record(3)
+    ])[-1]['BasicMotions']
+    assert result_dict['dtw']['accuracy'] == 3
+    assert result_dict['dtw-k3']['accuracy'] == 2
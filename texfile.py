@@ -10,6 +10,11 @@ import os
 import time
 from datetime import datetime
 
+# paths of the files written by this process and of the tex files whose
+# writing failed, see build_graph.run_step
+written_paths = []
+failed_paths = []
+
 
 class TexFile:
     EOL = '\\\\'
@@ -28,9 +33,15 @@ class TexFile:
         pass
 
     def __del__(self):
-        self.compile_file_lines()
-        with open(self.tex_path, 'w') as tex_object:
-            tex_object.write(self.CR.join(self.file_lines))
+        try:
+            self.compile_file_lines()
+            with open(self.tex_path, 'w') as tex_object:
+                tex_object.write(self.CR.join(self.file_lines))
+        except Exception:
+            # python only prints exceptions raised here
+            failed_paths.append(str(self.tex_path))
+            raise
+        written_paths.append(str(self.tex_path))
 
     def timestamp_and_sources(self):
         class_name = self.__class__.__name__
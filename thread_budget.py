@@ -0,0 +1,115 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import os
+
+# environment variables read by OpenMP and the BLAS libraries when their
+# thread pools start
+thread_variables = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                    'MKL_NUM_THREADS', 'BLIS_NUM_THREADS',
+                    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def available_cpus():
+    """
+    :return: sorted list of the cpus this process may run on
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def thread_pools():
+    """
+    :return: list of dictionaries with the library, api and number of
+        threads of every native thread pool loaded, empty if threadpoolctl
+        is not installed
+    """
+    try:
+        from threadpoolctl import threadpool_info
+    except ImportError:
+        return []
+    return [{'library': pool['internal_api'], 'api': pool['user_api'],
+             'threads': pool['num_threads']} for pool in threadpool_info()]
+
+
+def thread_configuration(njobs):
+    """
+    :param njobs: number of jobs handed on to joblib
+    :return: dictionary with the thread settings in effect, stored with
+        every result
+    """
+    return {
+        'njobs': njobs,
+        'environment': {variable: os.environ.get(variable)
+                        for variable in thread_variables},
+        'affinity': available_cpus(),
+        'pools': thread_pools()
+    }
+
+
+class ThreadBudget:
+    """
+        This class splits a number of threads between joblib workers and
+        the OpenMP and BLAS threads each of them starts, so a job never runs
+        more threads than it has cpus. The environment variables are
+        inherited by joblib worker processes started afterwards; thread
+        pools already loaded into the process are limited with threadpoolctl
+        if it is installed.
+    """
+    def __init__(self, threads=None, njobs=1, cpus=None):
+        """
+        :param threads: number of threads the job may use, defaults to the
+            number of cpus or of the cpus pinned to
+        :param njobs: number of jobs handed on to joblib, -1 for one per
+            thread
+        :param cpus: list of cpus the job is pinned to, None to leave the
+            affinity alone
+        """
+        self.cpus = cpus
+        if threads is None:
+            threads = len(cpus) if cpus else os.cpu_count()
+        self.threads = max(1, threads)
+        self.njobs = self.threads if njobs < 0 else max(1, njobs)
+        self.inner_threads = max(1, self.threads // self.njobs)
+
+    def apply(self):
+        """
+        sets the thread budget for the current process and the processes it
+        starts afterwards
+        :return: nothing
+        """
+        if self.cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.cpus)
+        for variable in thread_variables:
+            os.environ[variable] = str(self.inner_threads)
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            return
+        threadpool_limits(self.inner_threads)
+
+    def configuration(self):
+        """
+        :return: dictionary with the thread settings in effect
+        """
+        return thread_configuration(self.njobs)
+
+
+def slot_cpus(slot, slots, cpus=None):
+    """
+    divides the cpus evenly between the worker slots of a scheduler
+    :param slot: index of the slot
+    :param slots: number of slots
+    :param cpus: list of cpus to divide, defaults to all available ones
+    :return: list of the cpus of the slot, at least one
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    share = max(1, len(cpus) // slots)
+    start = (slot * share) % len(cpus)
+    return cpus[start:start + share]
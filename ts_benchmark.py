@@ -7,18 +7,15 @@ __copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
 __email__ = "s2092795@stud.uni-frankfurt.de"
 
 import json
-import resource
+import math
 import time
 import logging
-import tracemalloc
 import os
 from datetime import datetime
 from selected_datasets import datasets
 
 import numpy as np
 from sktime.classification.distance_based import KNeighborsTimeSeriesClassifier
-from sktime.datasets import load_UCR_UEA_dataset
-from sktime.utils.data_io import load_from_arff_to_dataframe
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import (
     accuracy_score,
@@ -28,29 +25,98 @@ from sklearn.metrics import (
 )
 
 from sktime_dataset_analyses import dataset_properties, \
-    z_normalize, \
+    z_normalize_panel, \
     has_equal_length_in_all_time_series
+import knn_evaluation as kn
+import distance_matrix as dm
+import resampling
+import parameter_tuning
+from predictions import default_predictions_dir, predictions_path, \
+    write_predictions
+from distance_store import DistanceStore, default_memory_budget, \
+    default_store_dir, split_hash, split_seed
+from dataset_cache import DatasetCache, panel_to_nested
+from result_log import ResultLog, compact, default_log_path, job_key, \
+    effective_key, fan_out, variant_name
+from instrumentation import PhaseRecorder, print_timing_summary, \
+    repeat_timed, runtime_statistics
+from nn_search import NearestNeighbourSearch, supported_metrics
+from thread_budget import ThreadBudget, thread_configuration
+
+# phases recorded once per dataset, shared by the results of all metrics
+dataset_phases = ('load', 'normalize', 'split')
 
 
 class TimeseriesBenchmark:
-    def __init__(self, window=-1, njobs=-1, normalized=False):
+    def __init__(self, window=-1, njobs=-1, normalized=False,
+                 single_distance_pass=True, normalization_mode='series',
+                 log_path=default_log_path, trace_memory=False,
+                 lower_bound_search=False, multi_composition=False,
+                 resampling=None, n_splits=30, store_distances=False,
+                 tuning=False, neighbours=(1,), weights=('uniform',),
+                 save_predictions=True,
+                 predictions_dir=default_predictions_dir,
+                 distance_dir=default_store_dir,
+                 memory_budget=default_memory_budget,
+                 warm_up=0, repetitions=1):
         self.normalized = normalized
+        self.normalization_mode = normalization_mode
+        self.single_distance_pass = single_distance_pass
         self.njobs = njobs
         self.window = window
+        self.lower_bound_search = lower_bound_search
+        self.multi_composition = multi_composition
+        self.resampling = resampling
+        self.n_splits = n_splits
+        self.store_distances = store_distances
+        self.tuning = tuning
+        self.neighbours = sorted(neighbours)
+        self.weights = list(weights)
+        self.save_predictions = save_predictions
+        self.predictions_dir = predictions_dir
+        self.distance_store = DistanceStore(distance_dir, memory_budget)
+        self.warm_up = warm_up
+        self.repetitions = repetitions
         self.json_file_path = time.strftime('./Benchmarks/json/' + "%Y-%m-%d__%H-%M-%S" + '.json')
+        self.result_log = ResultLog(log_path)
         self.accuracy_score = 0
         self.recall_score = 0
         self.f1_score = 0
         self.auroc_score = 0
         self.classifier = None
+        self.search = None
         self.X_train = None
         self.X_test = None
+        self.dataset = None
+        self.X_panel = None
+        self.y = None
+        self.train_index = None
+        self.test_index = None
+        self.X_train_panel = None
+        self.X_test_panel = None
         self.y_train = None
         self.y_test = None
         self.y_test_pred = None
+        self.y_test_proba = None
+        self.neigh_dist = None
+        self.neigh_ind = None
         self.runtime = 0
+        self.runtime_statistics = None
+        # key of the test to train distances computed by the timed calls,
+        # kept in the distance store after them
+        self.timed_key = None
+        # function taking the numbers of test instances classified,
+        # classified correctly and in total, called after every chunk of
+        # the test set if set, see find_neighbours_in_chunks
+        self.progress = None
+        self.progress_chunks = 20
         self.result_dict = {}
         self.metric_arguments = {}
+        self.sktime_metric = None
+        self.metric_params = {}
+        self.distance_path = None
+        self.dataset_cache = DatasetCache()
+        self.recorder = PhaseRecorder(trace_memory)
         np.random.seed(1)  # required to get reproducible results
         # set filepath and suffix for arff files
         self.dataset_path = '/Users/Developer' \
@@ -60,46 +126,360 @@ class TimeseriesBenchmark:
         self.arff_file_suffix = '.arff'
 
     def loadDataset(self, dataset):
-        # try:
-        X, y = load_UCR_UEA_dataset(dataset, return_X_y=True)
-        # except:
-            # file_path = os.path.join(self.dataset_path, dataset,
-            #                          dataset + self.arff_file_suffix)
-            # X, y = load_from_arff_to_dataframe(file_path,
-            #                                    return_separate_X_and_y=True)
-        X_train_test = z_normalize(X) if self.normalized else X
-        self.X_train, self.X_test, self.y_train, self.y_test = \
-            train_test_split(X_train_test, y)
+        with self.recorder.phase('load'):
+            X, y = self.dataset_cache.load(dataset)
+        if self.normalized:
+            with self.recorder.phase('normalize'):
+                X = z_normalize_panel(X, self.normalization_mode)
+        self.dataset, self.X_panel, self.y = dataset, X, y
+        with self.recorder.phase('split'):
+            self.X_train_panel, self.X_test_panel, self.y_train, self.y_test, \
+                self.train_index, self.test_index = \
+                train_test_split(X, y, np.arange(len(y)),
+                                 random_state=split_seed(dataset))
+            self.X_train = panel_to_nested(self.X_train_panel)
+            self.X_test = panel_to_nested(self.X_test_panel)
 
         print(f'{self.current_timestamp()}loaded dataset {dataset}')
 
+    def setPanels(self, dataset, X_train, y_train, X_test, y_test):
+        """
+        sets a dataset that is already split, like the synthetic panels of
+        the scaling benchmark, instead of loading one
+        :param dataset: name the results are recorded under
+        :param X_train: array of shape (instances, dimensions, timestamps)
+        :param y_train: array with the labels of the training instances
+        :param X_test: array of shape (instances, dimensions, timestamps)
+        :param y_test: array with the labels of the test instances
+        :return: nothing
+        """
+        X = np.concatenate([X_train, X_test])
+        y = np.concatenate([y_train, y_test])
+        if self.normalized:
+            with self.recorder.phase('normalize'):
+                X = z_normalize_panel(X, self.normalization_mode)
+        self.dataset, self.X_panel, self.y = dataset, X, y
+        self.train_index = np.arange(len(X_train))
+        self.test_index = np.arange(len(X_train), len(X))
+        self.X_train_panel = X[self.train_index]
+        self.X_test_panel = X[self.test_index]
+        self.y_train, self.y_test = y[self.train_index], y[self.test_index]
+        self.X_train = panel_to_nested(self.X_train_panel)
+        self.X_test = panel_to_nested(self.X_test_panel)
+
     def current_timestamp(self):
         timestamp = datetime.now().strftime("%Y-%b-%d %H:%M:%S")
         return f'{timestamp}\t'
 
+    def compose_arguments(self, metric, kwargs):
+        """
+        :param metric: string containing the sktime name of the metric
+        :param kwargs: dictionary with the keyword arguments of a metric
+        :return: the arguments as they are recorded in the results
+        """
+        arguments = kwargs.copy()
+        arguments['njobs'] = self.njobs
+        arguments['z-normalized'] = self.normalized
+        if self.normalized:
+            arguments['z-normalization'] = self.normalization_mode
+        if self.uses_search(metric):
+            arguments['search'] = 'lower-bound-cascade'
+        if self.uses_compositions(kwargs):
+            arguments['evaluation'] = 'multi-composition'
+        if self.resampling:
+            arguments['resampling'] = self.resampling
+            arguments['splits'] = self.n_splits
+        if self.tuning:
+            for key in parameter_tuning.tuned_parameters(kwargs):
+                arguments[key] = 'tuned'
+            arguments['tuning'] = 'leave-one-out'
+        return arguments
+
+    def uses_search(self, metric):
+        """
+        :param metric: string containing the sktime name of the metric
+        :return: whether the nearest neighbours are found by the lower bound
+            search instead of the sktime classifier; tuned windows are
+            always evaluated by the search, as they are tuned on its
+            distances, see run_tuning
+        """
+        return (self.lower_bound_search or self.tuning) and \
+            metric in supported_metrics and max(self.neighbours) == 1
+
+    def variants(self):
+        """
+        :return: list of tuples of the number of neighbours and the weights
+            of every classifier evaluated from one neighbour search
+        """
+        return [(n_neighbors, weights) for n_neighbors in self.neighbours
+                for weights in self.weights]
+
+    def variant_arguments(self, arguments, n_neighbors, weights):
+        """
+        :param arguments: the recorded arguments of a metric
+        :param n_neighbors: number of neighbours of the variant
+        :param weights: 'uniform' or 'distance'
+        :return: the arguments recorded for the variant, the 1-NN classifier
+            keeps the arguments of the metric
+        """
+        if (n_neighbors, weights) == (1, 'uniform'):
+            return arguments
+        return dict(arguments, n_neighbors=n_neighbors, weights=weights)
+
+    def variant_arguments_for(self, metric):
+        """
+        :param metric: string containing the name of the metric method
+        :return: list with the arguments every variant of the metric would
+            record
+        """
+        arguments = self.arguments_for(metric)
+        return [self.variant_arguments(arguments, n_neighbors, weights)
+                for n_neighbors, weights in self.variants()]
+
+    def uses_compositions(self, kwargs):
+        """
+        :param kwargs: dictionary with the keyword arguments of a metric
+        :return: whether the metric is evaluated from per dimension costs
+            shared with the other distance compositions
+        """
+        return self.multi_composition and 'distance_composition' in kwargs
+
+    def composition_groups(self, metrics):
+        """
+        groups metrics that only differ in their distance_composition, so
+        they can be evaluated from one distance pass
+        :param metrics: list of metric names
+        :return: list of lists of metric names, every other metric makes a
+            group of its own
+        """
+        groups = {}
+        for metric in metrics:
+            try:
+                sktime_metric, kwargs = self.metric_definition(metric)
+            except AttributeError:
+                groups[metric] = [metric]
+                continue
+            if self.uses_compositions(kwargs):
+                shared = {key: value for key, value in kwargs.items()
+                          if key != 'distance_composition'}
+                key = (sktime_metric, json.dumps(shared, sort_keys=True))
+            else:
+                key = metric
+            groups.setdefault(key, []).append(metric)
+        return list(groups.values())
+
+    def arguments_for(self, metric):
+        """
+        :param metric: string containing the name of the metric method
+        :return: the arguments a run of the metric would record, without
+            preparing a classifier
+        """
+        return self.compose_arguments(*self.metric_definition(metric))
+
     def prepareClassifier(self, metric, **kwargs):
-        self.metric_arguments = kwargs.copy()
-        self.metric_arguments['njobs'] = self.njobs
-        self.metric_arguments['z-normalized'] = self.normalized
+        self.metric_arguments = self.compose_arguments(metric, kwargs)
+        self.sktime_metric, self.metric_params = metric, kwargs
+        self.distance_path = None
+        self.classifier = None
+        self.search = None
+        if self.uses_search(metric):
+            if np.isnan(self.X_train_panel).any() or \
+                    np.isnan(self.X_test_panel).any():
+                logging.warning(f'series of unequal length, falling back to '
+                                f'the classifier for metric {metric}')
+                del self.metric_arguments['search']
+            else:
+                self.search = NearestNeighbourSearch(
+                    window=kwargs['w'], derivative=supported_metrics[metric])
+                with self.recorder.phase('fit'):
+                    self.search.fit(self.X_train_panel)
+                return
         self.classifier = \
-            KNeighborsTimeSeriesClassifier(n_jobs=self.njobs, n_neighbors=1,
+            KNeighborsTimeSeriesClassifier(n_jobs=self.njobs,
+                                           n_neighbors=max(self.neighbours),
                                            metric=metric, metric_params=kwargs)
-        self.classifier.fit(self.X_train, self.y_train)
+        with self.recorder.phase('fit'):
+            self.classifier.fit(self.X_train, self.y_train)
+
+    def metric_definition(self, metric):
+        """
+        :param metric: string containing the name of the metric method
+        :return: a tuple of the sktime metric name and its keyword arguments
+        """
+        return getattr(self, metric)()
 
     def setMetric(self, metric):
         print(f'{self.current_timestamp()}      running metric {metric}')
         try:
-            getattr(self, metric)()
+            sktime_metric, kwargs = self.metric_definition(metric)
         except AttributeError:
             logging.error(f"method {metric} is not implemented")
+            return
+        self.prepareClassifier(sktime_metric, **kwargs)
 
     def predict(self):
-        start_time = time.perf_counter()
-        self.y_test_pred = self.classifier.predict(self.X_test)
-        self.runtime = time.perf_counter() - start_time
+        with self.recorder.phase('predict'):
+            if self.single_distance_pass or self.search is not None or \
+                    self.variants() != [(1, 'uniform')]:
+                neighbours, runtimes = repeat_timed(
+                    self.find_neighbours, self.warm_up, self.repetitions)
+                self.neigh_dist, self.neigh_ind = neighbours
+            else:
+                self.neigh_dist, self.neigh_ind = None, None
+                self.y_test_pred, runtimes = repeat_timed(
+                    lambda: self.classifier.predict(self.X_test),
+                    self.warm_up, self.repetitions)
+                self.y_test_proba = None
+            self.set_runtime(runtimes)
+        if self.timed_key is not None:
+            self.distance_path = self.distance_store.keep_timed(
+                self.dataset, self.timed_key)
+            self.timed_key = None
         print(f'{self.current_timestamp()}            run time was:        '
               f'{self.runtime}')
 
+    def set_runtime(self, runtimes):
+        """
+        sets the runtime to the median of repeated measurements, their
+        statistics are recorded with the result
+        :param runtimes: list of the wall times of the timed calls
+        :return: nothing
+        """
+        if len(runtimes) > 1:
+            self.runtime_statistics = runtime_statistics(runtimes,
+                                                         self.warm_up)
+            self.runtime = self.runtime_statistics['median']
+        else:
+            self.runtime_statistics = None
+            self.runtime = runtimes[0]
+
+    def find_neighbours(self):
+        """
+        computes the neighbours of the test set once, as many as the largest
+        variant needs, all predictions and probabilities derive from them
+        :return: a tuple of the distances and the indices of the neighbours,
+            both of shape (test instances, neighbours)
+        """
+        if self.store_distances and self.search is None:
+            return self.find_neighbours_in_store()
+        if self.progress is not None:
+            return self.find_neighbours_in_chunks()
+        return self.neighbours_of(slice(None))
+
+    def neighbours_of(self, test):
+        """
+        :param test: slice of the test instances
+        :return: a tuple of the distances and the indices of the neighbours
+            of the test instances in the slice
+        """
+        if self.search is not None:
+            return self.search.kneighbors(self.X_test_panel[test])
+        return self.classifier.kneighbors(self.X_test.iloc[test],
+                                          n_neighbors=max(self.neighbours))
+
+    def find_neighbours_in_chunks(self):
+        """
+        computes the neighbours a chunk of the test set at a time and hands
+        the number of test instances classified so far and of those the
+        nearest neighbour classified correctly to the progress function, so
+        an aborted job still has a partial accuracy
+        :return: a tuple like the one returned by find_neighbours
+        """
+        num_test = len(self.y_test)
+        chunk_size = max(1, math.ceil(num_test / self.progress_chunks))
+        y_train, y_test = np.asarray(self.y_train), np.asarray(self.y_test)
+        neigh_dist, neigh_ind = [], []
+        statistics = {}
+        correct = 0
+        for start in range(0, num_test, chunk_size):
+            test = slice(start, start + chunk_size)
+            distances, indices = self.neighbours_of(test)
+            if self.search is not None:
+                for stage, count in self.search.statistics.items():
+                    statistics[stage] = statistics.get(stage, 0) + count
+            neigh_dist.append(distances)
+            neigh_ind.append(indices)
+            correct += int(np.sum(y_train[indices[:, 0]] == y_test[test]))
+            self.progress(min(start + chunk_size, num_test), correct,
+                          num_test)
+        if self.search is not None:
+            self.search.statistics = statistics
+        return np.concatenate(neigh_dist), np.concatenate(neigh_ind)
+
+    def find_neighbours_in_store(self):
+        """
+        computes the distances between the test and the training instances
+        in tiles of the memory budget of the distance store, into a fresh
+        matrix on every call, so the runtime measures their computation.
+        The neighbours are taken from every finished row of tiles; with a
+        progress function a row of tiles is at most a chunk of the test set
+        high and the progress is handed on after each of them, like in
+        find_neighbours_in_chunks
+        :return: a tuple like the one returned by find_neighbours
+        """
+        self.timed_key = self.distance_key(
+            self.sktime_metric, self.metric_params,
+            split_hash(self.train_index, self.test_index))
+        num_test = len(self.y_test)
+        y_train, y_test = np.asarray(self.y_train), np.asarray(self.y_test)
+        neigh_dist, neigh_ind = [], []
+        correct = 0
+
+        def rows_done(matrix, rows):
+            nonlocal correct
+            distances, indices = kn.kneighbors_from_distances(
+                matrix[rows], max(self.neighbours))
+            neigh_dist.append(distances)
+            neigh_ind.append(indices)
+            if self.progress is not None:
+                correct += int(np.sum(y_train[indices[:, 0]] ==
+                                      y_test[rows]))
+                self.progress(min(rows.stop, num_test), correct, num_test)
+
+        chunk_size = None if self.progress is None \
+            else max(1, math.ceil(num_test / self.progress_chunks))
+        self.distance_store.timed_distances(
+            self.dataset, self.timed_key,
+            dm.to_series_panel(self.X_test_panel),
+            dm.to_series_panel(self.X_train_panel), self.sktime_metric,
+            self.metric_params, self.njobs, chunk_size, rows_done)
+        return np.concatenate(neigh_dist), np.concatenate(neigh_ind)
+
+    def predict_variant(self, n_neighbors, weights):
+        """
+        :param n_neighbors: number of neighbours voting
+        :param weights: 'uniform' or 'distance'
+        :return: a tuple of the predicted classes and the probability matrix
+        """
+        classes, y_train_encoded = kn.encode_labels(self.y_train)
+        proba = kn.proba_from_neighbours(
+            self.neigh_ind[:, :n_neighbors], self.neigh_dist[:, :n_neighbors],
+            y_train_encoded, len(classes), weights)
+        return kn.predict_from_proba(proba, classes), proba
+
+    def score_variants(self, metric):
+        """
+        scores every variant from the neighbours found by the last prediction
+        :return: a list with the result of every variant, the variant is
+            named by the arguments of the result
+        """
+        if self.neigh_ind is None:
+            self.score()
+            return [self.collect_result()]
+        arguments = self.metric_arguments
+        results = []
+        for n_neighbors, weights in self.variants():
+            self.y_test_pred, self.y_test_proba = \
+                self.predict_variant(n_neighbors, weights)
+            self.metric_arguments = \
+                self.variant_arguments(arguments, n_neighbors, weights)
+            print(f'{self.current_timestamp()}            neighbours:          '
+                  f'{n_neighbors}, {weights} weights')
+            self.score()
+            results.append(self.collect_result())
+        self.metric_arguments = arguments
+        return results
+
     def score_accuracy(self):
         self.accuracy_score = accuracy_score(self.y_test, self.y_test_pred)
         print(f'{self.current_timestamp()}            accuracy score is:   '
@@ -141,22 +521,24 @@ class TimeseriesBenchmark:
             # https://scikit-learn.org/stable/modules/generated/sklearn
             # .metrics.roc_auc_score.html
             self.auroc_score = \
-                roc_auc_score(self.y_test,
-                              self.classifier.predict_proba(self.X_test)[:, 1],
+                roc_auc_score(self.y_test, self.y_test_proba[:, 1],
                               average='macro')
         else:
             self.auroc_score = \
-                roc_auc_score(self.y_test,
-                              self.classifier.predict_proba(self.X_test),
+                roc_auc_score(self.y_test, self.y_test_proba,
                               average='macro', multi_class="ovo")
         print(f'{self.current_timestamp()}            auroc score is:      '
               f'{self.auroc_score}')
 
     def score(self):
-        self.score_accuracy()
-        self.score_recall()
-        self.score_f1()
-        self.score_auroc()
+        if self.y_test_proba is None:
+            with self.recorder.phase('predict-proba'):
+                self.y_test_proba = self.classifier.predict_proba(self.X_test)
+        with self.recorder.phase('scoring'):
+            self.score_accuracy()
+            self.score_recall()
+            self.score_f1()
+            self.score_auroc()
 
     def properties(self):
         return dataset_properties(self.X_train, self.y_train, self.X_test)
@@ -173,24 +555,358 @@ class TimeseriesBenchmark:
         print(f'            memory footprint is: {m_footprint}')
         return m_footprint
 
+    def run_metric(self, metric):
+        """
+        runs a single metric on the currently loaded dataset
+        :param metric: string containing the name of the metric method
+        :return: a list with a dictionary containing the arguments, scores
+            and per phase memory records of every variant, see variants()
+        """
+        self.recorder.clear(keep=dataset_phases)
+        self.setMetric(metric)
+        self.predict()
+        return self.score_variants(metric)
+
+    def run_compositions(self, metrics):
+        """
+        runs metrics that only differ in their distance_composition on the
+        currently loaded dataset. The alignment costs are computed once per
+        pair and dimension and then composed for every metric; the runtime
+        of each metric is its share of this pass plus its own composition,
+        the timing of the pass itself is recorded with the first metric only.
+        If the composed distances of the first pair differ from those of
+        the metrics themselves, every metric is run on its own instead
+        :param metrics: list of metric names as grouped by composition_groups
+        :return: a list of tuples of the metric names and their results
+        """
+        self.recorder.clear(keep=dataset_phases)
+        sktime_metric, kwargs = self.metric_definition(metrics[0])
+        self.sktime_metric = sktime_metric
+        self.search, self.distance_path = None, None
+        print(f'{self.current_timestamp()}      computing {sktime_metric} '
+              f'costs for {", ".join(metrics)}')
+        with self.recorder.phase('fit'):
+            distance = dm.metric_function(sktime_metric)
+            X_train = dm.to_series_panel(self.X_train_panel)
+            X_test = dm.to_series_panel(self.X_test_panel)
+            mismatches = self.composition_mismatches(
+                metrics, distance, X_test[:1], X_train[:1])
+        if mismatches:
+            logging.warning(f'composed distances differ from those of '
+                            f'{", ".join(mismatches)} on {self.dataset}, '
+                            f'running the metrics one by one')
+            results = []
+            for metric in metrics:
+                for result in self.run_metric(metric):
+                    result['composition-check'] = {'mismatches': mismatches}
+                    results.append((metric, result))
+            return results
+        with self.recorder.phase('distances'):
+            costs, shared_runtimes = repeat_timed(
+                lambda: dm.dimension_distances(X_test, X_train, distance,
+                                               kwargs, self.njobs),
+                self.warm_up, self.repetitions)
+        results = []
+        for metric in metrics:
+            print(f'{self.current_timestamp()}      running metric {metric}')
+            kwargs = self.metric_definition(metric)[1]
+            self.metric_arguments = self.compose_arguments(sktime_metric,
+                                                           kwargs)
+            with self.recorder.phase('predict'):
+                neighbours, runtimes = repeat_timed(
+                    lambda: kn.kneighbors_from_distances(
+                        dm.compose(costs, kwargs['distance_composition']),
+                        max(self.neighbours)),
+                    self.warm_up, self.repetitions)
+                self.neigh_dist, self.neigh_ind = neighbours
+                self.set_runtime([shared_runtime / len(metrics) + runtime
+                                  for shared_runtime, runtime
+                                  in zip(shared_runtimes, runtimes)])
+            results += [(metric, result)
+                        for result in self.score_variants(metric)]
+            self.recorder.phases.pop('distances', None)
+        return results
+
+    def composition_mismatches(self, metrics, distance, X_a, X_b):
+        """
+        compares the distances composed from per dimension costs with the
+        distances of the metrics themselves, the compositions assume e.g.
+        the minkowski exponent of distance_matrix.minkowski_p
+        :param metrics: list of metric names as grouped by composition_groups
+        :param distance: distance function as returned by metric_function
+        :param X_a: array of shape (instances, timestamps, dimensions)
+        :param X_b: array of shape (instances, timestamps, dimensions)
+        :return: list of the metrics whose composed distances differ
+        """
+        costs = dm.dimension_distances(X_a, X_b, distance,
+                                       self.metric_definition(metrics[0])[1])
+        mismatches = []
+        for metric in metrics:
+            kwargs = self.metric_definition(metric)[1]
+            if not np.allclose(
+                    dm.compose(costs, kwargs['distance_composition']),
+                    dm.pairwise_distances(X_a, X_b, distance, kwargs)):
+                mismatches.append(metric)
+        return mismatches
+
+    def run_metrics(self, metrics):
+        """
+        :param metrics: list of metric names as grouped by composition_groups
+        :return: a list of tuples of the metric names and their results,
+            several per metric with more than one variant
+        """
+        try:
+            kwargs = self.metric_definition(metrics[0])[1]
+        except AttributeError:
+            kwargs = {}
+        if self.resampling:
+            return [(metric, result) for metric in metrics
+                    for result in self.run_resampling(metric)]
+        if self.uses_compositions(kwargs) and not self.tuning:
+            return self.run_compositions(metrics)
+        run = self.run_tuning if self.tuning else self.run_metric
+        return [(metric, result) for metric in metrics
+                for result in run(metric)]
+
+    def distance_key(self, metric, kwargs, split):
+        """
+        :param metric: string containing the sktime name of the metric
+        :param kwargs: dictionary with the keyword arguments of the metric
+        :param split: hash of the split as returned by split_hash
+        :return: dictionary identifying a distance matrix of the loaded
+            dataset in the distance store
+        """
+        return {
+            'dataset': self.dataset_cache.index()[self.dataset],
+            'metric': metric,
+            'arguments': kwargs,
+            'z-normalization': self.normalization_mode
+            if self.normalized else None,
+            'split': split
+        }
+
+    def full_distances(self, metric, kwargs):
+        """
+        the distances between all instances of the loaded dataset, computed
+        once and kept in the distance store
+        :param metric: string containing the sktime name of the metric
+        :param kwargs: dictionary with the keyword arguments of the metric
+        :return: array of shape (instances, instances)
+        """
+        X = dm.to_series_panel(self.X_panel)
+        key = self.distance_key(metric, kwargs, split_hash())
+        self.distance_path = self.distance_store.matrix_dir(self.dataset, key)
+        return self.distance_store.distances(
+            self.dataset, key, X, X, metric, kwargs, self.njobs,
+            symmetric=metric in dm.symmetric_metrics)
+
+    def train_distances(self, metric, kwargs):
+        """
+        the distances between all training instances of the loaded dataset,
+        computed once and kept in the distance store
+        :param metric: string containing the sktime name of the metric
+        :param kwargs: dictionary with the keyword arguments of the metric
+        :return: array of shape (training instances, training instances)
+        """
+        X = dm.to_series_panel(self.X_train_panel)
+        return self.distance_store.distances(
+            self.dataset,
+            self.distance_key(metric, kwargs, split_hash(self.train_index)),
+            X, X, metric, kwargs, self.njobs,
+            symmetric=metric in dm.symmetric_metrics)
+
+    def run_tuning(self, metric):
+        """
+        tunes the window size and parameters of a metric by leave-one-out
+        1-NN accuracy on the training set and runs the test evaluation for
+        the best candidate only. Window sizes of dtw and ddtw are tuned on
+        shared local costs and the test set is then evaluated by the lower
+        bound search, which bands the window the same way; all other
+        candidates are tuned on training distance matrices of the sktime
+        metric from the distance store
+        :param metric: string containing the name of the metric method
+        :return: a dictionary like the one returned by run_metric, every
+            result with the score of every candidate under tuning
+        """
+        print(f'{self.current_timestamp()}      tuning metric {metric}')
+        self.recorder.clear(keep=dataset_phases)
+        sktime_metric, kwargs = self.metric_definition(metric)
+        candidate_kwargs = parameter_tuning.candidates(kwargs)
+        with self.recorder.phase('tuning'):
+            if self.uses_search(sktime_metric) and \
+                    parameter_tuning.tuned_parameters(kwargs) == ['w'] and \
+                    not np.isnan(self.X_panel).any():
+                window_distances = parameter_tuning.dtw_window_distances(
+                    self.X_train_panel,
+                    [candidate['w'] for candidate in candidate_kwargs],
+                    supported_metrics[sktime_metric])
+
+                def train_distances(candidate):
+                    return window_distances[candidate['w']]
+            else:
+                def train_distances(candidate):
+                    return self.train_distances(sktime_metric, candidate)
+            best_kwargs, scores = parameter_tuning.tune(
+                candidate_kwargs, train_distances, self.y_train)
+        print(f'{self.current_timestamp()}            selected arguments:  '
+              f'{best_kwargs}')
+        self.prepareClassifier(sktime_metric, **best_kwargs)
+        self.predict()
+        results = self.score_variants(metric)
+        for result in results:
+            result['tuning'] = {'selected': best_kwargs, 'candidates': scores}
+        return results
+
+    def run_resampling(self, metric):
+        """
+        evaluates a metric over repeated splits of the loaded dataset, all
+        of them looked up in one matrix of the distances between all
+        instances. The scores are the means over the splits, their spread
+        and confidence intervals are recorded under resampling. Every
+        variant is scored over the same splits of the one matrix
+        :param metric: string containing the name of the metric method
+        :return: a list with the result of every variant, like the results
+            returned by run_metric
+        """
+        print(f'{self.current_timestamp()}      resampling metric {metric}')
+        self.recorder.clear(keep=dataset_phases)
+        sktime_metric, kwargs = self.metric_definition(metric)
+        self.metric_arguments = self.compose_arguments(sktime_metric, kwargs)
+        self.search = None
+        with self.recorder.phase('distances'):
+            start_time = time.perf_counter()
+            distances = self.full_distances(sktime_metric, kwargs)
+            # later calls would only read the distance store
+            self.set_runtime([time.perf_counter() - start_time])
+        with self.recorder.phase('resampling'):
+            variant_results = [
+                resampling.resample(distances, self.y, self.resampling,
+                                    self.n_splits, n_neighbors=n_neighbors,
+                                    weights=weights)
+                for n_neighbors, weights in self.variants()]
+        arguments = self.metric_arguments
+        results = []
+        for (n_neighbors, weights), (split_results, intervals) in \
+                zip(self.variants(), variant_results):
+            self.metric_arguments = \
+                self.variant_arguments(arguments, n_neighbors, weights)
+            self.accuracy_score = intervals['accuracy']['mean']
+            self.recall_score = intervals['recall']['mean']
+            self.f1_score = intervals['f1-score']['mean']
+            self.auroc_score = intervals['auroc']['mean']
+            print(f'{self.current_timestamp()}            neighbours:          '
+                  f'{n_neighbors}, {weights} weights')
+            print(f'{self.current_timestamp()}            accuracy score is:   '
+                  f'{self.accuracy_score} [{intervals["accuracy"]["ci-low"]}, '
+                  f'{intervals["accuracy"]["ci-high"]}]')
+            result = self.collect_result()
+            result['resampling'] = {
+                'n_splits': len(split_results['accuracy']),
+                'splits': split_results,
+                'intervals': intervals}
+            results.append(result)
+        self.metric_arguments = arguments
+        return results
+
+    def collect_result(self):
+        """
+        :return: a dictionary containing the arguments, scores and per phase
+            memory records of the metric just scored
+        """
+        memory = self.recorder.memory()
+        self.memory_footprint(max(phase['peak-rss'] for phase in memory.values()))
+        result = {
+            'arguments': self.metric_arguments,
+            'accuracy': self.accuracy_score,
+            'recall': self.recall_score,
+            'f1-score': self.f1_score,
+            'auroc': self.auroc_score,
+            'runtime': self.runtime,
+            'timing': self.recorder.timing(),
+            'memory': memory,
+            'threads': thread_configuration(self.njobs)
+        }
+        if self.runtime_statistics is not None:
+            result['runtime-statistics'] = self.runtime_statistics
+        if self.search is not None:
+            result['pruning'] = self.search.pruning_rates()
+        if self.distance_path is not None:
+            result['distances'] = str(self.distance_path)
+        if not self.resampling:
+            result['split'] = split_hash(self.train_index, self.test_index)
+        if self.save_predictions and not self.resampling:
+            result['predictions'] = str(self.write_predictions())
+        return result
+
+    def write_predictions(self):
+        """
+        writes the confusion matrix, predictions and probabilities of the
+        metric just scored into a sidecar file, see predictions.py
+        :return: the path of the sidecar file
+        """
+        key = {
+            'metric': self.sktime_metric,
+            'arguments': {key: value for key, value
+                          in self.metric_arguments.items() if key != 'njobs'},
+            'window': self.window,
+            'split': split_hash(self.train_index, self.test_index)
+        }
+        path = predictions_path(self.dataset, key, self.predictions_dir)
+        write_predictions(path, self.y_test, self.y_test_pred,
+                          self.y_test_proba, kn.encode_labels(self.y_train)[0])
+        return path
+
     def run_benchmark_over(self, datasets, metrics):
+        """
+        runs all metrics over all datasets, every finished metric is appended
+        to the result log and metrics already found in it are skipped, so an
+        interrupted run can simply be restarted. Metrics whose result does
+        not depend on the window size, as found in the log for another
+        window, are not run again but copied with a provenance flag
+        :param datasets: list of dataset names
+        :param metrics: list of metric names
+        :return: nothing
+        """
+        start_time = time.perf_counter()
+        timings = []
+        completed = self.result_log.completed_keys()
+        reusable = self.result_log.reusable_records()
         for dataset in datasets:
-            self.result_dict[dataset] = {}
-            self.loadDataset(dataset)
-            self.result_dict[dataset]['properties'] = self.properties()
+            open_metrics = []
+            series_length = self.dataset_cache.series_length(dataset)
             for metric in metrics:
-                self.result_dict[dataset][metric] = {}
-                self.setMetric(metric)
-                self.result_dict[dataset][metric][
-                    'arguments'] = self.metric_arguments
-                self.predict()
-                self.score()
-                self.result_dict[dataset][metric]['accuracy'] = self.accuracy_score
-                self.result_dict[dataset][metric]['recall'] = self.recall_score
-                self.result_dict[dataset][metric]['f1-score'] = self.f1_score
-                self.result_dict[dataset][metric]['auroc'] = self.auroc_score
-                self.result_dict[dataset][metric]['runtime'] = self.runtime
-                self.writeJson()
+                variant_arguments = self.variant_arguments_for(metric)
+                if all(job_key(dataset, metric, self.window, arguments)
+                       in completed for arguments in variant_arguments):
+                    continue
+                keys = [effective_key(dataset, metric, arguments,
+                                      series_length)
+                        for arguments in variant_arguments]
+                if all(key in reusable for key in keys):
+                    for key, arguments in zip(keys, variant_arguments):
+                        self.result_log.append(
+                            fan_out(reusable[key], self.window, arguments))
+                else:
+                    open_metrics.append(metric)
+            if not open_metrics:
+                continue
+            self.loadDataset(dataset)
+            properties = self.properties()
+            for group in self.composition_groups(open_metrics):
+                for metric, result in self.run_metrics(group):
+                    timings.append(result['timing'])
+                    self.result_log.append({
+                        'dataset': dataset,
+                        'metric': metric,
+                        'window': self.window,
+                        'properties': properties,
+                        'result': result
+                    })
+            self.recorder.clear()
+        print_timing_summary(timings, time.perf_counter() - start_time)
+        records = self.result_log.records()
+        self.result_dict = compact(records).get(self.window, {})
+        self.writeJson()
 
     def writeJson(self):
         with open(self.json_file_path, "w") as json_file:
@@ -205,28 +921,28 @@ class TimeseriesBenchmark:
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 0}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def dagdtw_euclidean(self):
         metric = 'sagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 1}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def dagdtw_chebyshev(self):
         metric = 'sagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 2}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def dagdtw_minkowski(self):
         metric = 'sagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 3}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def bagdtw(self):
         return self.bagdtw_manhattan()
@@ -236,58 +952,62 @@ class TimeseriesBenchmark:
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 0}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def bagdtw_euclidean(self):
         metric = 'bagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 1}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def bagdtw_chebyshev(self):
         metric = 'bagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 2}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def bagdtw_minkowski(self):
         metric = 'bagdtw'
         kwargs = {'sigma': 1, 'pseudo_distance': True,
                   'average_aggregation': False, 'window': self.window,
                   'distance_composition': 3}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def dtw(self):
         metric = 'dtw'
         kwargs = {'w': self.window}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def ddtw(self):
         metric = 'ddtw'
         kwargs = {'w': self.window}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def wdtw(self):
         metric = 'wdtw'
         kwargs = {'g': .7}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def wddtw(self):
         metric = 'wddtw'
         kwargs = {'g': .7}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
     def sdtw(self):
         metric = 'sdtw'
         kwargs = {'gamma': 1.0}
-        self.prepareClassifier(metric, **kwargs)
+        return metric, kwargs
 
 
 if __name__ == '__main__':
+    # one OpenMP and BLAS thread per joblib worker
+    budget = ThreadBudget(njobs=-1)
+    budget.apply()
     for wws in [-1, 0.3, 0.03]:
-        bm = TimeseriesBenchmark(window=wws, njobs=-1, normalized=True)
+        bm = TimeseriesBenchmark(window=wws, njobs=budget.njobs,
+                                 normalized=True)
 
         metrics = [
             'dagdtw',
@@ -0,0 +1,65 @@
+__author__ = "6541262: Ansgar Asseburg"
+__copyright__ = "Copyright 2021 – Ansgar Asseburg; " \
+                "You may use and copy this document (including changing it) " \
+                "for non-commercial and educational purposes" \
+                "as long as you leave the author and this copyright " \
+                "information in"
+__email__ = "s2092795@stud.uni-frankfurt.de"
+
+import time
+
+import numpy as np
+
+from dataset_cache import nested_to_panel, panel_to_nested
+from sktime_dataset_analyses import z_normalize, z_normalize_panel
+
+
+def synthetic_panel(num_instances, num_dimensions, num_timestamps, seed=1):
+    rng = np.random.default_rng(seed)
+    offsets = rng.normal(0, 10, size=(num_instances, num_dimensions, 1))
+    scales = rng.uniform(.5, 5, size=(num_instances, num_dimensions, 1))
+    noise = rng.normal(size=(num_instances, num_dimensions, num_timestamps))
+    return offsets + scales * noise
+
+
+def best_time(function, repetitions=3):
+    """
+    :param function: function without arguments to be timed
+    :param repetitions: number of timed calls
+    :return: a tuple of the fastest time and the result of the last call
+    """
+    times = []
+    result = None
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start_time)
+    return min(times), result
+
+
+def compare(num_instances, num_dimensions, num_timestamps):
+    """
+    times the nested dataframe loop against the vectorized panel version
+    :return: a tuple of both times and whether the results agree
+    """
+    panel = synthetic_panel(num_instances, num_dimensions, num_timestamps)
+    loop_time, loop_result = best_time(
+        lambda: z_normalize(panel_to_nested(panel)), 1)
+    # the conversion is part of the loop timing above, remove it again
+    conversion_time, _ = best_time(lambda: panel_to_nested(panel), 1)
+    loop_time -= conversion_time
+    vectorized_time, vectorized_result = best_time(
+        lambda: z_normalize_panel(panel, 'series'))
+    agree = np.allclose(nested_to_panel(loop_result), vectorized_result)
+    return loop_time, vectorized_time, agree
+
+
+if __name__ == '__main__':
+    shapes = [(100, 1, 100), (500, 1, 500), (300, 9, 144), (1000, 1, 945)]
+    print(f'{"instances":>10}{"dims":>6}{"length":>8}'
+          f'{"loop [s]":>12}{"panel [s]":>12}{"speedup":>10}  agree')
+    for shape in shapes:
+        loop_time, vectorized_time, agree = compare(*shape)
+        print(f'{shape[0]:>10}{shape[1]:>6}{shape[2]:>8}'
+              f'{loop_time:>12.4f}{vectorized_time:>12.6f}'
+              f'{loop_time / vectorized_time:>10.0f}  {agree}')